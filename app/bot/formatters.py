@@ -6,6 +6,7 @@ from typing import Dict, List, Optional
 from zoneinfo import ZoneInfo
 
 from .parser import escape_html, format_currency
+from .recurring_flow import RECURRENCE_LABELS
 
 
 HELP_MESSAGE = (
@@ -54,6 +55,8 @@ RATE_LIMIT_MESSAGE = (
     "Espera un momento y vuelve a intentar."
 )
 
+TRANSCRIBING_MESSAGE = "🎙️ <i>Transcribiendo tu audio…</i>"
+
 LONG_MESSAGE = (
     "✂️ <b>Mensaje muy largo</b>\n"
     "Reduce el texto e intenta de nuevo."
@@ -73,6 +76,13 @@ ONBOARDING_SUCCESS_MESSAGE = (
     "• <code>Me pagaron 3m</code>"
 )
 
+_RECURRING_STATUS_LABELS = {
+    "active": "activo",
+    "paused": "pausado",
+    "pending": "pendiente",
+    "canceled": "cancelado",
+}
+
 
 def format_add_tx_message(tx: Dict[str, object]) -> str:
     amount = format_currency(float(tx.get("amount", 0)), str(tx.get("currency", "COP")))
@@ -161,7 +171,7 @@ def format_list_message(transactions: List[Dict[str, object]]) -> str:
         except ValueError:
             return float("-inf")
 
-    filtered = [tx for tx in transactions if not bool(tx.get("isDeleted"))]
+    filtered = [tx for tx in transactions if not tx.get("isDeleted")]
     filtered.sort(key=to_ts, reverse=True)
     last10 = filtered[:10]
 
@@ -225,20 +235,9 @@ def format_recurring_list_message(items: List[Dict[str, object]]) -> str:
             str(item.get("service_name") or item.get("normalized_merchant") or item.get("description") or "Gasto recurrente")
         )
         recurrence_raw = str(item.get("recurrence") or "monthly").lower()
-        recurrence = {
-            "weekly": "semanal",
-            "biweekly": "quincenal",
-            "monthly": "mensual",
-            "quarterly": "trimestral",
-            "yearly": "anual",
-        }.get(recurrence_raw, recurrence_raw)
+        recurrence = RECURRENCE_LABELS.get(recurrence_raw, recurrence_raw)
         status_raw = str(item.get("status") or "pending").lower()
-        status = {
-            "active": "activo",
-            "paused": "pausado",
-            "pending": "pendiente",
-            "canceled": "cancelado",
-        }.get(status_raw, status_raw)
+        status = _RECURRING_STATUS_LABELS.get(status_raw, status_raw)
         next_due = escape_html(str(item.get("next_due") or "—"))
         reminder_hour = item.get("reminder_hour")
         try:
@@ -6,7 +6,7 @@ from typing import Optional
 from telegram.ext import CallbackQueryHandler, MessageHandler, filters
 
 from app.bot.pipeline import BotPipeline
-from app.bot.formatters import RATE_LIMIT_MESSAGE
+from app.bot.formatters import RATE_LIMIT_MESSAGE, TRANSCRIBING_MESSAGE
 from app.bot.parser import parse_command
 from app.bot.ui_models import BotInput
 from app.channels.telegram_adapter import download_voice_bytes, send_bot_message
@@ -76,6 +76,13 @@ def _get_pipeline() -> BotPipeline:
     return _pipeline
 
 
+async def close_pipeline() -> None:
+    global _pipeline
+    if _pipeline is not None:
+        await _pipeline.aclose()
+        _pipeline = None
+
+
 def _set_trace_from_update(update) -> None:
     trace = None
     if update is not None and hasattr(update, "update_id"):
@@ -104,8 +111,15 @@ async def _handle_message_safe(update, context) -> None:
         message_id = str(message.message_id) if message else None
         audio_bytes = None
         non_text_type = None
+        voice_acked = False
 
         if message and message.voice:
+            # Acknowledge before the file download, which the pipeline's own early ack would wait behind.
+            try:
+                await send_bot_message(context, chat_id, pipeline._make_message(TRANSCRIBING_MESSAGE))
+                voice_acked = True
+            except Exception as exc:
+                logger.warning("Transcription ack failed chat_id=%s error=%s", chat_id, exc)
             try:
                 audio_bytes = await download_voice_bytes(context, message.voice.file_id)
             except Exception as exc:
@@ -147,7 +161,10 @@ async def _handle_message_safe(update, context) -> None:
                 await send_bot_message(context, chat_id, pipeline._make_message(RATE_LIMIT_MESSAGE))
                 return
 
-        responses = await pipeline.handle_message(request)
+        responses = await pipeline.handle_message(
+            request,
+            send_early=None if voice_acked else (lambda early: send_bot_message(context, chat_id, early)),
+        )
         for response in responses:
             await send_bot_message(context, chat_id, response)
     except Exception as exc:
@@ -7,13 +7,14 @@ import re
 import unicodedata
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Any, Dict, Optional
 from zoneinfo import ZoneInfo
 
 from app.core.config import Settings
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class ParsedCommand:
     route: str
     command: str
@@ -50,6 +51,32 @@ _MONEY_TOKEN_RE = re.compile(
     flags=re.IGNORECASE,
 )
 _MULTI_TX_SEPARATOR_RE = re.compile(r"(?:\s+(?:y|e|luego|despues|después)\s+|[;,])", flags=re.IGNORECASE)
+_LEADING_CONNECTOR_RE = re.compile(r"^\s*(y|e)\s+", flags=re.IGNORECASE)
+_TRAILING_CONNECTOR_RE = re.compile(r"\s+(y|e)\s*$", flags=re.IGNORECASE)
+_COP_WORD_RE = re.compile(r"\b(cop|peso|pesos|mil)\b")
+_WHITESPACE_RE = re.compile(r"\s+")
+_THOUSANDS_SLANG_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*(k|luka?s?|luca?s?)\b", flags=re.IGNORECASE)
+_MILLIONS_SLANG_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*(m|palo?s?)\b", flags=re.IGNORECASE)
+_NUDGE_SILENCE_RE = re.compile(r"^(silenciar|silencia|mutear|apagar|desactivar)\b")
+_NUDGE_ENABLE_RE = re.compile(r"^(activar|activa|encender|habilitar|habilita|reanudar|reactivar)\b")
+_NUDGE_TOPIC_RE = re.compile(r"\b(recordatorio|recordatorios|notificacion|notificaciones|aviso|avisos)\b")
+_NUDGE_EXAMPLES_RE = re.compile(r"\b(ejemplo|ejemplos|ideas)\b")
+_NUDGE_CHANGE_RE = re.compile(r"\b(cambiar|cambia|ajustar|ajusta|configurar|configura|poner|pon)\b")
+_NUDGE_TOPIC_OR_HOUR_RE = re.compile(r"\b(hora|recordatorio|recordatorios|notificacion|notificaciones|aviso|avisos)\b")
+_NUDGE_HOUR_RE = re.compile(r"^(hora)\s+\d{1,2}(:\d{2})?\s*(am|pm)?\b")
+_REMIND_TO_PAY_RE = re.compile(r"^(recu[eé]rdame|recordame|recuerdame)\s+pagar\b")
+_CLEAR_ALL_RE = re.compile(r"^(borrar|eliminar|limpiar)\s+(todo|todas)\b")
+_CLEAR_RECURRINGS_RE = re.compile(r"^(borrar|eliminar|limpiar)\s+recurrentes\b")
+_CLEAR_ALL_RECURRINGS_RE = re.compile(r"\b(borrar|eliminar|limpiar|cancelar)\b.*\b(todos?|todas?)\b.*\b(recurrentes?|suscripciones?)\b")
+_RECURRINGS_CLEAR_RE = re.compile(r"\b(recurrentes?|suscripciones?)\b.*\b(borrar|eliminar|limpiar|cancelar)\b")
+_YEAR_RE = re.compile(r"\b\d{4}\b")
+_NUMERIC_DAY_MONTH_RE = re.compile(r"\b\d{1,2}[/-]\d{1,2}\b")
+_RELATIVE_DAY_RE = re.compile(r"\b(hoy|ayer|anteayer|anoche)\b")
+_NAMED_MONTH_DAY_RE = re.compile(r"\b(\d{1,2})\s*(de)?\s*(ene|feb|mar|abr|may|jun|jul|ago|sep|oct|nov|dic)\b")
+_STABLE_ID_STRIP_RE = re.compile(r"[^A-Z0-9_\-:.]")
+_FOOD_HOME_RE = re.compile(r"\b(pan|leche|huevo|huevos|arroz|pasta|arepa|cafe|café|agua|jugo|fruta|verdura|carne|pollo|mercado|supermercado|tienda|d1|ara|éxito|exito|carulla|jumbo)\b")
+_FOOD_OUT_RE = re.compile(r"\b(restaurante|almuerzo|cena|hamburguesa|pizza|domicilio|rappi|rapi|ubereats|uber eats|didi food|corrientazo)\b")
+_TRANSPORT_RE = re.compile(r"\b(uber|didi|taxi|bus|transmi|metro|gasolina|parqueadero|peaje)\b")
 
 
 def _money_multiplier(suffix: str) -> int:
@@ -74,34 +101,37 @@ def _find_money_spans(text: str) -> list[tuple[int, int, float]]:
             continue
         if not suffix and value < 1000:
             nearby = ((text or "")[max(0, match.start() - 8) : min(len(text or ""), match.end() + 8)]).lower()
-            if "$" not in nearby and not re.search(r"\b(cop|peso|pesos|mil)\b", nearby):
+            if "$" not in nearby and not _COP_WORD_RE.search(nearby):
                 continue
         spans.append((match.start(), match.end(), value))
     return spans
 
 
+def _clean_piece(piece: str) -> str:
+    out = piece.strip(" ,;:.")
+    out = _LEADING_CONNECTOR_RE.sub("", out)
+    out = _TRAILING_CONNECTOR_RE.sub("", out)
+    return out.strip(" ,;:.")
+
+
 def split_multi_transaction_text(text: str) -> list[str]:
-    clean = re.sub(r"\s+", " ", (text or "").strip())
+    clean = _WHITESPACE_RE.sub(" ", (text or "").strip())
     if not clean:
         return []
     spans = _find_money_spans(clean)
     if len(spans) < 2:
         return [clean]
 
-    def _clean_piece(piece: str) -> str:
-        out = piece.strip(" ,;:.")
-        out = re.sub(r"^\s*(y|e)\s+", "", out, flags=re.IGNORECASE)
-        out = re.sub(r"\s+(y|e)\s*$", "", out, flags=re.IGNORECASE)
-        return out.strip(" ,;:.")
-
     segments: list[str] = []
     for idx, (start, end, _) in enumerate(spans):
         prev_end = 0 if idx == 0 else spans[idx - 1][1]
         next_start = len(clean) if idx + 1 >= len(spans) else spans[idx + 1][0]
 
         left_window = clean[prev_end:start]
-        left_matches = list(_MULTI_TX_SEPARATOR_RE.finditer(left_window))
-        segment_start = prev_end + (left_matches[-1].end() if left_matches else 0)
+        last_end = 0
+        for match in _MULTI_TX_SEPARATOR_RE.finditer(left_window):
+            last_end = match.end()
+        segment_start = prev_end + last_end
 
         right_window = clean[end:next_start]
         right_match = _MULTI_TX_SEPARATOR_RE.search(right_window)
@@ -117,8 +147,8 @@ def split_multi_transaction_text(text: str) -> list[str]:
 
 def normalize_amount_slang(text: str) -> str:
     t = str(text or "")
-    t = re.sub(r"(\d+(?:[.,]\d+)?)\s*(k|luka?s?|luca?s?)\b", _slang_mul(1000), t, flags=re.IGNORECASE)
-    t = re.sub(r"(\d+(?:[.,]\d+)?)\s*(m|palo?s?)\b", _slang_mul(1_000_000), t, flags=re.IGNORECASE)
+    t = _THOUSANDS_SLANG_RE.sub(_slang_mul(1000), t)
+    t = _MILLIONS_SLANG_RE.sub(_slang_mul(1_000_000), t)
     return t
 
 
@@ -134,6 +164,32 @@ def _slang_mul(mult: int):
     return _repl
 
 
+# Bare slash commands (mostly keyboard buttons) skip the tokenizer and slang normalization.
+_BARE_COMMAND_ROUTES = {
+    "/start": "help",
+    "/help": "help",
+    "/list": "list",
+    "/summary": "summary",
+    "/recurrings": "recurrings",
+    "/recurrentes": "recurrings",
+    "/download": "download",
+    "/descargar": "download",
+    "/undo": "undo",
+    "/clear": "clear_all",
+    "/wipe": "clear_all",
+    "/borrar_todo": "clear_all",
+    "/clear_recurrings": "clear_recurrings",
+    "/borrar_recurrentes": "clear_recurrings",
+}
+
+# Free-text recurring edits; str.startswith checks a whole tuple in one call.
+_REMINDERS_EDIT_PREFIXES = ("recordatorios ", "reminders ")
+_AMOUNT_UPDATE_PREFIXES = ("monto ", "amount ")
+_PAYMENT_UPDATE_PREFIXES = ("enlace ", "enlance ", "link ", "url ", "referencia ", "ref ")
+_CANCEL_PREFIXES = ("cancelar ", "cancel ")
+_TOGGLE_PREFIXES = ("pausar ", "pausa ", "pause ", "activar ", "activa ", "activate ")
+
+
 def parse_command(
     text: Optional[str],
     chat_id: Optional[int],
@@ -155,104 +211,91 @@ def parse_command(
         )
 
     clean = text.strip()
-    first_token = clean.split()[0].split("@")[0].lower() if clean else ""
-    args = " ".join(clean.split()[1:]).strip()
+    bare_command = clean.lower()
+    bare_route = _BARE_COMMAND_ROUTES.get(bare_command)
+    if bare_route is not None:
+        return ParsedCommand(
+            route=bare_route,
+            command=bare_command,
+            invite_token="",
+            text=clean,
+            text_for_parsing=clean,
+            chat_id=chat_id,
+            user_id=user_id,
+            channel=channel,
+            non_text_type=non_text_type,
+        )
+
+    tokens = clean.split()
+    first_token = tokens[0].split("@")[0].lower() if tokens else ""
+    args = " ".join(tokens[1:]).strip()
+    lower = bare_command
 
     route = "ai"
     invite_token = ""
-    if clean.lower().startswith("recurring:"):
+    if lower.startswith("recurring:"):
         route = "recurring_action"
-    if clean.lower().startswith("dailynudge:"):
+    if lower.startswith("dailynudge:"):
         route = "daily_nudge_action"
-    if first_token == "/start":
-        if args:
-            route = "onboarding"
-            invite_token = args
-        else:
-            route = "help"
-    elif first_token == "/help":
-        route = "help"
-    elif first_token == "/list":
-        route = "list"
-    elif first_token == "/summary":
-        route = "summary"
-    elif first_token in {"/recurrings", "/recurrentes"}:
-        route = "recurrings"
-    elif first_token in {"/download", "/descargar"}:
-        route = "download"
-    elif first_token == "/undo":
-        route = "undo"
-    elif first_token in {"/clear", "/wipe", "/borrar_todo"}:
-        route = "clear_all"
-    elif first_token in {"/clear_recurrings", "/borrar_recurrentes"}:
-        route = "clear_recurrings"
+    # /start is the only command whose route depends on its arguments; the rest
+    # resolve with one lookup in the same table the bare-command fast path uses.
+    command_route = _BARE_COMMAND_ROUTES.get(first_token)
+    if first_token == "/start" and args:
+        route = "onboarding"
+        invite_token = args
+    elif command_route is not None:
+        route = command_route
     else:
-        lower = clean.lower()
         norm = unicodedata.normalize("NFD", lower)
         norm = "".join(ch for ch in norm if unicodedata.category(ch) != "Mn")
-        norm = re.sub(r"\s+", " ", norm).strip()
-        if lower.startswith("recordatorios ") or lower.startswith("reminders "):
+        norm = _WHITESPACE_RE.sub(" ", norm).strip()
+        if lower.startswith(_REMINDERS_EDIT_PREFIXES):
             route = "recurring_edit"
-        elif lower.startswith("monto ") or lower.startswith("amount "):
+        elif lower.startswith(_AMOUNT_UPDATE_PREFIXES):
             route = "recurring_update_amount"
         elif (
-            re.search(
-                r"^(silenciar|silencia|mutear|apagar|desactivar)\b",
-                norm,
-            )
+            _NUDGE_SILENCE_RE.search(norm)
             and (
                 norm in {"silenciar", "silencia", "mutear", "apagar", "desactivar"}
-                or re.search(r"\b(recordatorio|recordatorios|notificacion|notificaciones|aviso|avisos)\b", norm)
+                or _NUDGE_TOPIC_RE.search(norm)
             )
         ):
             route = "daily_nudge_action"
         elif (
-            re.search(
-                r"^(activar|activa|encender|habilitar|habilita|reanudar|reactivar)\b",
-                norm,
-            )
+            _NUDGE_ENABLE_RE.search(norm)
             and (
                 norm in {"activar", "activa", "encender", "habilitar", "habilita", "reanudar", "reactivar"}
-                or re.search(r"\b(recordatorio|recordatorios|notificacion|notificaciones|aviso|avisos)\b", norm)
+                or _NUDGE_TOPIC_RE.search(norm)
             )
         ):
             route = "daily_nudge_action"
         elif (
-            re.search(r"\b(ejemplo|ejemplos|ideas)\b", norm)
-            and re.search(r"\b(recordatorio|recordatorios|notificacion|notificaciones|aviso|avisos)\b", norm)
+            _NUDGE_EXAMPLES_RE.search(norm)
+            and _NUDGE_TOPIC_RE.search(norm)
         ):
             route = "daily_nudge_action"
         elif (
-            re.search(r"\b(cambiar|cambia|ajustar|ajusta|configurar|configura|poner|pon)\b", norm)
-            and re.search(r"\b(hora|recordatorio|recordatorios|notificacion|notificaciones|aviso|avisos)\b", norm)
+            _NUDGE_CHANGE_RE.search(norm)
+            and _NUDGE_TOPIC_OR_HOUR_RE.search(norm)
         ):
             route = "daily_nudge_action"
-        elif re.search(r"^(hora)\s+\d{1,2}(:\d{2})?\s*(am|pm)?\b", norm):
+        elif _NUDGE_HOUR_RE.search(norm):
             route = "daily_nudge_action"
-        elif (
-            lower.startswith("enlace ")
-            or lower.startswith("enlance ")
-            or lower.startswith("link ")
-            or lower.startswith("url ")
-            or lower.startswith("referencia ")
-            or lower.startswith("ref ")
-        ):
+        elif lower.startswith(_PAYMENT_UPDATE_PREFIXES):
             route = "recurring_update_payment"
-        elif lower.startswith("cancelar ") or lower.startswith("cancel "):
+        elif lower.startswith(_CANCEL_PREFIXES):
             route = "recurring_cancel"
-        elif lower.startswith("pausar ") or lower.startswith("pausa ") or lower.startswith("pause "):
+        elif lower.startswith(_TOGGLE_PREFIXES):
             route = "recurring_toggle"
-        elif lower.startswith("activar ") or lower.startswith("activa ") or lower.startswith("activate "):
-            route = "recurring_toggle"
-        elif re.search(r"^(recu[eé]rdame|recordame|recuerdame)\s+pagar\b", lower):
+        elif _REMIND_TO_PAY_RE.search(lower):
             route = "recurring_create"
-        elif re.search(r"^(borrar|eliminar|limpiar)\s+(todo|todas)\b", lower):
+        elif _CLEAR_ALL_RE.search(lower):
             route = "clear_all"
-        elif re.search(r"^(borrar|eliminar|limpiar)\s+recurrentes\b", lower):
+        elif _CLEAR_RECURRINGS_RE.search(lower):
             route = "clear_recurrings"
-        elif re.search(r"\b(borrar|eliminar|limpiar|cancelar)\b.*\b(todos?|todas?)\b.*\b(recurrentes?|suscripciones?)\b", lower):
+        elif _CLEAR_ALL_RECURRINGS_RE.search(lower):
             route = "clear_recurrings"
-        elif re.search(r"\b(recurrentes?|suscripciones?)\b.*\b(borrar|eliminar|limpiar|cancelar)\b", lower):
+        elif _RECURRINGS_CLEAR_RE.search(lower):
             route = "clear_recurrings"
 
     return ParsedCommand(
@@ -278,32 +321,37 @@ def _tz_yesterday(tz_name: str) -> str:
     return now.strftime("%Y-%m-%d")
 
 
-def _user_provided_date(raw_text: str) -> bool:
-    t = raw_text.lower()
-    if re.search(r"\b\d{4}\b", t):
+def _user_provided_date(t: str) -> bool:
+    if _YEAR_RE.search(t):
         return True
-    if re.search(r"\b\d{1,2}[/-]\d{1,2}\b", t):
+    if _NUMERIC_DAY_MONTH_RE.search(t):
         return True
-    if re.search(r"\b(hoy|ayer|anteayer|anoche)\b", t):
+    if _RELATIVE_DAY_RE.search(t):
         return True
-    if re.search(r"\b(\d{1,2})\s*(de)?\s*(ene|feb|mar|abr|may|jun|jul|ago|sep|oct|nov|dic)\b", t):
+    if _NAMED_MONTH_DAY_RE.search(t):
         return True
     return False
 
 
-def _explicit_calendar_date(raw_text: str) -> bool:
-    t = raw_text.lower()
-    if re.search(r"\b\d{4}\b", t):
+def _explicit_calendar_date(t: str) -> bool:
+    if _YEAR_RE.search(t):
         return True
-    if re.search(r"\b\d{1,2}[/-]\d{1,2}\b", t):
+    if _NUMERIC_DAY_MONTH_RE.search(t):
         return True
-    if re.search(r"\b(\d{1,2})\s*(de)?\s*(ene|feb|mar|abr|may|jun|jul|ago|sep|oct|nov|dic)\b", t):
+    if _NAMED_MONTH_DAY_RE.search(t):
         return True
     return False
 
 
 def _is_valid_iso_date(value: str) -> bool:
-    return bool(re.match(r"^\d{4}-\d{2}-\d{2}$", value))
+    return (
+        len(value) == 10
+        and value[4] == "-"
+        and value[7] == "-"
+        and value[:4].isdecimal()
+        and value[5:7].isdecimal()
+        and value[8:].isdecimal()
+    )
 
 
 def _current_year_tz(tz_name: str) -> int:
@@ -311,7 +359,7 @@ def _current_year_tz(tz_name: str) -> int:
 
 
 def _stable_id(prefix: str, value: str) -> str:
-    base = re.sub(r"[^A-Z0-9_\-:.]", "", re.sub(r"\s+", "_", value.upper())).strip()
+    base = _STABLE_ID_STRIP_RE.sub("", _WHITESPACE_RE.sub("_", value.upper())).strip()
     base = base[:40]
     return f"{prefix}:{base}" if base else ""
 
@@ -346,10 +394,11 @@ def normalize_ai_response(
     tz_name = settings.timezone or "America/Bogota"
     today = _tz_today(tz_name)
     yesterday = _tz_yesterday(tz_name)
-    has_user_date = _user_provided_date(raw_text)
+    raw_lower = raw_text.lower()
+    has_user_date = _user_provided_date(raw_lower)
     current_year = _current_year_tz(tz_name)
-    mentions_anoche = "anoche" in raw_text.lower()
-    explicit_calendar_date = _explicit_calendar_date(raw_text)
+    mentions_anoche = "anoche" in raw_lower
+    explicit_calendar_date = _explicit_calendar_date(raw_lower)
 
     def _safe_float(value: Any, default: float = 0) -> float:
         try:
@@ -401,13 +450,13 @@ def normalize_ai_response(
     if not tx["category"]:
         tx["category"] = "misc"
 
-    blob = f"{raw_text} {tx['description']} {tx['normalizedMerchant']}".lower()
+    blob = f"{raw_lower} {tx['description'].lower()} {tx['normalizedMerchant'].lower()}"
     if tx["category"] == "misc":
-        if re.search(r"\b(pan|leche|huevo|huevos|arroz|pasta|arepa|cafe|café|agua|jugo|fruta|verdura|carne|pollo|mercado|supermercado|tienda|d1|ara|éxito|exito|carulla|jumbo)\b", blob):
+        if _FOOD_HOME_RE.search(blob):
             tx["category"] = "food_home"
-        elif re.search(r"\b(restaurante|almuerzo|cena|hamburguesa|pizza|domicilio|rappi|rapi|ubereats|uber eats|didi food|corrientazo)\b", blob):
+        elif _FOOD_OUT_RE.search(blob):
             tx["category"] = "food_out"
-        elif re.search(r"\b(uber|didi|taxi|bus|transmi|metro|gasolina|parqueadero|peaje)\b", blob):
+        elif _TRANSPORT_RE.search(blob):
             tx["category"] = "transport"
 
     if tx["transactionKind"] == "loan":
@@ -483,70 +532,78 @@ def normalize_types(tx: Dict[str, Any]) -> Dict[str, Any]:
     return tx
 
 
+_SYSTEM_PROMPT_BODY = (
+    "You are a financial assistant. Extract structured data from a single user message.\n\n"
+    "Return JSON ONLY. No markdown, no backticks.\n\n"
+    "General rules:\n"
+    "- Currency is always COP. Always output currency='COP' exactly.\n"
+    "- If user writes USD/EUR/other symbols, ignore that and keep currency='COP'.\n"
+    "- paymentMethod defaults to 'cash' when unspecified.\n"
+    "- Date must be YYYY-MM-DD. Use Current Date (America/Bogota) when user did not specify a date.\n"
+    "- Relative time: interpret \"anoche\" as yesterday's date (America/Bogota).\n"
+    "- Amount: support slang: k/lukas=1,000; m/palo(s)=1,000,000.\n\n"
+    "Intent rules (for natural language):\n"
+    "- intent: 'add_tx' by default.\n"
+    "- If user asks for help => intent='help'.\n"
+    "- If user asks to list movements => intent='list'.\n"
+    "- If user asks for monthly summary => intent='summary'.\n\n"
+    "- If user asks to download/export transactions => intent='download'.\n\n"
+    "Type:\n"
+    "- type: 'expense' or 'income'.\n"
+    "- If verbs like \"me pagaron\", \"recibi\", \"reembolso\" => type='income'.\n"
+    "- If verbs like \"compre\", \"pague\", \"gaste\" => type='expense'.\n\n"
+    "transactionKind:\n"
+    "- 'regular' (default)\n"
+    "- 'loan' when lending/borrowing/repaying (e.g., 'le presté', 'me prestaron', 'me pagó', 'le pagué')\n"
+    "- 'transfer' when moving money between own accounts (e.g., \"pase a mi cuenta\", \"traspaso entre cuentas\").\n\n"
+    "Loans (only if transactionKind='loan'):\n"
+    "- counterparty: person/entity name if any.\n"
+    "- loanRole: 'lent' | 'borrowed' | 'repayment'.\n"
+    "- loanId: stable id like 'LOAN:<COUNTERPARTY>' when possible.\n\n"
+    "Recurring:\n"
+    "- isRecurring: true if periodic payment is indicated (mensual, cada mes, semanal, trimestral, anual, suscripción, cada quincena, todos los meses, cada 15 días).\n"
+    "- If periodicity is NOT explicit, set isRecurring=false.\n"
+    "- Common recurring clues: internet, luz, agua, gas, celular, arriendo, streaming, suscripciones.\n"
+    "- recurrence: 'weekly'|'biweekly'|'monthly'|'quarterly'|'yearly' when isRecurring=true.\n"
+    "- recurrenceId: stable id like 'REC:<NORMALIZED_MERCHANT>'.\n\n"
+    "Categories (choose ONE, avoid 'misc' unless nothing fits):\n"
+    "- food_home (pan, café, snacks, mercado, supermercado, D1, Ara, Éxito)\n"
+    "- food_out (restaurante, hamburguesa, pizza, domicilio, Rappi)\n"
+    "- transport (uber, didi, taxi, bus, gasolina, parqueadero)\n"
+    "- housing (arriendo, hipoteca)\n"
+    "- utilities (luz, agua, gas, internet, celular)\n"
+    "- health (medicina, doctor, farmacia)\n"
+    "- shopping (ropa, compras)\n"
+    "- entertainment (cine, juegos)\n"
+    "- education (curso, universidad)\n"
+    "- subscriptions (netflix, spotify, suscripción)\n"
+    "- debt (cuota, interés)\n"
+    "- travel (hotel, vuelo, viaje)\n"
+    "- misc\n\n"
+    "normalizedMerchant: short normalized merchant name if possible (Uber, Netflix, Exito).\n"
+    "paymentMethod: one of 'cash'|'card'|'transfer'|'wallet'.\n"
+    "- If text mentions \"tarjeta\", \"debito\", \"credito\" => paymentMethod='card'.\n"
+    "- If text mentions \"transferencia\", \"transferi\", \"traspaso\" => paymentMethod='transfer'.\n"
+    "- If text mentions \"nequi\", \"daviplata\" => paymentMethod='wallet'.\n"
+    "parseConfidence: number 0..1 indicating your confidence. Use low values when amount/date are missing or ambiguous.\n\n"
+    "Output fields (all in one JSON object):\n"
+    "intent, type, transactionKind, amount, currency, category, description, date,\n"
+    "normalizedMerchant, paymentMethod,\n"
+    "counterparty, loanRole, loanId,\n"
+    "isRecurring, recurrence, recurrenceId,\n"
+    "parseConfidence\n\n"
+)
+
+
+@lru_cache(maxsize=4)
+def _system_prompt_for(today: str) -> str:
+    return f"{_SYSTEM_PROMPT_BODY}Current Date (America/Bogota): {today}"
+
+
 def build_system_prompt(settings: Settings) -> str:
+    # Only the date line changes, so every message of the day gets the same prompt string back.
     today = datetime.now(ZoneInfo(settings.timezone)).strftime("%Y-%m-%d")
-    return (
-        "You are a financial assistant. Extract structured data from a single user message.\n\n"
-        "Return JSON ONLY. No markdown, no backticks.\n\n"
-        "General rules:\n"
-        "- Currency is always COP. Always output currency='COP' exactly.\n"
-        "- If user writes USD/EUR/other symbols, ignore that and keep currency='COP'.\n"
-        "- paymentMethod defaults to 'cash' when unspecified.\n"
-        "- Date must be YYYY-MM-DD. Use Current Date (America/Bogota) when user did not specify a date.\n"
-        "- Relative time: interpret \"anoche\" as yesterday's date (America/Bogota).\n"
-        "- Amount: support slang: k/lukas=1,000; m/palo(s)=1,000,000.\n\n"
-        "Intent rules (for natural language):\n"
-        "- intent: 'add_tx' by default.\n"
-        "- If user asks for help => intent='help'.\n"
-        "- If user asks to list movements => intent='list'.\n"
-        "- If user asks for monthly summary => intent='summary'.\n\n"
-        "- If user asks to download/export transactions => intent='download'.\n\n"
-        "Type:\n"
-        "- type: 'expense' or 'income'.\n"
-        "- If verbs like \"me pagaron\", \"recibi\", \"reembolso\" => type='income'.\n"
-        "- If verbs like \"compre\", \"pague\", \"gaste\" => type='expense'.\n\n"
-        "transactionKind:\n"
-        "- 'regular' (default)\n"
-        "- 'loan' when lending/borrowing/repaying (e.g., 'le presté', 'me prestaron', 'me pagó', 'le pagué')\n"
-        "- 'transfer' when moving money between own accounts (e.g., \"pase a mi cuenta\", \"traspaso entre cuentas\").\n\n"
-        "Loans (only if transactionKind='loan'):\n"
-        "- counterparty: person/entity name if any.\n"
-        "- loanRole: 'lent' | 'borrowed' | 'repayment'.\n"
-        "- loanId: stable id like 'LOAN:<COUNTERPARTY>' when possible.\n\n"
-        "Recurring:\n"
-        "- isRecurring: true if periodic payment is indicated (mensual, cada mes, semanal, trimestral, anual, suscripción, cada quincena, todos los meses, cada 15 días).\n"
-        "- If periodicity is NOT explicit, set isRecurring=false.\n"
-        "- Common recurring clues: internet, luz, agua, gas, celular, arriendo, streaming, suscripciones.\n"
-        "- recurrence: 'weekly'|'biweekly'|'monthly'|'quarterly'|'yearly' when isRecurring=true.\n"
-        "- recurrenceId: stable id like 'REC:<NORMALIZED_MERCHANT>'.\n\n"
-        "Categories (choose ONE, avoid 'misc' unless nothing fits):\n"
-        "- food_home (pan, café, snacks, mercado, supermercado, D1, Ara, Éxito)\n"
-        "- food_out (restaurante, hamburguesa, pizza, domicilio, Rappi)\n"
-        "- transport (uber, didi, taxi, bus, gasolina, parqueadero)\n"
-        "- housing (arriendo, hipoteca)\n"
-        "- utilities (luz, agua, gas, internet, celular)\n"
-        "- health (medicina, doctor, farmacia)\n"
-        "- shopping (ropa, compras)\n"
-        "- entertainment (cine, juegos)\n"
-        "- education (curso, universidad)\n"
-        "- subscriptions (netflix, spotify, suscripción)\n"
-        "- debt (cuota, interés)\n"
-        "- travel (hotel, vuelo, viaje)\n"
-        "- misc\n\n"
-        "normalizedMerchant: short normalized merchant name if possible (Uber, Netflix, Exito).\n"
-        "paymentMethod: one of 'cash'|'card'|'transfer'|'wallet'.\n"
-        "- If text mentions \"tarjeta\", \"debito\", \"credito\" => paymentMethod='card'.\n"
-        "- If text mentions \"transferencia\", \"transferi\", \"traspaso\" => paymentMethod='transfer'.\n"
-        "- If text mentions \"nequi\", \"daviplata\" => paymentMethod='wallet'.\n"
-        "parseConfidence: number 0..1 indicating your confidence. Use low values when amount/date are missing or ambiguous.\n\n"
-        "Output fields (all in one JSON object):\n"
-        "intent, type, transactionKind, amount, currency, category, description, date,\n"
-        "normalizedMerchant, paymentMethod,\n"
-        "counterparty, loanRole, loanId,\n"
-        "isRecurring, recurrence, recurrenceId,\n"
-        "parseConfidence\n\n"
-        f"Current Date (America/Bogota): {today}"
-    )
+    return _system_prompt_for(today)
 
 
 def escape_html(text: str) -> str:
@@ -1,17 +1,23 @@
 ﻿from __future__ import annotations
 
-from dataclasses import dataclass
-from datetime import datetime, timedelta, timezone
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
 import re
 import time
 import unicodedata
-from typing import Any, Dict, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, Optional
 
 from app.bot.formatters import (
     HELP_MESSAGE,
     LONG_MESSAGE,
     NON_TEXT_MESSAGE,
     ONBOARDING_SUCCESS_MESSAGE,
+    TRANSCRIBING_MESSAGE,
     UNAUTHORIZED_MESSAGE,
     format_add_tx_message,
     format_list_message,
@@ -21,8 +27,14 @@ from app.bot.formatters import (
     format_summary_message,
     format_undo_message,
 )
-from app.bot.exporters import build_transactions_xlsx
 from app.bot.parser import (
+    _NUDGE_ENABLE_RE,
+    _NUDGE_EXAMPLES_RE,
+    _NUDGE_HOUR_RE,
+    _NUDGE_SILENCE_RE,
+    _NUDGE_TOPIC_OR_HOUR_RE,
+    _NUDGE_TOPIC_RE,
+    _WHITESPACE_RE,
     build_system_prompt,
     generate_tx_id,
     normalize_ai_response,
@@ -35,12 +47,13 @@ from app.bot.ui_models import BotAction, BotInput, BotKeyboard, BotMessage
 from app.bot.recurring_flow import (
     PENDING_RECURRING_ACTION,
     PENDING_RECURRING_OFFER_ACTION,
+    RECURRENCE_LABELS,
     build_setup_question,
     build_setup_summary,
+    classify_yes_no,
     compute_next_due,
     get_today,
     handle_setup_step,
-    is_affirmative,
     is_negative,
     parse_amount,
     parse_amount_in_context,
@@ -67,6 +80,13 @@ PENDING_DAILY_NUDGE_SET_HOUR = "daily_nudge_set_hour"
 PENDING_RECURRING_CANCEL_CONFIRM = "recurring_cancel_confirm"
 DAILY_NUDGE_PREFS_ACTION = "daily_nudge_prefs"
 PENDING_ACTION_TTL_MINUTES = 20
+MULTI_SEGMENT_CONCURRENCY = 4
+MULTI_SEGMENT_BATCH_MAX_SEGMENTS = 8
+USER_CACHE_MAX_ENTRIES = 1024
+FOLD_CACHE_MAX_ENTRIES = 4096
+TIMESTAMP_CACHE_MAX_ENTRIES = 1024
+EXPORT_MAX_WORKERS = 2
+AI_RESPONSE_CACHE_MAX_ENTRIES = 1024
 PENDING_EXPIRED_MESSAGE = (
     "⌛ <b>Esta confirmación expiró</b>\n"
     "Repite la acción para continuar."
@@ -77,6 +97,99 @@ AI_UNAVAILABLE_FALLBACK_MESSAGE = (
     "Ejemplo: <code>almuerzo 15000</code>"
 )
 
+_RouteHandler = Callable[[Dict[str, Any], Any, BotInput], Awaitable[BotMessage]]
+ReplySender = Callable[[BotMessage], Awaitable[None]]
+
+# Falsy values on these fields are replaced when a parsed transaction is finalized.
+_TX_DEFAULTS: Dict[str, Any] = {
+    "paymentMethod": "cash",
+    "normalizedMerchant": "",
+    "transactionKind": "regular",
+    "recurrence": "",
+    "recurrenceId": "",
+    "counterparty": "",
+    "loanRole": "",
+    "loanId": "",
+    "parseConfidence": 0.7,
+    "parserVersion": "mvp-v1",
+}
+
+# Constant fields of the expense recorded when a recurring bill is confirmed as paid.
+_RECURRING_PAID_TX_TEMPLATE: Dict[str, Any] = {
+    "type": "expense",
+    "transactionKind": "regular",
+    "paymentMethod": "cash",
+    "counterparty": "",
+    "loanRole": "",
+    "loanId": "",
+    "isRecurring": True,
+    "parseConfidence": 0.9,
+    "parserVersion": "recurring-v1",
+    "source": "recurring",
+    "sourceMessageId": "",
+    "rawText": "recurring:auto",
+    "isDeleted": False,
+    "deletedAt": "",
+}
+
+_INCOME_HINT_RE = re.compile(r"\b(me pagaron|recibi|recibí|ingreso|gan[eé]|salario|reembolso)\b")
+_EXPLICIT_ID_RE = re.compile(r"\b(?:id|codigo|c[oó]digo)\s*#?\s*(\d+)\b", re.IGNORECASE)
+_HASH_ID_RE = re.compile(r"#\s*(\d+)\b")
+_DAY_OF_EACH_MONTH_RE = re.compile(r"\b(\d{1,2})\s+de\s+cada\s+mes\b")
+_EL_DAY_OF_EACH_MONTH_RE = re.compile(r"\bel\s+(\d{1,2})\s+de\s+cada\s+mes\b")
+_TODOS_LOS_DAY_RE = re.compile(r"\btodos?\s+los\s+(\d{1,2})\b")
+_EL_DAY_RE = re.compile(r"\bel\s+(\d{1,2})\b")
+_AMOUNT_UPDATE_HINT_RE = re.compile(r"\b(monto|valor|sube|subir|baja|bajar|ajusta|ajustar|cambia|cambiar|actualiza|actualizar)\b")
+_URL_PREFIX_RE = re.compile(r"^(https?://|www\.)", re.IGNORECASE)
+_URL_RE = re.compile(r"(https?://[^\s]+|www\.[^\s]+)", re.IGNORECASE)
+_PAYMENT_REFERENCE_RE = re.compile(r"\b(?:referencia|ref(?:erencia)?|convenio|cuenta)\s*[:#-]?\s*([A-Za-z0-9\-_.]{3,64})\b", re.IGNORECASE)
+_HOUR_HINT_RE = re.compile(r"\ba las\b|\bhora\b")
+_INTEGER_RE = re.compile(r"\b\d+\b")
+_RECURRING_HINT_RE = re.compile(r"\b(recurrente|recurrentes|suscripcion|suscripciones|recordatorio|recordatorios)\b")
+_LINK_UPDATE_HINT_RE = re.compile(r"\b(enlace|enlance|link|url|portal|referencia|ref)\b")
+_UPDATE_VERB_RE = re.compile(r"\b(actualiza|actualizar|cambia|cambiar|agrega|agregar|pon|poner|deja)\b")
+_PAYMENT_NOUN_RE = re.compile(r"\b(pagar|pago|factura|recibo|cobro|suscripcion)\b")
+_REMIND_ME_RE = re.compile(r"\b(recordame|recuerdame|avisame)\b")
+_CREATE_RECURRING_RE = re.compile(r"\b(nuevo|crear|crea|agregar|agrega)\b.*\b(recordatorio|recurrente|suscripcion)\b")
+_OFFSET_LIST_RE = re.compile(r"\d+\s*,\s*\d+")
+_REMINDERS_WORD_RE = re.compile(r"\b(recordatorios?|avisos?)\b")
+_CANCEL_VERB_RE = re.compile(r"\b(cancela|cancelar|elimina|eliminar)\b")
+_PAUSE_VERB_RE = re.compile(r"\b(pausa|pausar|deten|detener|frena|desactiva|desactivar)\b")
+_ACTIVATE_VERB_RE = re.compile(r"\b(activa|activar|reanuda|reanudar)\b")
+_REMINDER_DETAILS_HINT_RE = re.compile(r"\b(recordatorio|recordatorios|av[ií]same|avisa|avisar|d[ií]as?\s+antes|mismo\s+d[ií]a|d[ií]a\s+del\s+cobro)\b")
+_SETUP_REFERENCE_RE = re.compile(r"\b(?:ref(?:erencia)?|convenio|cuenta)\s*[:#-]?\s*([A-Za-z0-9\-_.]{4,64})\b", re.IGNORECASE)
+_EVERY_DAY_RE = re.compile(r"(?:todos?\s+los|cada)\s+(\d{1,2})\b")
+_CADA_MES_EL_DAY_RE = re.compile(r"\bcada\s+mes\s+el\s+(\d{1,2})\b")
+_CADA_MES_DAY_RE = re.compile(r"\bcada\s+mes\s+(\d{1,2})\b")
+_NATURAL_BILLING_DAY_PATTERNS = (_DAY_OF_EACH_MONTH_RE, _EL_DAY_OF_EACH_MONTH_RE, _TODOS_LOS_DAY_RE, _EL_DAY_RE)
+_SETUP_BILLING_DAY_PATTERNS = (
+    _EVERY_DAY_RE,
+    _DAY_OF_EACH_MONTH_RE,
+    _EL_DAY_OF_EACH_MONTH_RE,
+    _CADA_MES_EL_DAY_RE,
+    _CADA_MES_DAY_RE,
+)
+_REMINDERS_COMMAND_PREFIX_RE = re.compile(r"^\s*recordatorios?\s+(?:codigo|c[oó]digo|id)\s*#?\s*\d+\s*", re.IGNORECASE)
+_AMOUNT_COMMAND_PREFIX_RE = re.compile(r"^\s*(?:monto|amount)\s+(?:codigo|c[oó]digo|id)\s*#?\s*\d+\s*", re.IGNORECASE)
+_NUDGE_CHANGE_OR_HOUR_RE = re.compile(r"\b(cambiar|cambia|ajustar|ajusta|configurar|configura|poner|pon|hora)\b")
+# One alternation so the gate scans the message once instead of once per pattern.
+_RECURRING_REQUEST_RE = re.compile(
+    "|".join(
+        f"(?:{pattern})"
+        for pattern in (
+            r"\b(recordatorio|recordatorios|recurrente|recurrentes|suscripcion|suscripciones)\b",
+            r"\b(cada\s+mes|todos?\s+los\s+meses|mensual|semanal|quincenal|trimestral|anual)\b",
+            r"\bid\s*#?\s*\d+\b.*\b(cambiar|actualizar|monto|valor|hora|pausar|activar|cancelar)\b",
+            r"\b(codigo|c[oó]digo)\s*#?\s*\d+\b.*\b(cambiar|actualizar|monto|valor|hora|pausar|activar|cancelar)\b",
+            r"\b(a\s+las\s+\d{1,2}(:\d{2})?\s*(am|pm)?)\b",
+            r"\b(sube|subir|baja|bajar|ajusta|ajustar|cambia|cambiar|actualiza|actualizar|monto|valor|pausa|pausar|activar|activa|cancelar|cancela)\b",
+            r"\b(enlace|enalce|enlance|link|url|portal|referencia|ref)\b",
+            r"(https?://[^\s]+|www\.[^\s]+)",
+        )
+    )
+)
+_NUDGE_CHANGE_RE = re.compile(r"\b(cambiar|cambia|ajustar|ajusta|configurar|configura)\b")
+
 ACTION_LIST = BotAction("/list", "🧾 Movimientos")
 ACTION_SUMMARY = BotAction("/summary", "📊 Resumen")
 ACTION_UNDO = BotAction("/undo", "↩️ Deshacer")
@@ -85,18 +198,216 @@ ACTION_DOWNLOAD = BotAction("/download", "⬇️ Descargar")
 ACTION_RECURRINGS = BotAction("/recurrings", "🔁 Recurrentes")
 ACTION_CONFIRM_YES = BotAction("confirm:yes", "✅ Sí")
 ACTION_CONFIRM_NO = BotAction("confirm:no", "❌ No")
+ACTION_DAILY_NUDGE_ENABLE = BotAction("dailynudge:enable", "🔔 Activar recordatorio")
+ACTION_DAILY_NUDGE_SET_HOUR = BotAction("dailynudge:set_hour", "🕖 Cambiar hora")
 
 
 def _kb(*rows: list[BotAction]) -> BotKeyboard:
     return BotKeyboard(rows=[row for row in rows if row])
 
 
-def _kb_main() -> BotKeyboard:
-    return _kb([ACTION_LIST, ACTION_SUMMARY], [ACTION_RECURRINGS, ACTION_DOWNLOAD], [ACTION_HELP])
+# Keyboards are immutable, so the fixed layouts are built once and shared by every reply.
+KB_MAIN = _kb([ACTION_LIST, ACTION_SUMMARY], [ACTION_RECURRINGS, ACTION_DOWNLOAD], [ACTION_HELP])
+KB_AFTER_SAVE = _kb([ACTION_UNDO, ACTION_LIST], [ACTION_SUMMARY, ACTION_RECURRINGS], [ACTION_HELP])
+KB_AFTER_LIST = _kb([ACTION_UNDO, ACTION_SUMMARY], [ACTION_RECURRINGS, ACTION_DOWNLOAD], [ACTION_HELP])
+KB_AFTER_SUMMARY = _kb([ACTION_LIST, ACTION_UNDO], [ACTION_RECURRINGS, ACTION_DOWNLOAD], [ACTION_HELP])
+KB_HELP = _kb([ACTION_HELP])
+KB_CONFIRM = _kb([ACTION_CONFIRM_YES, ACTION_CONFIRM_NO], [ACTION_HELP])
+KB_CANCEL = _kb([ACTION_CONFIRM_NO], [ACTION_HELP])
+KB_SAVED_OFFER_RECURRING = _kb([ACTION_CONFIRM_YES, ACTION_CONFIRM_NO], [ACTION_UNDO, ACTION_LIST], [ACTION_HELP])
+KB_RECURRING = _kb([ACTION_RECURRINGS, ACTION_HELP])
+KB_RECURRING_NAV = _kb([ACTION_RECURRINGS, ACTION_LIST], [ACTION_SUMMARY, ACTION_HELP])
+KB_RECURRING_CONFIRM = _kb([ACTION_CONFIRM_YES, ACTION_CONFIRM_NO], [ACTION_RECURRINGS, ACTION_HELP])
+KB_RECURRING_CANCEL = _kb([ACTION_CONFIRM_NO], [ACTION_RECURRINGS, ACTION_HELP])
+KB_DAILY_NUDGE_ENABLE = _kb([ACTION_DAILY_NUDGE_ENABLE], [ACTION_HELP])
+KB_DAILY_NUDGE_ENABLED = _kb([ACTION_LIST, ACTION_SUMMARY], [ACTION_HELP, ACTION_DAILY_NUDGE_SET_HOUR])
+KB_DAILY_NUDGE_SET_HOUR = _kb([ACTION_DAILY_NUDGE_SET_HOUR], [ACTION_HELP])
+
+_HOUR_LABELS = tuple(f"{hour:02d}:00" for hour in range(24))
+
+
+_MULTI_SEGMENT_BATCH_PROMPT = (
+    "\n\nBatch mode: the user message has {count} numbered lines, each one a separate transaction. "
+    "Apply the rules above to every line on its own and return JSON ONLY as "
+    "{{\"transactions\": [...]}} with exactly {count} objects, in the same order as the lines."
+)
+
+
+def _batch_segments(segments: list[str], max_chars: int) -> list[list[str]]:
+    # Greedy, order-preserving packing: short segments share one Groq call instead of paying one RTT each.
+    if max_chars <= 0:
+        return [[segment] for segment in segments]
+    batches: list[list[str]] = []
+    current: list[str] = []
+    size = 0
+    for segment in segments:
+        if current and (size + len(segment) > max_chars or len(current) >= MULTI_SEGMENT_BATCH_MAX_SEGMENTS):
+            batches.append(current)
+            current, size = [], 0
+        current.append(segment)
+        size += len(segment)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _unmarshal_batch(content: str, count: int) -> Optional[list[Dict[str, Any]]]:
+    try:
+        parsed = extract_json(content)
+    except ValueError:
+        return None
+    items = parsed.get("transactions") if isinstance(parsed, dict) else None
+    if not isinstance(items, list) or len(items) != count or not all(isinstance(item, dict) for item in items):
+        return None
+    return items
+
+
+_RECURRING_PARSER_SYSTEM_PROMPT = (
+    "Eres un parser experto de recordatorios recurrentes de pago en español.\n"
+    "Objetivo: extraer intención + campos estructurados desde texto natural.\n"
+    "Responde SOLO JSON válido (sin markdown, sin comentarios).\n"
+    "No inventes datos: si no aparece en el texto, usa null o [] según corresponda.\n"
+    "Si no es un caso de recurrentes, usa intent=none.\n\n"
+    "Schema exacto:\n"
+    "{\n"
+    '  "intent": "none|create|update|pause|activate|cancel|list",\n'
+    '  "target_id": number|null,\n'
+    '  "service_name": string|null,\n'
+    '  "amount": number|null,\n'
+    '  "payment_link": string|null,\n'
+    '  "payment_reference": string|null,\n'
+    '  "recurrence": "weekly|biweekly|monthly|quarterly|yearly"|null,\n'
+    '  "billing_day": number|null,\n'
+    '  "reminder_hour": number|null,\n'
+    '  "remind_offsets": number[],\n'
+    '  "includes_same_day": boolean,\n'
+    '  "confidence": number\n'
+    "}\n\n"
+    "Reglas de extracción:\n"
+    "- reminder_hour: entero 0..23. Ej: '6 pm'->18, '2:30 pm'->14.\n"
+    "- billing_day: día del mes 1..31 cuando aparezca ('16 de cada mes', 'el 5').\n"
+    "- remind_offsets: días antes del cobro en orden descendente, sin repetidos.\n"
+    "- includes_same_day=true cuando aparezca 'mismo día', 'el día', 'día del cobro', 'hoy', '0 días'.\n"
+    "- Si includes_same_day=true, asegúrate de incluir 0 en remind_offsets.\n"
+    "- amount: número absoluto (ej: 56k->56000).\n"
+    "- payment_link: URL si aparece (http/https o www).\n"
+    "- payment_reference: referencia/convenio/cuenta si aparece.\n"
+    "- target_id: solo si el texto menciona ID explícito.\n\n"
+    "Ejemplos:\n"
+    "Input: 'ID 2 actualizar a las 3 pm, recordatorio 3 dias y el mismo dia'\n"
+    'Output: {"intent":"update","target_id":2,"service_name":null,"amount":null,"recurrence":null,"billing_day":null,"reminder_hour":15,"remind_offsets":[3,0],"includes_same_day":true,"confidence":0.93}\n'
+    "Input: 'pago recurrente de 56k para luz a las 6 pm'\n"
+    'Output: {"intent":"create","target_id":null,"service_name":"luz","amount":56000,"payment_link":null,"payment_reference":null,"recurrence":"monthly","billing_day":null,"reminder_hour":18,"remind_offsets":[],"includes_same_day":false,"confidence":0.89}\n'
+    "Input: 'este es el enlance del código 1: https://pagos.com ref 778899'\n"
+    'Output: {"intent":"update","target_id":1,"service_name":null,"amount":null,"payment_link":"https://pagos.com","payment_reference":"778899","recurrence":null,"billing_day":null,"reminder_hour":null,"remind_offsets":[],"includes_same_day":false,"confidence":0.95}\n'
+    "Input: 'almuerzo 20000'\n"
+    'Output: {"intent":"none","target_id":null,"service_name":null,"amount":null,"payment_link":null,"payment_reference":null,"recurrence":null,"billing_day":null,"reminder_hour":null,"remind_offsets":[],"includes_same_day":false,"confidence":0.98}'
+)
+
+
+@dataclass(frozen=True, slots=True)
+class RecurringNameIndex:
+    # Parallel tuples: folded display name, its matchable tokens, the score of a full-name hit, and the source row.
+    names: tuple[str, ...]
+    tokens: tuple[tuple[str, ...], ...]
+    full_scores: tuple[int, ...]
+    items: tuple[Dict[str, Any], ...]
+
+    @classmethod
+    def build(cls, items: list[Dict[str, Any]]) -> RecurringNameIndex:
+        names: list[str] = []
+        tokens: list[tuple[str, ...]] = []
+        full_scores: list[int] = []
+        rows: list[Dict[str, Any]] = []
+        for item in items:
+            name = str(item.get("service_name") or item.get("normalized_merchant") or item.get("description") or "").strip()
+            norm_name = _fold_text(name) if name else ""
+            if not norm_name:
+                continue
+            name_tokens = _name_tokens(norm_name)
+            names.append(norm_name)
+            tokens.append(name_tokens)
+            # Every token is a substring of the name, so a full-name hit also matches all of them.
+            full_scores.append(len(norm_name) + 20 + sum(len(tok) for tok in name_tokens))
+            rows.append(item)
+        return cls(tuple(names), tuple(tokens), tuple(full_scores), tuple(rows))
+
+
+@dataclass(slots=True)
+class RequestContext:
+    # Per-update memo of list queries; cleared whenever the matching rows are written.
+    transactions: Dict[str, list[Dict[str, Any]]] = field(default_factory=dict)
+    recurrings: Dict[tuple[str, Optional[str], bool], list[Dict[str, Any]]] = field(default_factory=dict)
+    recurring_name_indexes: Dict[str, RecurringNameIndex] = field(default_factory=dict)
+    recurrings_by_id: Dict[int, Optional[Dict[str, Any]]] = field(default_factory=dict)
+    daily_nudge_prefs: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+
+_request_context: ContextVar[Optional[RequestContext]] = ContextVar("request_context", default=None)
+
+
+@lru_cache(maxsize=FOLD_CACHE_MAX_ENTRIES)
+def _fold_text(text: str) -> str:
+    # The same message and recurring names are folded by several matchers per turn; memoize the NFD pass.
+    raw = unicodedata.normalize("NFD", text.strip().lower())
+    raw = "".join(ch for ch in raw if unicodedata.category(ch) != "Mn")
+    return _WHITESPACE_RE.sub(" ", raw)
+
+
+def _may_contain_url(lower: str) -> bool:
+    # _URL_RE can only match around "http" or "www."; a substring test rules most messages out without a regex scan.
+    return "http" in lower or "www." in lower
+
+
+@lru_cache(maxsize=FOLD_CACHE_MAX_ENTRIES)
+def _name_tokens(norm_name: str) -> tuple[str, ...]:
+    # Include short merchant tokens like "luz", "gas", "agua".
+    return tuple(tok for tok in norm_name.split() if len(tok) >= 3)
+
+
+@lru_cache(maxsize=TIMESTAMP_CACHE_MAX_ENTRIES)
+def _parse_iso_epoch(value: str) -> Optional[float]:
+    # Pending rows are re-checked on every message, so the same expires_at strings come back repeatedly.
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+@lru_cache(maxsize=TIMESTAMP_CACHE_MAX_ENTRIES)
+def _parse_iso_date_value(value: str) -> Optional[date]:
+    # Due and anchor dates repeat across a user's recurrings; malformed ones would otherwise raise every time.
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def _timestamp_or_min(value: Any) -> float:
+    if not value:
+        return float("-inf")
+    if isinstance(value, datetime):
+        dt = value
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt.timestamp()
+    epoch = _parse_iso_epoch(str(value))
+    return epoch if epoch is not None else float("-inf")
 
 
-def _kb_after_save() -> BotKeyboard:
-    return _kb([ACTION_UNDO, ACTION_LIST], [ACTION_SUMMARY, ACTION_RECURRINGS], [ACTION_HELP])
+def _recurring_recency_key(item: Dict[str, Any]) -> tuple[float, float, int]:
+    created_ts = _timestamp_or_min(item.get("created_at") or item.get("createdAt"))
+    updated_ts = _timestamp_or_min(item.get("updated_at") or item.get("updatedAt"))
+    try:
+        rid = int(item.get("id") or 0)
+    except (TypeError, ValueError):
+        rid = 0
+    return (updated_ts, created_ts, rid)
 
 
 class PipelineBase:
@@ -104,12 +415,170 @@ class PipelineBase:
         self.settings = settings
         self._repo = repo
         self._groq = groq
+        self._user_cache: Dict[tuple[str, str], tuple[float, Dict[str, Any]]] = {}
+        self._last_seen_touched: Dict[tuple[str, str], float] = {}
+        self._export_executor = ThreadPoolExecutor(max_workers=EXPORT_MAX_WORKERS, thread_name_prefix="xlsx-export")
+
+    async def aclose(self) -> None:
+        if self._groq is not None:
+            await self._groq.aclose()
+        self._export_executor.shutdown(wait=False)
+
+    def _get_cached_user(self, channel: str, external_user_id: str) -> Optional[Dict[str, Any]]:
+        # Nothing in the bot changes a user's status besides onboarding (which invalidates); deactivations
+        # are done in the database, so a cached active user keeps access for at most user_cache_ttl_seconds.
+        entry = self._user_cache.get((channel, external_user_id))
+        if entry is None:
+            return None
+        cached_at, user = entry
+        if time.monotonic() - cached_at >= self.settings.user_cache_ttl_seconds:
+            self._user_cache.pop((channel, external_user_id), None)
+            return None
+        return user
+
+    def _cache_user(self, channel: str, external_user_id: str, user: Dict[str, Any]) -> None:
+        if self.settings.user_cache_ttl_seconds <= 0:
+            return
+        if len(self._user_cache) >= USER_CACHE_MAX_ENTRIES:
+            self._user_cache.pop(next(iter(self._user_cache)))
+        self._user_cache[(channel, external_user_id)] = (time.monotonic(), user)
+
+    def _invalidate_user(self, channel: str, external_user_id: str) -> None:
+        self._user_cache.pop((channel, external_user_id), None)
+        self._last_seen_touched.pop((channel, external_user_id), None)
+
+    def _mark_last_seen(self, channel: str, external_user_id: str, now: float) -> None:
+        if len(self._last_seen_touched) >= USER_CACHE_MAX_ENTRIES:
+            self._last_seen_touched.pop(next(iter(self._last_seen_touched)))
+        self._last_seen_touched[(channel, external_user_id)] = now
+
+    def _touch_last_seen(self, channel: str, external_user_id: str) -> None:
+        # last_seen_at only needs minute-level accuracy, so write it at most once per cache window.
+        now = time.monotonic()
+        touched_at = self._last_seen_touched.get((channel, external_user_id))
+        if touched_at is not None and now - touched_at < self.settings.user_cache_ttl_seconds:
+            return
+        self._mark_last_seen(channel, external_user_id, now)
+        self._get_repo().update_user_last_seen(channel, external_user_id)
 
     def _get_repo(self) -> DataRepo:
         if self._repo is None:
             raise RuntimeError("Data repository not configured")
         return self._repo
 
+    @contextmanager
+    def _request_scope(self) -> Iterator[RequestContext]:
+        context = RequestContext()
+        token = _request_context.set(context)
+        try:
+            yield context
+        finally:
+            _request_context.reset(token)
+
+    def _list_transactions(self, user_id: str) -> list[Dict[str, Any]]:
+        context = _request_context.get()
+        if context is None:
+            return self._get_repo().list_transactions(user_id)
+        txs = context.transactions.get(user_id)
+        if txs is None:
+            txs = self._get_repo().list_transactions(user_id)
+            context.transactions[user_id] = txs
+        return txs
+
+    def _list_recurring_expenses(
+        self,
+        user_id: str,
+        status: Optional[str] = None,
+        include_canceled: bool = True,
+    ) -> list[Dict[str, Any]]:
+        context = _request_context.get()
+        if context is None:
+            return self._get_repo().list_recurring_expenses(user_id, status, include_canceled)
+        key = (user_id, status, include_canceled)
+        items = context.recurrings.get(key)
+        if items is None:
+            items = self._get_repo().list_recurring_expenses(user_id, status, include_canceled)
+            context.recurrings[key] = items
+        return items
+
+    @staticmethod
+    def _forget_transactions() -> None:
+        context = _request_context.get()
+        if context is not None:
+            context.transactions.clear()
+
+    @staticmethod
+    def _forget_recurrings() -> None:
+        context = _request_context.get()
+        if context is not None:
+            context.recurrings.clear()
+            context.recurring_name_indexes.clear()
+            context.recurrings_by_id.clear()
+
+    def _get_recurring_expense(self, recurring_id: int, user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        # Target resolution and the handler that follows often load the same row in one update.
+        # With user_id the row is only returned when that user owns it; the DB filters foreign rows out.
+        context = _request_context.get()
+        recurring = context.recurrings_by_id.get(recurring_id) if context is not None else None
+        if recurring is None:
+            repo = self._get_repo()
+            if user_id is None:
+                recurring = repo.get_recurring_expense(recurring_id)
+            else:
+                recurring = repo.get_recurring_expense_for_user(recurring_id, user_id)
+            if recurring is None:
+                return None
+            if context is not None:
+                context.recurrings_by_id[recurring_id] = recurring
+        if user_id is not None and str(recurring.get("user_id")) != user_id:
+            return None
+        return recurring
+
+    def _append_transactions(self, txs: list[Dict[str, Any]]) -> None:
+        self._get_repo().append_transactions(txs)
+        self._forget_transactions()
+
+    def _mark_transaction_deleted(self, tx_id: str) -> None:
+        self._get_repo().mark_transaction_deleted(tx_id)
+        self._forget_transactions()
+
+    def _pop_latest_active_transaction(self, user_id: str) -> Optional[Dict[str, Any]]:
+        tx = self._get_repo().pop_latest_active_transaction(user_id)
+        if tx is not None:
+            self._forget_transactions()
+        return tx
+
+    def _mark_all_transactions_deleted(self, user_id: str) -> int:
+        deleted_count = self._get_repo().mark_all_transactions_deleted(user_id)
+        self._forget_transactions()
+        return deleted_count
+
+    def _create_recurring_expense(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        created = self._get_repo().create_recurring_expense(data)
+        self._forget_recurrings()
+        return created
+
+    def _upsert_recurring_expense(self, data: Dict[str, Any], updates: Dict[str, Any]) -> Dict[str, Any]:
+        recurring = self._get_repo().upsert_recurring_expense(data, updates)
+        self._forget_recurrings()
+        context = _request_context.get()
+        if context is not None:
+            context.recurrings_by_id[int(recurring["id"])] = recurring
+        return recurring
+
+    def _update_recurring_expense(self, recurring_id: int, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        updated = self._get_repo().update_recurring_expense(recurring_id, updates)
+        self._forget_recurrings()
+        context = _request_context.get()
+        if context is not None and updated is not None:
+            context.recurrings_by_id[recurring_id] = updated
+        return updated
+
+    def _cancel_recurring_expenses(self, user_id: str, recurring_ids: list[int], canceled_at: str) -> int:
+        canceled = self._get_repo().cancel_recurring_expenses(user_id, recurring_ids, canceled_at)
+        self._forget_recurrings()
+        return canceled
+
     def _get_groq(self) -> GroqClient:
         if self._groq is None:
             raise RuntimeError("Groq client not configured")
@@ -134,7 +603,7 @@ class PipelineBase:
         )
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class ActiveUserResult:
     user: Optional[Dict[str, Any]]
     error_message: Optional[str]
@@ -147,9 +616,18 @@ class AuthFlow:
     def require_active_user(self, channel: str, external_user_id: Optional[str]) -> ActiveUserResult:
         if not external_user_id:
             return ActiveUserResult(None, UNAUTHORIZED_MESSAGE)
-        user = self.pipeline._get_repo().find_user_by_channel(channel, str(external_user_id))
+        external_key = str(external_user_id)
+        user = self.pipeline._get_cached_user(channel, external_key)
+        if user is not None:
+            return ActiveUserResult(user, None)
+        # Cache miss: look the user up and stamp last_seen_at in the same round-trip. The repo call is
+        # synchronous on the event loop, so concurrent misses for one user cannot stampede: the next
+        # turn only runs after this one has filled the cache.
+        user = self.pipeline._get_repo().touch_and_get_active_user(channel, external_key)
         if not user or str(user.get("status")) != "active":
             return ActiveUserResult(None, UNAUTHORIZED_MESSAGE)
+        self.pipeline._mark_last_seen(channel, external_key, time.monotonic())
+        self.pipeline._cache_user(channel, external_key, user)
         return ActiveUserResult(user, None)
 
 
@@ -168,7 +646,7 @@ class OnboardingFlow:
         existing_user = repo.find_user_by_channel(command.channel, str(external_user_id))
         if existing_user and str(existing_user.get("status")) == "active":
             logger.info("Onboarding idempotent success chat_id=%s user_id=%s", chat_id, external_user_id)
-            keyboard = _kb_main()
+            keyboard = KB_MAIN
             return self.pipeline._make_message(
                 "✅ <b>Tu cuenta ya estaba activa</b>\nPuedes seguir usando el bot normalmente.",
                 keyboard,
@@ -181,8 +659,9 @@ class OnboardingFlow:
         user_id = f"USR-{int(time.time() * 1000)}-{external_user_id}"
         repo.create_user(user_id, command.channel, str(external_user_id), str(chat_id) if chat_id is not None else None)
         repo.mark_invite_used(command.invite_token, user_id)
+        self.pipeline._invalidate_user(command.channel, str(external_user_id))
         logger.info("Onboarding success chat_id=%s user_id=%s", chat_id, external_user_id)
-        keyboard = _kb_main()
+        keyboard = KB_MAIN
         return self.pipeline._make_message(ONBOARDING_SUCCESS_MESSAGE, keyboard)
 
 
@@ -191,59 +670,48 @@ class CommandFlow:
         self.pipeline = pipeline
 
     async def handle_list(self, user: Dict[str, Any], chat_id: Optional[int]) -> BotMessage:
-        logger.info("List command chat_id=%s user_id=%s", chat_id, user.get("userId"))
-        txs = self.pipeline._get_repo().list_transactions(user.get("userId"))
-        keyboard = _kb([ACTION_UNDO, ACTION_SUMMARY], [ACTION_RECURRINGS, ACTION_DOWNLOAD], [ACTION_HELP])
+        user_id = str(user.get("userId"))
+        logger.info("List command chat_id=%s user_id=%s", chat_id, user_id)
+        txs = self.pipeline._list_transactions(user_id)
+        keyboard = KB_AFTER_LIST
         return self.pipeline._make_message(format_list_message(txs), keyboard)
 
     async def handle_summary(self, user: Dict[str, Any], chat_id: Optional[int], channel: str) -> BotMessage:
-        logger.info("Summary command chat_id=%s user_id=%s", chat_id, user.get("userId"))
-        txs = self.pipeline._get_repo().list_transactions(user.get("userId"))
-        keyboard = _kb([ACTION_LIST, ACTION_UNDO], [ACTION_RECURRINGS, ACTION_DOWNLOAD], [ACTION_HELP])
+        user_id = str(user.get("userId"))
+        logger.info("Summary command chat_id=%s user_id=%s", chat_id, user_id)
+        txs = self.pipeline._list_transactions(user_id)
+        keyboard = KB_AFTER_SUMMARY
         compact = channel in {"evolution", "whatsapp"}
         return self.pipeline._make_message(format_summary_message(txs, compact=compact), keyboard)
 
     async def handle_recurrings(self, user: Dict[str, Any], chat_id: Optional[int]) -> BotMessage:
-        logger.info("Recurrings command chat_id=%s user_id=%s", chat_id, user.get("userId"))
-        items = self.pipeline._get_repo().list_recurring_expenses(user.get("userId"))
-        items = [item for item in items if str(item.get("status") or "").lower() == "active"]
-        def _sort_key(item: Dict[str, Any]) -> tuple[float, float, int]:
-            def _to_ts(value: Any) -> float:
-                if not value:
-                    return float("-inf")
-                if isinstance(value, datetime):
-                    dt = value
-                    if dt.tzinfo is None:
-                        dt = dt.replace(tzinfo=timezone.utc)
-                    return dt.timestamp()
-                raw = str(value)
-                try:
-                    return datetime.fromisoformat(raw.replace("Z", "+00:00")).timestamp()
-                except ValueError:
-                    return float("-inf")
-            created_ts = _to_ts(item.get("created_at") or item.get("createdAt"))
-            updated_ts = _to_ts(item.get("updated_at") or item.get("updatedAt"))
-            try:
-                rid = int(item.get("id") or 0)
-            except (TypeError, ValueError):
-                rid = 0
-            return (updated_ts, created_ts, rid)
-
-        items.sort(key=_sort_key, reverse=True)
-        keyboard = _kb_main()
+        user_id = str(user.get("userId"))
+        logger.info("Recurrings command chat_id=%s user_id=%s", chat_id, user_id)
+        items = list(self.pipeline._list_recurring_expenses(user_id, status="active"))
+        items.sort(key=_recurring_recency_key, reverse=True)
+        keyboard = KB_MAIN
         return self.pipeline._make_message(format_recurring_list_message(items), keyboard)
 
     async def handle_download(self, user: Dict[str, Any], chat_id: Optional[int]) -> BotMessage:
-        logger.info("Download command chat_id=%s user_id=%s", chat_id, user.get("userId"))
-        txs = self.pipeline._get_repo().list_transactions(user.get("userId"))
-        txs = [tx for tx in txs if not tx.get("isDeleted")]
+        user_id = str(user.get("userId"))
+        logger.info("Download command chat_id=%s user_id=%s", chat_id, user_id)
+        # list_transactions already filters deleted rows in SQL.
+        txs = self.pipeline._list_transactions(user_id)
         if not txs:
-            keyboard = _kb_main()
+            keyboard = KB_MAIN
             return self.pipeline._make_message("📭 <b>Sin movimientos</b>\nNo hay transacciones para descargar.", keyboard)
 
-        document_bytes, filename = build_transactions_xlsx(txs, self.pipeline.settings.timezone or "America/Bogota")
+        # openpyxl costs ~0.1s to import and only /download needs it, so load it on first use.
+        from app.bot.exporters import build_transactions_xlsx
+
+        document_bytes, filename = await asyncio.get_running_loop().run_in_executor(
+            self.pipeline._export_executor,
+            build_transactions_xlsx,
+            txs,
+            self.pipeline.settings.timezone or "America/Bogota",
+        )
         text = f"📎 <b>Exportación lista</b>\nTransacciones: <b>{len(txs)}</b>"
-        keyboard = _kb_main()
+        keyboard = KB_MAIN
         return self.pipeline._make_message(
             text,
             keyboard,
@@ -253,22 +721,22 @@ class CommandFlow:
         )
 
     async def handle_undo(self, user: Dict[str, Any], chat_id: Optional[int]) -> BotMessage:
-        logger.info("Undo command chat_id=%s user_id=%s", chat_id, user.get("userId"))
-        txs = self.pipeline._get_repo().list_transactions(user.get("userId"))
-        picked = BotPipeline._pick_latest(txs)
-        if picked.get("ok"):
-            self.pipeline._get_repo().mark_transaction_deleted(str(picked["txId"]))
-        keyboard = _kb_main()
+        user_id = str(user.get("userId"))
+        logger.info("Undo command chat_id=%s user_id=%s", chat_id, user_id)
+        # Find-and-delete is one statement in the repo; there is no window for a second undo to pick the same row.
+        popped = self.pipeline._pop_latest_active_transaction(user_id)
+        picked = BotPipeline._undo_result(popped) if popped and popped.get("txId") else {"ok": False, "reason": "no_tx"}
+        keyboard = KB_MAIN
         return self.pipeline._make_message(format_undo_message(picked), keyboard)
 
     async def handle_clear_all(self, user: Dict[str, Any], chat_id: Optional[int]) -> BotMessage:
-        logger.info("Clear-all command chat_id=%s user_id=%s", chat_id, user.get("userId"))
-        txs = self.pipeline._get_repo().list_transactions(user.get("userId"))
-        active_count = len([tx for tx in txs if not bool(tx.get("isDeleted"))])
+        user_id = str(user.get("userId"))
+        logger.info("Clear-all command chat_id=%s user_id=%s", chat_id, user_id)
+        active_count = self.pipeline._get_repo().count_active_transactions(user_id)
         if active_count == 0:
-            return self.pipeline._make_message("📭 <b>Sin movimientos</b>\nNo hay transacciones para eliminar.", _kb_main())
+            return self.pipeline._make_message("📭 <b>Sin movimientos</b>\nNo hay transacciones para eliminar.", KB_MAIN)
         self.pipeline._upsert_pending_action(
-            str(user.get("userId")),
+            user_id,
             PENDING_CLEAR_ALL_CONFIRM,
             {"active_count": active_count},
         )
@@ -278,18 +746,18 @@ class CommandFlow:
                 "Esta acción no se puede deshacer con <code>/undo</code>.\n\n"
                 "Responde <code>sí</code> para confirmar o <code>no</code> para cancelar."
             ),
-            _kb([ACTION_CONFIRM_YES, ACTION_CONFIRM_NO], [ACTION_HELP]),
+            KB_CONFIRM,
         )
 
     async def handle_clear_recurrings(self, user: Dict[str, Any], chat_id: Optional[int]) -> BotMessage:
-        logger.info("Clear-recurrings command chat_id=%s user_id=%s", chat_id, user.get("userId"))
-        items = self.pipeline._get_repo().list_recurring_expenses(user.get("userId"))
-        clearable = [item for item in items if str(item.get("status") or "").lower() != "canceled"]
+        user_id = str(user.get("userId"))
+        logger.info("Clear-recurrings command chat_id=%s user_id=%s", chat_id, user_id)
+        clearable = self.pipeline._list_recurring_expenses(user_id, include_canceled=False)
         clearable_count = len(clearable)
         if clearable_count == 0:
-            return self.pipeline._make_message("📭 <b>Sin recurrentes</b>\nNo hay recurrentes activos/pausados para eliminar.", _kb_main())
+            return self.pipeline._make_message("📭 <b>Sin recurrentes</b>\nNo hay recurrentes activos/pausados para eliminar.", KB_MAIN)
         self.pipeline._upsert_pending_action(
-            str(user.get("userId")),
+            user_id,
             PENDING_CLEAR_RECURRINGS_CONFIRM,
             {"clearable_count": clearable_count},
         )
@@ -299,20 +767,44 @@ class CommandFlow:
                 "Se detendrán sus recordatorios futuros.\n\n"
                 "Responde <code>sí</code> para confirmar o <code>no</code> para cancelar."
             ),
-            _kb([ACTION_CONFIRM_YES, ACTION_CONFIRM_NO], [ACTION_HELP]),
+            KB_CONFIRM,
         )
 
 
 class AiFlow:
     def __init__(self, pipeline: PipelineBase) -> None:
         self.pipeline = pipeline
+        self._responses: Dict[tuple[str, str], tuple[float, str]] = {}
+
+    async def _chat_completion(
+        self,
+        system_prompt: str,
+        user_message: str,
+        max_tokens: Optional[int] = None,
+        use_cache: bool = True,
+    ) -> str:
+        # Only replies that already produced a valid transaction are cached (see _remember_completion),
+        # so a resend after a failed or rejected parse always reaches Groq again.
+        key = (system_prompt, user_message)
+        if use_cache:
+            entry = self._responses.get(key)
+            if entry is not None:
+                cached_at, content = entry
+                if time.monotonic() - cached_at < self.pipeline.settings.ai_cache_ttl_seconds:
+                    return content
+                self._responses.pop(key, None)
+        return await self.pipeline._get_groq().chat_completion(system_prompt, user_message, max_tokens=max_tokens)
+
+    def _remember_completion(self, system_prompt: str, user_message: str, content: str) -> None:
+        if self.pipeline.settings.ai_cache_ttl_seconds <= 0:
+            return
+        if len(self._responses) >= AI_RESPONSE_CACHE_MAX_ENTRIES:
+            self._responses.pop(next(iter(self._responses)))
+        self._responses[(system_prompt, user_message)] = (time.monotonic(), content)
 
     @staticmethod
     def _infer_default_type(text: str) -> str:
-        raw = (text or "").lower()
-        if re.search(r"\b(me pagaron|recibi|recibí|ingreso|gan[eé]|salario|reembolso)\b", raw):
-            return "income"
-        return "expense"
+        return "income" if _INCOME_HINT_RE.search((text or "").lower()) else "expense"
 
     def _finalize_tx(
         self,
@@ -321,31 +813,35 @@ class AiFlow:
         chat_id: Optional[int],
         message_id: Optional[str],
         source: str,
+        now_iso: Optional[str] = None,
     ) -> Dict[str, Any]:
-        tx_id = generate_tx_id()
+        now_iso = now_iso or datetime.now(timezone.utc).isoformat()
         out = dict(tx)
-        out["txId"] = tx_id
+        out["txId"] = generate_tx_id()
         out["userId"] = user.get("userId")
-        out["paymentMethod"] = out.get("paymentMethod") or "cash"
-        out["normalizedMerchant"] = out.get("normalizedMerchant") or ""
-        out["transactionKind"] = out.get("transactionKind") or "regular"
+        for key, default in _TX_DEFAULTS.items():
+            out[key] = out.get(key) or default
         out["isRecurring"] = bool(out.get("isRecurring"))
-        out["recurrence"] = out.get("recurrence") or ""
-        out["recurrenceId"] = out.get("recurrenceId") or ""
-        out["counterparty"] = out.get("counterparty") or ""
-        out["loanRole"] = out.get("loanRole") or ""
-        out["loanId"] = out.get("loanId") or ""
-        out["parseConfidence"] = out.get("parseConfidence") or 0.7
-        out["parserVersion"] = out.get("parserVersion") or "mvp-v1"
         out["source"] = out.get("source") or source
         out["sourceMessageId"] = str(message_id or "")
-        out["createdAt"] = out.get("createdAt") or __import__("datetime").datetime.now(__import__("datetime").timezone.utc).isoformat()
-        out["updatedAt"] = __import__("datetime").datetime.now(__import__("datetime").timezone.utc).isoformat()
+        out["createdAt"] = out.get("createdAt") or now_iso
+        out["updatedAt"] = now_iso
         out["isDeleted"] = out.get("isDeleted", False)
         out["deletedAt"] = out.get("deletedAt", "")
         out["chatId"] = chat_id
         return out
 
+    def _finalize_txs(
+        self,
+        txs: list[Dict[str, Any]],
+        user: Dict[str, Any],
+        chat_id: Optional[int],
+        message_id: Optional[str],
+        source: str,
+    ) -> list[Dict[str, Any]]:
+        now_iso = datetime.now(timezone.utc).isoformat()
+        return [self._finalize_tx(tx, user, chat_id, message_id, source, now_iso) for tx in txs]
+
     def _build_multi_preview(self, txs: list[Dict[str, Any]]) -> str:
         return format_multi_tx_preview_message(txs)
 
@@ -363,13 +859,54 @@ class AiFlow:
         candidates: list[Dict[str, Any]] = []
         low_confidence = False
 
-        for segment in segments:
-            content = await self.pipeline._get_groq().chat_completion(system_prompt, segment)
+        limiter = asyncio.Semaphore(MULTI_SEGMENT_CONCURRENCY)
+
+        # Replies are remembered only once every segment of the message has validated.
+        replies: list[tuple[str, str, str]] = []
+
+        async def _complete_one(segment: str, use_cache: bool = True) -> Any:
+            async with limiter:
+                content = await self._chat_completion(system_prompt, segment, use_cache=use_cache)
             try:
                 parsed = extract_json(content)
             except Exception as exc:
                 logger.warning("AI multi response invalid JSON chat_id=%s user_id=%s error=%s", chat_id, user.get("userId"), exc)
-                keyboard = _kb([ACTION_HELP])
+                return None
+            replies.append((system_prompt, segment, content))
+            return parsed
+
+        async def _complete_batch(batch: list[str]) -> list[Any]:
+            if len(batch) == 1:
+                return [await _complete_one(batch[0])]
+            batch_prompt = system_prompt + _MULTI_SEGMENT_BATCH_PROMPT.format(count=len(batch))
+            batch_message = "\n".join(f"{idx}) {segment}" for idx, segment in enumerate(batch, start=1))
+            async with limiter:
+                content = await self._chat_completion(
+                    batch_prompt,
+                    batch_message,
+                    max_tokens=self.pipeline.settings.max_output_tokens * len(batch),
+                )
+            items = _unmarshal_batch(content, len(batch))
+            if items is not None:
+                replies.append((batch_prompt, batch_message, content))
+                return items
+            logger.warning("AI batch response invalid, retrying per segment chat_id=%s count=%s", chat_id, len(batch))
+            # Fresh calls only: a cached per-segment reply must not stand in for the failed batch.
+            return list(await asyncio.gather(*(_complete_one(segment, use_cache=False) for segment in batch)))
+
+        batches = _batch_segments(segments, self.pipeline.settings.ai_marshal_max_chars)
+        tasks = [asyncio.ensure_future(_complete_batch(batch)) for batch in batches]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            # gather leaves the other requests running when one fails; don't spend Groq quota on them.
+            for task in tasks:
+                task.cancel()
+            raise
+        parsed_items = [item for batch_items in results for item in batch_items]
+        for segment, parsed in zip(segments, parsed_items):
+            if parsed is None:
+                keyboard = KB_HELP
                 return self.pipeline._make_message(HELP_MESSAGE, keyboard)
             parsed = sanitize_ai_payload(parsed)
             tx = normalize_ai_response(parsed, segment, chat_id, self.pipeline.settings, source)
@@ -380,7 +917,7 @@ class AiFlow:
             if str(tx.get("type") or "").lower() not in {"income", "expense"}:
                 tx["type"] = default_type
             if float(tx.get("amount", 0)) <= 0:
-                keyboard = _kb_main()
+                keyboard = KB_MAIN
                 return self.pipeline._make_message(
                     "No pude validar todos los montos en el mensaje. Envíalo separado o con formato más claro.",
                     keyboard,
@@ -391,9 +928,12 @@ class AiFlow:
             candidates.append(tx)
 
         if not candidates:
-            keyboard = _kb([ACTION_HELP])
+            keyboard = KB_HELP
             return self.pipeline._make_message(HELP_MESSAGE, keyboard)
 
+        for reply in replies:
+            self._remember_completion(*reply)
+
         if low_confidence:
             self.pipeline._upsert_pending_action(
                 str(user.get("userId")),
@@ -402,15 +942,15 @@ class AiFlow:
             )
             return self.pipeline._make_message(
                 self._build_multi_preview(candidates),
-                _kb([ACTION_CONFIRM_YES, ACTION_CONFIRM_NO], [ACTION_HELP]),
+                KB_CONFIRM,
             )
 
-        finalized = [self._finalize_tx(tx, user, chat_id, message_id, source) for tx in candidates]
-        self.pipeline._get_repo().append_transactions(finalized)
+        finalized = self._finalize_txs(candidates, user, chat_id, message_id, source)
+        self.pipeline._append_transactions(finalized)
         logger.info("AI multi tx saved chat_id=%s user_id=%s count=%s", chat_id, user.get("userId"), len(finalized))
         return self.pipeline._make_message(
             format_multi_tx_saved_message(finalized),
-            _kb_after_save(),
+            KB_AFTER_SAVE,
         )
 
     async def handle(
@@ -427,12 +967,12 @@ class AiFlow:
         segments = split_multi_transaction_text(user_message)
         if len(segments) >= 2:
             return await self._handle_multi_segments(system_prompt, segments, command, user, chat_id, message_id, source)
-        content = await self.pipeline._get_groq().chat_completion(system_prompt, user_message)
+        content = await self._chat_completion(system_prompt, user_message)
         try:
             parsed = extract_json(content)
         except Exception as exc:
             logger.warning("AI response invalid JSON chat_id=%s user_id=%s error=%s", chat_id, user.get("userId"), exc)
-            keyboard = _kb([ACTION_HELP])
+            keyboard = KB_HELP
             return self.pipeline._make_message(HELP_MESSAGE, keyboard)
         parsed = sanitize_ai_payload(parsed)
 
@@ -443,7 +983,7 @@ class AiFlow:
 
         intent = str(tx.get("intent", "add_tx")).lower()
         if intent == "help":
-            keyboard = _kb_main()
+            keyboard = KB_MAIN
             return self.pipeline._make_message(HELP_MESSAGE, keyboard)
         if intent == "list":
             return await self.pipeline.command_flow.handle_list(user, chat_id)
@@ -453,35 +993,139 @@ class AiFlow:
             return await self.pipeline.command_flow.handle_download(user, chat_id)
 
         if intent != "add_tx":
-            keyboard = _kb_main()
+            keyboard = KB_MAIN
             return self.pipeline._make_message(HELP_MESSAGE, keyboard)
 
         if float(tx.get("amount", 0)) <= 0 or not str(tx.get("category")):
             logger.warning("AI invalid tx chat_id=%s user_id=%s", chat_id, user.get("userId"))
-            keyboard = _kb_main()
+            keyboard = KB_MAIN
             return self.pipeline._make_message(INVALID_TX_MESSAGE, keyboard)
+        self._remember_completion(system_prompt, user_message, content)
 
         tx = self._finalize_tx(tx, user, chat_id, message_id, source)
-        self.pipeline._get_repo().append_transaction(tx)
+        self.pipeline._append_transactions([tx])
         logger.info("AI tx saved chat_id=%s user_id=%s tx_id=%s", chat_id, user.get("userId"), tx["txId"])
-        keyboard = _kb_after_save()
+        keyboard = KB_AFTER_SAVE
         text = format_add_tx_message(tx)
         recurring_prompt = self.pipeline._offer_recurring_setup(tx)
         if recurring_prompt:
             text = f"{text}\n\n{recurring_prompt}"
-            keyboard = _kb([ACTION_CONFIRM_YES, ACTION_CONFIRM_NO], [ACTION_UNDO, ACTION_LIST], [ACTION_HELP])
+            keyboard = KB_SAVED_OFFER_RECURRING
         return self.pipeline._make_message(text, keyboard)
 
 
 class BotPipeline(PipelineBase):
+    # Checked in priority order; handlers are resolved only for the row that is actually pending.
+    _PENDING_HANDLERS: tuple[tuple[str, str], ...] = (
+        (PENDING_RECURRING_ACTION, "_handle_recurring_setup"),
+        (PENDING_RECURRING_OFFER_ACTION, "_handle_recurring_offer"),
+        ("recurring_edit_reminders", "_handle_recurring_edit"),
+        (PENDING_MULTI_TX_CONFIRM, "_handle_multi_tx_confirm"),
+        (PENDING_CLEAR_ALL_CONFIRM, "_handle_clear_all_confirm"),
+        (PENDING_CLEAR_RECURRINGS_CONFIRM, "_handle_clear_recurrings_confirm"),
+        (PENDING_RECURRING_CANCEL_CONFIRM, "_handle_recurring_cancel_confirm"),
+        (PENDING_DAILY_NUDGE_SET_HOUR, "_handle_daily_nudge_set_hour"),
+    )
+    _PENDING_ACTION_TYPES: tuple[str, ...] = tuple(action_type for action_type, _ in _PENDING_HANDLERS)
+    # Bill reminder buttons send "recurring:<action>:<bill_instance_id>"; unknown actions never reach the DB.
+    _RECURRING_BILL_ACTIONS: Dict[str, str] = {
+        "paid": "_confirm_recurring_bill_paid",
+        "later": "_postpone_recurring_bill",
+        "no": "_decline_recurring_bill",
+    }
+
     def __init__(self, settings: Settings, repo: Optional[DataRepo] = None, groq: Optional[GroqClient] = None) -> None:
         super().__init__(settings, repo, groq)
         self.auth_flow = AuthFlow(self)
         self.onboarding_flow = OnboardingFlow(self)
         self.command_flow = CommandFlow(self)
         self.ai_flow = AiFlow(self)
+        self._chat_locks: Dict[str, asyncio.Lock] = {}
+        self._chat_waiters: Dict[str, int] = {}
+        self._turn_semaphore = asyncio.Semaphore(max(1, settings.max_parallel_turns))
+        command_routes: Dict[str, _RouteHandler] = {
+            "list": lambda user, command, request: self.command_flow.handle_list(user, request.chat_id),
+            "summary": lambda user, command, request: self.command_flow.handle_summary(
+                user, request.chat_id, request.channel
+            ),
+            "recurrings": lambda user, command, request: self.command_flow.handle_recurrings(user, request.chat_id),
+            "download": lambda user, command, request: self.command_flow.handle_download(user, request.chat_id),
+            "undo": lambda user, command, request: self.command_flow.handle_undo(user, request.chat_id),
+            "clear_all": lambda user, command, request: self.command_flow.handle_clear_all(user, request.chat_id),
+            "clear_recurrings": lambda user, command, request: self.command_flow.handle_clear_recurrings(
+                user, request.chat_id
+            ),
+            "daily_nudge_action": self._text_route(self._handle_daily_nudge_action),
+        }
+        self._message_routes: Dict[str, _RouteHandler] = {
+            **command_routes,
+            "recurring_create": self._recurring_text_route(self._start_recurring_from_text),
+            "recurring_edit": self._recurring_text_route(self._handle_recurring_edit),
+            "recurring_update_amount": self._recurring_text_route(self._handle_recurring_update_amount),
+            "recurring_update_payment": self._recurring_text_route(self._handle_recurring_update_payment),
+            "recurring_cancel": self._recurring_text_route(self._handle_recurring_cancel),
+            "recurring_toggle": self._recurring_text_route(self._handle_recurring_toggle),
+        }
+        self._callback_routes: Dict[str, _RouteHandler] = {
+            **command_routes,
+            "recurring_action": self._text_route(self._handle_recurring_action),
+        }
 
-    async def handle_message(self, request: BotInput) -> list[BotMessage]:
+    @staticmethod
+    def _text_route(handler: Callable[[Dict[str, Any], str], BotMessage]) -> _RouteHandler:
+        async def _route(user: Dict[str, Any], command, request: BotInput) -> BotMessage:
+            return handler(user, command.text)
+
+        return _route
+
+    def _recurring_text_route(self, fallback: Callable[[Dict[str, Any], str], BotMessage]) -> _RouteHandler:
+        async def _route(user: Dict[str, Any], command, request: BotInput) -> BotMessage:
+            natural_ai = await self._try_handle_recurring_natural_ai(user, command.text or "")
+            if natural_ai is not None:
+                return natural_ai
+            return fallback(user, command.text)
+
+        return _route
+
+    @asynccontextmanager
+    async def _chat_turn(self, chat_id: Optional[str | int]) -> AsyncIterator[None]:
+        # One pipeline turn per chat at a time, unrelated chats in parallel. Full-update ordering (downloads,
+        # reply sends) is enforced by the routers through spawn_ordered; this guards direct callers too.
+        key = str(chat_id)
+        lock = self._chat_locks.get(key)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._chat_locks[key] = lock
+        self._chat_waiters[key] = self._chat_waiters.get(key, 0) + 1
+        try:
+            async with lock:
+                async with self._turn_semaphore:
+                    yield
+        finally:
+            remaining = self._chat_waiters.get(key, 1) - 1
+            if remaining <= 0:
+                self._chat_waiters.pop(key, None)
+                self._chat_locks.pop(key, None)
+            else:
+                self._chat_waiters[key] = remaining
+
+    async def handle_message(self, request: BotInput, send_early: Optional[ReplySender] = None) -> list[BotMessage]:
+        if request.audio_bytes and send_early is not None:
+            # Acknowledge before queueing behind the chat lock and the slow transcription call.
+            try:
+                await send_early(self._make_message(TRANSCRIBING_MESSAGE))
+            except Exception as exc:
+                logger.warning("Transcription ack failed chat_id=%s error=%s", request.chat_id, exc)
+        async with self._chat_turn(request.chat_id):
+            with self._request_scope():
+                return await self._handle_message(request)
+
+    async def handle_callback(self, request: BotInput) -> list[BotMessage]:
+        async with self._chat_turn(request.chat_id):
+            with self._request_scope():
+                return await self._handle_callback(request)
+
+    async def _handle_message(self, request: BotInput) -> list[BotMessage]:
         chat_id = request.chat_id
         external_user_id = request.user_id
         text = request.text
@@ -514,11 +1158,11 @@ class BotPipeline(PipelineBase):
             return [await self.onboarding_flow.handle(command)]
 
         if command.route == "help":
-            keyboard = _kb_main()
+            keyboard = KB_MAIN
             return [self._make_message(HELP_MESSAGE, keyboard)]
 
         if command.route == "non_text":
-            keyboard = _kb([ACTION_HELP])
+            keyboard = KB_HELP
             return [self._make_message(NON_TEXT_MESSAGE, keyboard)]
 
         auth_result = self.auth_flow.require_active_user(
@@ -531,11 +1175,11 @@ class BotPipeline(PipelineBase):
                 chat_id,
                 external_user_id,
             )
-            keyboard = _kb([ACTION_HELP])
+            keyboard = KB_HELP
             return [self._make_message(auth_result.error_message or UNAUTHORIZED_MESSAGE, keyboard)]
 
         if external_user_id is not None:
-            self._get_repo().update_user_last_seen(request.channel, str(external_user_id))
+            self._touch_last_seen(request.channel, str(external_user_id))
 
         pending_response = self._handle_pending_actions(
             auth_result.user,
@@ -547,52 +1191,9 @@ class BotPipeline(PipelineBase):
         if pending_response is not None:
             return [pending_response]
 
-        if command.route == "list":
-            return [await self.command_flow.handle_list(auth_result.user, chat_id)]
-        if command.route == "summary":
-            return [await self.command_flow.handle_summary(auth_result.user, chat_id, request.channel)]
-        if command.route == "recurrings":
-            return [await self.command_flow.handle_recurrings(auth_result.user, chat_id)]
-        if command.route == "recurring_create":
-            natural_ai = await self._try_handle_recurring_natural_ai(auth_result.user, command.text or "")
-            if natural_ai is not None:
-                return [natural_ai]
-            return [self._start_recurring_from_text(auth_result.user, command.text)]
-        if command.route == "download":
-            return [await self.command_flow.handle_download(auth_result.user, chat_id)]
-        if command.route == "undo":
-            return [await self.command_flow.handle_undo(auth_result.user, chat_id)]
-        if command.route == "clear_all":
-            return [await self.command_flow.handle_clear_all(auth_result.user, chat_id)]
-        if command.route == "clear_recurrings":
-            return [await self.command_flow.handle_clear_recurrings(auth_result.user, chat_id)]
-        if command.route == "recurring_edit":
-            natural_ai = await self._try_handle_recurring_natural_ai(auth_result.user, command.text or "")
-            if natural_ai is not None:
-                return [natural_ai]
-            return [self._handle_recurring_edit(auth_result.user, command.text)]
-        if command.route == "recurring_update_amount":
-            natural_ai = await self._try_handle_recurring_natural_ai(auth_result.user, command.text or "")
-            if natural_ai is not None:
-                return [natural_ai]
-            return [self._handle_recurring_update_amount(auth_result.user, command.text)]
-        if command.route == "recurring_update_payment":
-            natural_ai = await self._try_handle_recurring_natural_ai(auth_result.user, command.text or "")
-            if natural_ai is not None:
-                return [natural_ai]
-            return [self._handle_recurring_update_payment(auth_result.user, command.text)]
-        if command.route == "recurring_cancel":
-            natural_ai = await self._try_handle_recurring_natural_ai(auth_result.user, command.text or "")
-            if natural_ai is not None:
-                return [natural_ai]
-            return [self._handle_recurring_cancel(auth_result.user, command.text)]
-        if command.route == "recurring_toggle":
-            natural_ai = await self._try_handle_recurring_natural_ai(auth_result.user, command.text or "")
-            if natural_ai is not None:
-                return [natural_ai]
-            return [self._handle_recurring_toggle(auth_result.user, command.text)]
-        if command.route == "daily_nudge_action":
-            return [self._handle_daily_nudge_action(auth_result.user, command.text)]
+        route_handler = self._message_routes.get(command.route)
+        if route_handler is not None:
+            return [await route_handler(auth_result.user, command, request)]
         if command.route == "ai":
             natural_ai = await self._try_handle_recurring_natural_ai(auth_result.user, command.text or "")
             if natural_ai is not None:
@@ -602,10 +1203,10 @@ class BotPipeline(PipelineBase):
                 return [natural]
 
         if len(command.text_for_parsing or "") > settings.max_input_chars:
-            keyboard = _kb([ACTION_HELP])
+            keyboard = KB_HELP
             return [self._make_message(LONG_MESSAGE, keyboard)]
         if not settings.groq_api_key:
-            return [self._make_message(AI_UNAVAILABLE_FALLBACK_MESSAGE, _kb_main())]
+            return [self._make_message(AI_UNAVAILABLE_FALLBACK_MESSAGE, KB_MAIN)]
         response = await self.ai_flow.handle(
             command,
             auth_result.user,
@@ -615,7 +1216,7 @@ class BotPipeline(PipelineBase):
         )
         return [response]
 
-    async def handle_callback(self, request: BotInput) -> list[BotMessage]:
+    async def _handle_callback(self, request: BotInput) -> list[BotMessage]:
         chat_id = request.chat_id
         external_user_id = request.user_id
         text = request.text
@@ -632,73 +1233,58 @@ class BotPipeline(PipelineBase):
             return [await self.onboarding_flow.handle(command)]
 
         if command.route == "help":
-            keyboard = _kb_main()
+            keyboard = KB_MAIN
             return [self._make_message(HELP_MESSAGE, keyboard)]
 
-        if command.route in {"list", "summary", "download", "undo", "clear_all", "clear_recurrings", "ai", "recurring_action", "recurrings", "daily_nudge_action"}:
-            auth_result = self.auth_flow.require_active_user(
-                request.channel,
-                str(external_user_id) if external_user_id is not None else None,
+        route_handler = self._callback_routes.get(command.route)
+        if route_handler is None and command.route != "ai":
+            return []
+
+        auth_result = self.auth_flow.require_active_user(
+            request.channel,
+            str(external_user_id) if external_user_id is not None else None,
+        )
+        if not auth_result.user:
+            logger.warning(
+                "Unauthorized callback chat_id=%s user_id=%s",
+                chat_id,
+                external_user_id,
             )
-            if not auth_result.user:
-                logger.warning(
-                    "Unauthorized callback chat_id=%s user_id=%s",
-                    chat_id,
-                    external_user_id,
-                )
-                keyboard = _kb([ACTION_HELP])
-                return [self._make_message(auth_result.error_message or UNAUTHORIZED_MESSAGE, keyboard)]
-            if external_user_id is not None:
-                self._get_repo().update_user_last_seen(request.channel, str(external_user_id))
-            if command.route == "list":
-                return [await self.command_flow.handle_list(auth_result.user, chat_id)]
-            elif command.route == "summary":
-                return [await self.command_flow.handle_summary(auth_result.user, chat_id, request.channel)]
-            elif command.route == "recurrings":
-                return [await self.command_flow.handle_recurrings(auth_result.user, chat_id)]
-            elif command.route == "download":
-                return [await self.command_flow.handle_download(auth_result.user, chat_id)]
-            elif command.route == "undo":
-                return [await self.command_flow.handle_undo(auth_result.user, chat_id)]
-            elif command.route == "clear_all":
-                return [await self.command_flow.handle_clear_all(auth_result.user, chat_id)]
-            elif command.route == "clear_recurrings":
-                return [await self.command_flow.handle_clear_recurrings(auth_result.user, chat_id)]
-            elif command.route == "recurring_action":
-                return [self._handle_recurring_action(auth_result.user, command.text)]
-            elif command.route == "daily_nudge_action":
-                return [self._handle_daily_nudge_action(auth_result.user, command.text)]
-            else:
-                if command.route == "ai":
-                    pending_response = self._handle_pending_actions(
-                        auth_result.user,
-                        command,
-                        chat_id,
-                        request.message_id,
-                        request.channel,
-                    )
-                    if pending_response is not None:
-                        return [pending_response]
-                    natural_ai = await self._try_handle_recurring_natural_ai(auth_result.user, command.text or "")
-                    if natural_ai is not None:
-                        return [natural_ai]
-                    natural = self._try_handle_recurring_natural(auth_result.user, command.text or "")
-                    if natural is not None:
-                        return [natural]
-                if len(command.text_for_parsing or "") > settings.max_input_chars:
-                    keyboard = _kb([ACTION_HELP])
-                    return [self._make_message(LONG_MESSAGE, keyboard)]
-                if not settings.groq_api_key:
-                    return [self._make_message(AI_UNAVAILABLE_FALLBACK_MESSAGE, _kb_main())]
-                response = await self.ai_flow.handle(
-                    command,
-                    auth_result.user,
-                    chat_id,
-                    request.message_id,
-                    request.channel,
-                )
-                return [response]
-        return []
+            keyboard = KB_HELP
+            return [self._make_message(auth_result.error_message or UNAUTHORIZED_MESSAGE, keyboard)]
+        if external_user_id is not None:
+            self._touch_last_seen(request.channel, str(external_user_id))
+        if route_handler is not None:
+            return [await route_handler(auth_result.user, command, request)]
+
+        pending_response = self._handle_pending_actions(
+            auth_result.user,
+            command,
+            chat_id,
+            request.message_id,
+            request.channel,
+        )
+        if pending_response is not None:
+            return [pending_response]
+        natural_ai = await self._try_handle_recurring_natural_ai(auth_result.user, command.text or "")
+        if natural_ai is not None:
+            return [natural_ai]
+        natural = self._try_handle_recurring_natural(auth_result.user, command.text or "")
+        if natural is not None:
+            return [natural]
+        if len(command.text_for_parsing or "") > settings.max_input_chars:
+            keyboard = KB_HELP
+            return [self._make_message(LONG_MESSAGE, keyboard)]
+        if not settings.groq_api_key:
+            return [self._make_message(AI_UNAVAILABLE_FALLBACK_MESSAGE, KB_MAIN)]
+        response = await self.ai_flow.handle(
+            command,
+            auth_result.user,
+            chat_id,
+            request.message_id,
+            request.channel,
+        )
+        return [response]
 
     @staticmethod
     def _pending_allowed(command) -> bool:
@@ -714,27 +1300,38 @@ class BotPipeline(PipelineBase):
         expires_at = datetime.now(timezone.utc) + timedelta(minutes=max(1, ttl_minutes))
         self._get_repo().upsert_pending_action(user_id, action_type, state, expires_at=expires_at.isoformat())
 
+    def _replace_pending_action(
+        self,
+        pending_id: int,
+        user_id: str,
+        action_type: str,
+        state: Dict[str, Any],
+        ttl_minutes: int = PENDING_ACTION_TTL_MINUTES,
+    ) -> None:
+        expires_at = datetime.now(timezone.utc) + timedelta(minutes=max(1, ttl_minutes))
+        self._get_repo().replace_pending_action(pending_id, user_id, action_type, state, expires_at=expires_at.isoformat())
+
     @staticmethod
-    def _parse_pending_expires_at(pending: Dict[str, Any]) -> Optional[datetime]:
+    def _pending_expires_ts(pending: Dict[str, Any]) -> Optional[float]:
         value = pending.get("expires_at")
         if isinstance(value, datetime):
-            return value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+            return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp()
         if isinstance(value, str) and value:
-            try:
-                return datetime.fromisoformat(value.replace("Z", "+00:00"))
-            except ValueError:
-                return None
+            return _parse_iso_epoch(value)
         return None
 
-    def _get_pending_action_state(self, user_id: str, action_type: str) -> tuple[Optional[Dict[str, Any]], bool]:
-        pending = self._get_repo().get_pending_action(user_id, action_type)
-        if not pending:
-            return None, False
-        expires_at = self._parse_pending_expires_at(pending)
-        if expires_at and expires_at <= datetime.now(timezone.utc):
+    @staticmethod
+    def _pending_state(pending: Dict[str, Any]) -> Dict[str, Any]:
+        # The repo decodes the jsonb column, so state is already a dict (or missing).
+        state = pending.get("state")
+        return state if isinstance(state, dict) else {}
+
+    def _is_pending_expired(self, pending: Dict[str, Any]) -> bool:
+        expires_ts = self._pending_expires_ts(pending)
+        if expires_ts is not None and expires_ts <= time.time():
             self._get_repo().delete_pending_action(int(pending["id"]))
-            return None, True
-        return pending, False
+            return True
+        return False
 
     def _handle_pending_actions(
         self,
@@ -747,56 +1344,42 @@ class BotPipeline(PipelineBase):
         if not self._pending_allowed(command):
             return None
         user_id = str(user.get("userId"))
-        checks = [
-            (PENDING_RECURRING_ACTION, lambda p: self._handle_recurring_setup(user, command.text)),
-            (PENDING_RECURRING_OFFER_ACTION, lambda p: self._handle_recurring_offer(user, command.text, p)),
-            ("recurring_edit_reminders", lambda p: self._handle_recurring_edit(user, command.text, p)),
-            (
-                PENDING_MULTI_TX_CONFIRM,
-                lambda p: self._handle_multi_tx_confirm(user, command.text, p, chat_id, message_id, channel),
-            ),
-            (PENDING_CLEAR_ALL_CONFIRM, lambda p: self._handle_clear_all_confirm(user, command.text, p)),
-            (
-                PENDING_CLEAR_RECURRINGS_CONFIRM,
-                lambda p: self._handle_clear_recurrings_confirm(user, command.text, p),
-            ),
-            (
-                PENDING_RECURRING_CANCEL_CONFIRM,
-                lambda p: self._handle_recurring_cancel_confirm(user, command.text, p),
-            ),
-            (
-                PENDING_DAILY_NUDGE_SET_HOUR,
-                lambda p: self._handle_daily_nudge_set_hour(user, command.text, p),
-            ),
-        ]
-        for action_type, handler in checks:
-            pending, expired = self._get_pending_action_state(user_id, action_type)
-            if expired:
-                return self._make_message(PENDING_EXPIRED_MESSAGE, _kb_main())
-            if pending:
-                return handler(pending)
+        pending_by_type = self._get_repo().list_pending_actions(user_id, self._PENDING_ACTION_TYPES)
+        if not pending_by_type:
+            return None
+        for action_type, method_name in self._PENDING_HANDLERS:
+            pending = pending_by_type.get(action_type)
+            if not pending:
+                continue
+            if self._is_pending_expired(pending):
+                return self._make_message(PENDING_EXPIRED_MESSAGE, KB_MAIN)
+            handler = getattr(self, method_name)
+            if action_type == PENDING_MULTI_TX_CONFIRM:
+                return handler(user, command.text, pending, chat_id, message_id, channel)
+            return handler(user, command.text, pending)
         return None
 
-    def _parse_iso_date(self, value: str):
+    @staticmethod
+    def _parse_iso_date(value: str) -> Optional[date]:
         if not value:
             return None
-        try:
-            return __import__("datetime").date.fromisoformat(value)
-        except ValueError:
-            return None
+        return _parse_iso_date_value(value)
+
+    def _anchor_date_of(self, recurring: Dict[str, Any]) -> Optional[date]:
+        # Postgres hands anchor_date back as a date already; only string payloads need parsing.
+        value = recurring.get("anchor_date")
+        if isinstance(value, date):
+            return value
+        return self._parse_iso_date(str(value or ""))
 
     def _get_daily_nudge_prefs(self, user_id: str) -> Dict[str, Any]:
+        context = _request_context.get()
+        if context is not None and user_id in context.daily_nudge_prefs:
+            return dict(context.daily_nudge_prefs[user_id])
         pending = self._get_repo().get_pending_action(user_id, DAILY_NUDGE_PREFS_ACTION)
         state: Dict[str, Any] = {}
         if pending:
-            raw = pending.get("state") or {}
-            if isinstance(raw, str):
-                try:
-                    raw = __import__("json").loads(raw)
-                except Exception:
-                    raw = {}
-            if isinstance(raw, dict):
-                state = raw
+            state = self._pending_state(pending)
         enabled = bool(state.get("enabled", True))
         try:
             hour = int(state.get("hour", 19))
@@ -804,20 +1387,26 @@ class BotPipeline(PipelineBase):
             hour = 19
         if hour < 0 or hour > 23:
             hour = 19
-        return {"enabled": enabled, "hour": hour}
+        prefs = {"enabled": enabled, "hour": hour}
+        if context is not None:
+            context.daily_nudge_prefs[user_id] = dict(prefs)
+        return prefs
 
     def _save_daily_nudge_prefs(self, user_id: str, enabled: bool, hour: int) -> None:
         safe_hour = max(0, min(23, int(hour)))
-        self._get_repo().upsert_pending_action(
-            user_id,
-            DAILY_NUDGE_PREFS_ACTION,
-            {"enabled": bool(enabled), "hour": safe_hour},
-            expires_at=None,
-        )
+        prefs = {"enabled": bool(enabled), "hour": safe_hour}
+        self._get_repo().upsert_pending_action(user_id, DAILY_NUDGE_PREFS_ACTION, prefs, expires_at=None)
+        # The upsert wrote exactly these values, so later reads in this update need no round-trip.
+        context = _request_context.get()
+        if context is not None:
+            context.daily_nudge_prefs[user_id] = dict(prefs)
 
     @staticmethod
     def _hour_label(hour: int) -> str:
-        return f"{int(hour):02d}:00"
+        value = int(hour)
+        if 0 <= value < 24:
+            return _HOUR_LABELS[value]
+        return f"{value:02d}:00"
 
     def _offer_recurring_setup(self, tx: Dict[str, Any]) -> str:
         if not tx.get("isRecurring"):
@@ -869,126 +1458,129 @@ class BotPipeline(PipelineBase):
         message_id: Optional[str],
         source: str,
     ) -> BotMessage:
-        answer = (text or "").strip()
-        if is_negative(answer):
-            self._get_repo().delete_pending_action(int(pending["id"]))
-            return self._make_message("✅ Entendido. No guardé esos movimientos.", _kb_main())
-        if not is_affirmative(answer):
+        repo = self._get_repo()
+        answer = classify_yes_no(text)
+        if answer is False:
+            repo.delete_pending_action(int(pending["id"]))
+            return self._make_message("✅ Entendido. No guardé esos movimientos.", KB_MAIN)
+        if answer is None:
             return self._make_message(
                 "Responde <code>sí</code> para guardar o <code>no</code> para cancelar.",
-                _kb([ACTION_CONFIRM_YES, ACTION_CONFIRM_NO], [ACTION_HELP]),
+                KB_CONFIRM,
             )
 
-        state = pending.get("state") or {}
-        if isinstance(state, str):
-            try:
-                state = __import__("json").loads(state)
-            except Exception:
-                state = {}
+        state = self._pending_state(pending)
         txs = state.get("txs") or []
         if not isinstance(txs, list) or not txs:
-            self._get_repo().delete_pending_action(int(pending["id"]))
-            return self._make_message("⚠️ No encontré movimientos pendientes para confirmar.", _kb_main())
+            repo.delete_pending_action(int(pending["id"]))
+            return self._make_message("⚠️ No encontré movimientos pendientes para confirmar.", KB_MAIN)
 
-        finalized = [self.ai_flow._finalize_tx(dict(tx), user, chat_id, message_id, source) for tx in txs if isinstance(tx, dict)]
+        finalized = self.ai_flow._finalize_txs(
+            [tx for tx in txs if isinstance(tx, dict)],
+            user,
+            chat_id,
+            message_id,
+            source,
+        )
         if not finalized:
-            self._get_repo().delete_pending_action(int(pending["id"]))
-            return self._make_message("⚠️ No encontré movimientos válidos para confirmar.", _kb_main())
-        self._get_repo().append_transactions(finalized)
-        self._get_repo().delete_pending_action(int(pending["id"]))
+            repo.delete_pending_action(int(pending["id"]))
+            return self._make_message("⚠️ No encontré movimientos válidos para confirmar.", KB_MAIN)
+        repo.commit_multi_tx(finalized, int(pending["id"]))
+        self._forget_transactions()
         return self._make_message(
             format_multi_tx_saved_message(finalized),
-            _kb_after_save(),
+            KB_AFTER_SAVE,
         )
 
     def _handle_clear_all_confirm(self, user: Dict[str, Any], text: str, pending: Dict[str, Any]) -> BotMessage:
-        answer = (text or "").strip()
-        if is_negative(answer):
-            self._get_repo().delete_pending_action(int(pending["id"]))
-            return self._make_message("✅ Entendido. No eliminé ninguna transacción.", _kb_main())
-        if not is_affirmative(answer):
+        repo = self._get_repo()
+        answer = classify_yes_no(text)
+        if answer is False:
+            repo.delete_pending_action(int(pending["id"]))
+            return self._make_message("✅ Entendido. No eliminé ninguna transacción.", KB_MAIN)
+        if answer is None:
             return self._make_message(
                 "Responde <code>sí</code> para eliminar todo o <code>no</code> para cancelar.",
-                _kb([ACTION_CONFIRM_YES, ACTION_CONFIRM_NO], [ACTION_HELP]),
+                KB_CONFIRM,
             )
 
-        deleted_count = self._get_repo().mark_all_transactions_deleted(str(user.get("userId")))
-        self._get_repo().delete_pending_action(int(pending["id"]))
+        deleted_count = self._mark_all_transactions_deleted(str(user.get("userId")))
+        repo.delete_pending_action(int(pending["id"]))
         if deleted_count <= 0:
-            return self._make_message("📭 <b>Sin movimientos</b>\nNo había transacciones activas para eliminar.", _kb_main())
+            return self._make_message("📭 <b>Sin movimientos</b>\nNo había transacciones activas para eliminar.", KB_MAIN)
         return self._make_message(
             f"🗑️ <b>Listo</b>\nEliminé <b>{deleted_count}</b> transacciones.",
-            _kb_main(),
+            KB_MAIN,
         )
 
     def _handle_clear_recurrings_confirm(self, user: Dict[str, Any], text: str, pending: Dict[str, Any]) -> BotMessage:
-        answer = (text or "").strip()
-        if is_negative(answer):
-            self._get_repo().delete_pending_action(int(pending["id"]))
-            return self._make_message("✅ Entendido. No eliminé ningún recurrente de tu lista.", _kb_main())
-        if not is_affirmative(answer):
+        repo = self._get_repo()
+        answer = classify_yes_no(text)
+        if answer is False:
+            repo.delete_pending_action(int(pending["id"]))
+            return self._make_message("✅ Entendido. No eliminé ningún recurrente de tu lista.", KB_MAIN)
+        if answer is None:
             return self._make_message(
                 "Responde <code>sí</code> para cancelar todos los recurrentes o <code>no</code> para mantenerlos.",
-                _kb([ACTION_CONFIRM_YES, ACTION_CONFIRM_NO], [ACTION_HELP]),
+                KB_CONFIRM,
             )
 
-        items = self._get_repo().list_recurring_expenses(str(user.get("userId")))
-        clearable = [item for item in items if str(item.get("status") or "").lower() != "canceled"]
-        now = __import__("datetime").datetime.now(__import__("datetime").timezone.utc).isoformat()
-        for item in clearable:
-            self._get_repo().update_recurring_expense(int(item["id"]), {"status": "canceled", "canceled_at": now})
+        user_id = str(user.get("userId"))
+        clearable = self._list_recurring_expenses(user_id, include_canceled=False)
+        self._cancel_recurring_expenses(
+            user_id,
+            [int(item["id"]) for item in clearable],
+            datetime.now(timezone.utc).isoformat(),
+        )
 
-        self._get_repo().delete_pending_action(int(pending["id"]))
+        repo.delete_pending_action(int(pending["id"]))
         if not clearable:
-            return self._make_message("📭 <b>Sin recurrentes</b>\nNo había recurrentes para eliminar.", _kb_main())
+            return self._make_message("📭 <b>Sin recurrentes</b>\nNo había recurrentes para eliminar.", KB_MAIN)
         return self._make_message(
             f"🗑️ <b>Listo</b>\nEliminé <b>{len(clearable)}</b> recurrentes de tu lista.",
-            _kb_main(),
+            KB_MAIN,
         )
 
     @staticmethod
     def _norm_match(text: str) -> str:
-        raw = (text or "").strip().lower()
-        raw = unicodedata.normalize("NFD", raw)
-        raw = "".join(ch for ch in raw if unicodedata.category(ch) != "Mn")
-        raw = re.sub(r"\s+", " ", raw)
-        return raw
+        return _fold_text(text or "")
+
+    def _recurring_name_index(self, user_id: str) -> RecurringNameIndex:
+        context = _request_context.get()
+        index = context.recurring_name_indexes.get(user_id) if context is not None else None
+        if index is None:
+            # Ignore canceled items so natural updates don't target deleted records from history.
+            index = RecurringNameIndex.build(self._list_recurring_expenses(user_id, include_canceled=False))
+            if context is not None:
+                context.recurring_name_indexes[user_id] = index
+        return index
 
     def _find_recurring_by_text(self, user_id: str, text: str) -> list[Dict[str, Any]]:
-        items = self._get_repo().list_recurring_expenses(user_id)
-        # Ignore canceled items so natural updates don't target deleted records from history.
-        items = [item for item in items if str(item.get("status") or "").lower() != "canceled"]
+        index = self._recurring_name_index(user_id)
         norm_text = self._norm_match(text)
-        scored: list[tuple[int, Dict[str, Any]]] = []
-        for item in items:
-            name = str(item.get("service_name") or item.get("normalized_merchant") or item.get("description") or "").strip()
-            if not name:
-                continue
-            norm_name = self._norm_match(name)
-            if not norm_name:
-                continue
-            score = 0
+        best_score = 0
+        best_items: list[Dict[str, Any]] = []
+        for norm_name, tokens, full_score, item in zip(index.names, index.tokens, index.full_scores, index.items):
             if norm_name in norm_text:
-                score += len(norm_name) + 20
-            # Include short merchant tokens like "luz", "gas", "agua".
-            tokens = [tok for tok in norm_name.split() if len(tok) >= 3]
-            for tok in tokens:
-                if tok in norm_text:
-                    score += len(tok)
-            if score > 0:
-                scored.append((score, item))
-        scored.sort(key=lambda x: x[0], reverse=True)
-        if not scored:
-            return []
-        top = scored[0][0]
-        return [item for score, item in scored if score == top]
+                score = full_score
+            else:
+                score = 0
+                for tok in tokens:
+                    if tok in norm_text:
+                        score += len(tok)
+            if score > best_score:
+                best_score = score
+                best_items = [item]
+            elif score == best_score and score > 0:
+                best_items.append(item)
+        return best_items
 
     @staticmethod
     def _extract_explicit_id(text: str) -> Optional[int]:
         source = text or ""
-        match = re.search(r"\b(?:id|codigo|c[oó]digo)\s*#?\s*(\d+)\b", source, flags=re.IGNORECASE)
+        match = _EXPLICIT_ID_RE.search(source)
         if not match:
-            match = re.search(r"#\s*(\d+)\b", source)
+            match = _HASH_ID_RE.search(source)
         if not match:
             return None
         try:
@@ -1001,91 +1593,23 @@ class BotPipeline(PipelineBase):
         t = (text or "").strip().lower()
         if not t:
             return False
-        patterns = [
-            r"\b(recordatorio|recordatorios|recurrente|recurrentes|suscripcion|suscripciones)\b",
-            r"\b(cada\s+mes|todos?\s+los\s+meses|mensual|semanal|quincenal|trimestral|anual)\b",
-            r"\bid\s*#?\s*\d+\b.*\b(cambiar|actualizar|monto|valor|hora|pausar|activar|cancelar)\b",
-            r"\b(codigo|c[oó]digo)\s*#?\s*\d+\b.*\b(cambiar|actualizar|monto|valor|hora|pausar|activar|cancelar)\b",
-            r"\b(a\s+las\s+\d{1,2}(:\d{2})?\s*(am|pm)?)\b",
-            r"\b(sube|subir|baja|bajar|ajusta|ajustar|cambia|cambiar|actualiza|actualizar|monto|valor|pausa|pausar|activar|activa|cancelar|cancela)\b",
-            r"\b(enlace|enalce|enlance|link|url|portal|referencia|ref)\b",
-            r"(https?://[^\s]+|www\.[^\s]+)",
-        ]
-        return any(re.search(pattern, t) for pattern in patterns)
+        return _RECURRING_REQUEST_RE.search(t) is not None
 
     def _parse_billing_day_natural(self, text: str) -> Optional[int]:
-        t = (text or "").lower()
-        candidates = [
-            re.search(r"\b(\d{1,2})\s+de\s+cada\s+mes\b", t),
-            re.search(r"\bel\s+(\d{1,2})\s+de\s+cada\s+mes\b", t),
-            re.search(r"\btodos?\s+los\s+(\d{1,2})\b", t),
-            re.search(r"\bel\s+(\d{1,2})\b", t),
-        ]
-        for match in candidates:
-            if not match:
-                continue
-            try:
-                day = int(match.group(1))
-            except ValueError:
-                continue
-            if 1 <= day <= 31:
-                return day
-        return None
+        return self._first_billing_day(_NATURAL_BILLING_DAY_PATTERNS, (text or "").lower())
 
     async def _try_handle_recurring_natural_ai(self, user: Dict[str, Any], text: str) -> Optional[BotMessage]:
+        user_id = str(user.get("userId"))
         raw = (text or "").strip()
         if not raw or not self.settings.groq_api_key:
             return None
         if not self._looks_like_recurring_request(raw):
             return None
         try:
-            content = await self._get_groq().chat_completion(
-                (
-                    "Eres un parser experto de recordatorios recurrentes de pago en español.\n"
-                    "Objetivo: extraer intención + campos estructurados desde texto natural.\n"
-                    "Responde SOLO JSON válido (sin markdown, sin comentarios).\n"
-                    "No inventes datos: si no aparece en el texto, usa null o [] según corresponda.\n"
-                    "Si no es un caso de recurrentes, usa intent=none.\n\n"
-                    "Schema exacto:\n"
-                    "{\n"
-                    '  "intent": "none|create|update|pause|activate|cancel|list",\n'
-                    '  "target_id": number|null,\n'
-                    '  "service_name": string|null,\n'
-                    '  "amount": number|null,\n'
-                    '  "payment_link": string|null,\n'
-                    '  "payment_reference": string|null,\n'
-                    '  "recurrence": "weekly|biweekly|monthly|quarterly|yearly"|null,\n'
-                    '  "billing_day": number|null,\n'
-                    '  "reminder_hour": number|null,\n'
-                    '  "remind_offsets": number[],\n'
-                    '  "includes_same_day": boolean,\n'
-                    '  "confidence": number\n'
-                    "}\n\n"
-                    "Reglas de extracción:\n"
-                    "- reminder_hour: entero 0..23. Ej: '6 pm'->18, '2:30 pm'->14.\n"
-                    "- billing_day: día del mes 1..31 cuando aparezca ('16 de cada mes', 'el 5').\n"
-                    "- remind_offsets: días antes del cobro en orden descendente, sin repetidos.\n"
-                    "- includes_same_day=true cuando aparezca 'mismo día', 'el día', 'día del cobro', 'hoy', '0 días'.\n"
-                    "- Si includes_same_day=true, asegúrate de incluir 0 en remind_offsets.\n"
-                    "- amount: número absoluto (ej: 56k->56000).\n"
-                    "- payment_link: URL si aparece (http/https o www).\n"
-                    "- payment_reference: referencia/convenio/cuenta si aparece.\n"
-                    "- target_id: solo si el texto menciona ID explícito.\n\n"
-                    "Ejemplos:\n"
-                    "Input: 'ID 2 actualizar a las 3 pm, recordatorio 3 dias y el mismo dia'\n"
-                    'Output: {"intent":"update","target_id":2,"service_name":null,"amount":null,"recurrence":null,"billing_day":null,"reminder_hour":15,"remind_offsets":[3,0],"includes_same_day":true,"confidence":0.93}\n'
-                    "Input: 'pago recurrente de 56k para luz a las 6 pm'\n"
-                    'Output: {"intent":"create","target_id":null,"service_name":"luz","amount":56000,"payment_link":null,"payment_reference":null,"recurrence":"monthly","billing_day":null,"reminder_hour":18,"remind_offsets":[],"includes_same_day":false,"confidence":0.89}\n'
-                    "Input: 'este es el enlance del código 1: https://pagos.com ref 778899'\n"
-                    'Output: {"intent":"update","target_id":1,"service_name":null,"amount":null,"payment_link":"https://pagos.com","payment_reference":"778899","recurrence":null,"billing_day":null,"reminder_hour":null,"remind_offsets":[],"includes_same_day":false,"confidence":0.95}\n'
-                    "Input: 'almuerzo 20000'\n"
-                    'Output: {"intent":"none","target_id":null,"service_name":null,"amount":null,"payment_link":null,"payment_reference":null,"recurrence":null,"billing_day":null,"reminder_hour":null,"remind_offsets":[],"includes_same_day":false,"confidence":0.98}'
-                ),
-                raw,
-            )
+            content = await self._get_groq().chat_completion(_RECURRING_PARSER_SYSTEM_PROMPT, raw)
             parsed = extract_json(content)
         except Exception as exc:
-            logger.warning("Recurring natural AI parse failed user_id=%s error=%s", user.get("userId"), exc)
+            logger.warning("Recurring natural AI parse failed user_id=%s error=%s", user_id, exc)
             return None
         if not isinstance(parsed, dict):
             return None
@@ -1096,7 +1620,7 @@ class BotPipeline(PipelineBase):
         if confidence < 0.55:
             return self._make_message(
                 "⚠️ No tuve suficiente claridad para aplicar cambios automáticos. Indícame el código y el cambio puntual, por ejemplo: <code>código 2 cambiar hora a 18:30</code>.",
-                _kb([ACTION_RECURRINGS, ACTION_HELP]),
+                KB_RECURRING,
             )
         if intent == "list":
             return await self.command_flow.handle_recurrings(user, None)
@@ -1107,7 +1631,7 @@ class BotPipeline(PipelineBase):
         if isinstance(target_id, (int, float)) and int(target_id) > 0:
             recurring_id = int(target_id)
         elif service_name:
-            matches = self._find_recurring_by_text(str(user.get("userId")), service_name)
+            matches = self._find_recurring_by_text(user_id, service_name)
             if len(matches) == 1:
                 recurring_id = int(matches[0]["id"])
 
@@ -1132,26 +1656,26 @@ class BotPipeline(PipelineBase):
             recurring_id, err = self._resolve_recurring_target(user, raw)
             if err:
                 return err
-        recurring = self._get_repo().get_recurring_expense(int(recurring_id))
-        if not recurring or str(recurring.get("user_id")) != str(user.get("userId")):
-            return self._make_message(RECURRING_NOT_FOUND_MESSAGE, _kb([ACTION_RECURRINGS, ACTION_HELP]))
+        recurring = self._get_recurring_expense(int(recurring_id), user_id)
+        if not recurring:
+            return self._make_message(RECURRING_NOT_FOUND_MESSAGE, KB_RECURRING)
 
         updates: Dict[str, Any] = {}
         amount = parsed.get("amount")
         if isinstance(amount, (int, float)) and float(amount) >= 0:
             updates["amount"] = round(float(amount), 2)
-        elif re.search(r"\b(monto|valor|sube|subir|baja|bajar|ajusta|ajustar|cambia|cambiar|actualiza|actualizar)\b", self._norm_match(raw)):
+        elif _AMOUNT_UPDATE_HINT_RE.search(self._norm_match(raw)):
             inferred_amount = parse_amount_in_context(raw)
             if inferred_amount is not None and inferred_amount >= 0:
                 updates["amount"] = round(float(inferred_amount), 2)
 
         payment_link = str(parsed.get("payment_link") or "").strip()
-        if payment_link and re.match(r"^(https?://|www\.)", payment_link, flags=re.IGNORECASE):
+        if payment_link and _URL_PREFIX_RE.match(payment_link):
             if payment_link.lower().startswith("www."):
                 payment_link = f"https://{payment_link}"
             updates["payment_link"] = payment_link[:500]
         else:
-            link_match = re.search(r"(https?://[^\s]+|www\.[^\s]+)", raw, flags=re.IGNORECASE)
+            link_match = _URL_RE.search(raw)
             if link_match:
                 inferred_link = link_match.group(1).rstrip(".,;:)>]}\"'")
                 if inferred_link.lower().startswith("www."):
@@ -1162,7 +1686,7 @@ class BotPipeline(PipelineBase):
         if payment_reference:
             updates["payment_reference"] = payment_reference[:500]
         else:
-            ref_match = re.search(r"\b(?:referencia|ref(?:erencia)?|convenio|cuenta)\s*[:#-]?\s*([A-Za-z0-9\-_.]{3,64})\b", raw, flags=re.IGNORECASE)
+            ref_match = _PAYMENT_REFERENCE_RE.search(raw)
             if ref_match:
                 updates["payment_reference"] = ref_match.group(1)[:500]
         recurrence = str(parsed.get("recurrence") or "").lower()
@@ -1179,7 +1703,7 @@ class BotPipeline(PipelineBase):
         reminder_hour = parsed.get("reminder_hour")
         if isinstance(reminder_hour, (int, float)) and 0 <= int(reminder_hour) <= 23:
             updates["reminder_hour"] = int(reminder_hour)
-        elif re.search(r"\ba las\b|\bhora\b", self._norm_match(raw)):
+        elif _HOUR_HINT_RE.search(self._norm_match(raw)):
             inferred_hour = parse_reminder_hour(raw)
             if inferred_hour is not None:
                 updates["reminder_hour"] = inferred_hour
@@ -1214,32 +1738,31 @@ class BotPipeline(PipelineBase):
         if not updates:
             return self._make_message(
                 "⚠️ Me faltan datos para actualizar ese recurrente. Ejemplo: <code>código 2 cambiar monto a 56000 y hora 18:30</code>",
-                _kb([ACTION_RECURRINGS, ACTION_HELP]),
+                KB_RECURRING,
             )
 
-        self._get_repo().update_recurring_expense(int(recurring_id), updates)
-        refreshed = self._get_repo().get_recurring_expense(int(recurring_id))
-        if refreshed and str(refreshed.get("status") or "").lower() == "active":
-            today = get_today(self.settings)
-            next_due = compute_next_due(
-                str(refreshed.get("recurrence") or "monthly"),
-                today,
-                refreshed.get("billing_day"),
-                refreshed.get("billing_weekday"),
-                refreshed.get("billing_month"),
-                self._parse_iso_date(str(refreshed.get("anchor_date") or "")),
+        # Derive next_due from the row we already loaded so the update is a single write.
+        merged = {**recurring, **updates}
+        if str(merged.get("status") or "").lower() == "active":
+            updates["next_due"] = compute_next_due(
+                str(merged.get("recurrence") or "monthly"),
+                get_today(self.settings),
+                merged.get("billing_day"),
+                merged.get("billing_weekday"),
+                merged.get("billing_month"),
+                self._anchor_date_of(merged),
             )
-            self._get_repo().update_recurring_expense(int(recurring_id), {"next_due": next_due})
-            refreshed = self._get_repo().get_recurring_expense(int(recurring_id))
+        refreshed = self._update_recurring_expense(int(recurring_id), updates)
         if refreshed:
-            return self._make_message(build_setup_summary(refreshed, self.settings), _kb([ACTION_RECURRINGS, ACTION_LIST], [ACTION_SUMMARY, ACTION_HELP]))
-        return self._make_message("✅ Recurrente actualizado.", _kb([ACTION_RECURRINGS, ACTION_LIST], [ACTION_SUMMARY, ACTION_HELP]))
+            return self._make_message(build_setup_summary(refreshed, self.settings), KB_RECURRING_NAV)
+        return self._make_message("✅ Recurrente actualizado.", KB_RECURRING_NAV)
 
     @staticmethod
     def _format_amount_for_command(amount: float) -> str:
-        if float(amount).is_integer():
-            return str(int(amount))
-        return str(round(float(amount), 2))
+        value = float(amount)
+        if value.is_integer():
+            return str(int(value))
+        return str(round(value, 2))
 
     def _resolve_recurring_target(
         self,
@@ -1248,26 +1771,25 @@ class BotPipeline(PipelineBase):
         *,
         allow_numeric_fallback: bool = False,
     ) -> tuple[Optional[int], Optional[BotMessage]]:
+        user_id = str(user.get("userId"))
         explicit_id = self._extract_explicit_id(text)
         if explicit_id is not None:
-            recurring = self._get_repo().get_recurring_expense(explicit_id)
-            if not recurring or str(recurring.get("user_id")) != str(user.get("userId")):
-                return None, self._make_message(RECURRING_NOT_FOUND_MESSAGE, _kb([ACTION_RECURRINGS, ACTION_HELP]))
+            if not self._get_recurring_expense(explicit_id, user_id):
+                return None, self._make_message(RECURRING_NOT_FOUND_MESSAGE, KB_RECURRING)
             return explicit_id, None
 
         if allow_numeric_fallback:
-            numerics = re.findall(r"\b\d+\b", text or "")
+            numerics = _INTEGER_RE.findall(text or "")
             if len(numerics) == 1:
                 try:
                     candidate = int(numerics[0])
                 except ValueError:
                     candidate = 0
                 if candidate > 0:
-                    recurring = self._get_repo().get_recurring_expense(candidate)
-                    if recurring and str(recurring.get("user_id")) == str(user.get("userId")):
+                    if self._get_recurring_expense(candidate, user_id):
                         return candidate, None
 
-        matches = self._find_recurring_by_text(str(user.get("userId")), text or "")
+        matches = self._find_recurring_by_text(user_id, text or "")
         if len(matches) == 1:
             return int(matches[0]["id"]), None
         if len(matches) > 1:
@@ -1276,12 +1798,12 @@ class BotPipeline(PipelineBase):
                 "⚠️ Encontré más de un recurrente que coincide.\n"
                 f"Códigos posibles: {options}\n"
                 "Escríbelo con código. Ej: <code>monto código 12 45000</code>.",
-                _kb([ACTION_RECURRINGS, ACTION_HELP]),
+                KB_RECURRING,
             )
         return None, self._make_message(
             "⚠️ No pude identificar cuál recurrente quieres editar.\n"
             "Primero usa <code>/recurrings</code> y luego envía el código.",
-            _kb([ACTION_RECURRINGS, ACTION_HELP]),
+            KB_RECURRING,
         )
 
     def _try_handle_recurring_natural(self, user: Dict[str, Any], text: str) -> Optional[BotMessage]:
@@ -1293,18 +1815,15 @@ class BotPipeline(PipelineBase):
         has_explicit_id = self._extract_explicit_id(raw) is not None
         matched_targets = self._find_recurring_by_text(user_id, raw)
         has_target_match = bool(matched_targets)
-        has_recurring_hint = bool(re.search(r"\b(recurrente|recurrentes|suscripcion|suscripciones|recordatorio|recordatorios)\b", norm))
-        has_link_update_hint = bool(re.search(r"\b(enlace|enlance|link|url|portal|referencia|ref)\b", norm))
-        has_update_verb = bool(re.search(r"\b(actualiza|actualizar|cambia|cambiar|agrega|agregar|pon|poner|deja)\b", norm))
-        has_url = bool(re.search(r"(https?://[^\s]+|www\.[^\s]+)", raw, flags=re.IGNORECASE))
-
-        if re.search(r"\b(recordame|recuerdame|avisame)\b", norm) and re.search(
-            r"\b(pagar|pago|factura|recibo|cobro|suscripcion)\b",
-            norm,
-        ):
+        has_recurring_hint = bool(_RECURRING_HINT_RE.search(norm))
+        has_link_update_hint = bool(_LINK_UPDATE_HINT_RE.search(norm))
+        has_update_verb = bool(_UPDATE_VERB_RE.search(norm))
+        has_url = _may_contain_url(norm) and bool(_URL_RE.search(raw))
+
+        if _REMIND_ME_RE.search(norm) and _PAYMENT_NOUN_RE.search(norm):
             return self._start_recurring_from_text(user, raw)
 
-        if re.search(r"\b(nuevo|crear|crea|agregar|agrega)\b.*\b(recordatorio|recurrente|suscripcion)\b", norm):
+        if _CREATE_RECURRING_RE.search(norm):
             return self._start_recurring_from_text(user, raw)
 
         if has_url and (
@@ -1314,7 +1833,7 @@ class BotPipeline(PipelineBase):
         ):
             return self._handle_recurring_update_payment(user, raw)
 
-        if re.search(r"\b(recordatorios?|avisos?)\b", norm) and re.search(r"\d+\s*,\s*\d+", raw):
+        if _REMINDERS_WORD_RE.search(norm) and _OFFSET_LIST_RE.search(raw):
             offsets = parse_remind_offsets(raw)
             if offsets:
                 if not (has_explicit_id or has_target_match or has_recurring_hint):
@@ -1325,18 +1844,16 @@ class BotPipeline(PipelineBase):
                 offsets_text = ",".join([str(v) for v in offsets])
                 return self._handle_recurring_edit(user, f"recordatorios {recurring_id} {offsets_text}")
 
-        if parse_amount_in_context(raw) is not None and re.search(r"\b(monto|valor|sube|subir|baja|bajar|ajusta|ajustar|cambia|cambiar|actualiza|actualizar)\b", norm):
+        amount = parse_amount_in_context(raw) if _AMOUNT_UPDATE_HINT_RE.search(norm) else None
+        if amount is not None:
             if not (has_explicit_id or has_target_match or has_recurring_hint):
                 return None
             recurring_id, err = self._resolve_recurring_target(user, raw)
             if err:
                 return err
-            amount = parse_amount_in_context(raw)
-            if amount is None:
-                return self._make_message("⚠️ <b>Monto inválido</b>", _kb([ACTION_RECURRINGS, ACTION_HELP]))
             return self._handle_recurring_update_amount(user, f"monto {recurring_id} {self._format_amount_for_command(amount)}")
 
-        if re.search(r"\b(cancela|cancelar|elimina|eliminar)\b", norm):
+        if _CANCEL_VERB_RE.search(norm):
             if not (has_explicit_id or has_target_match or has_recurring_hint):
                 return None
             recurring_id, err = self._resolve_recurring_target(user, raw, allow_numeric_fallback=True)
@@ -1344,7 +1861,7 @@ class BotPipeline(PipelineBase):
                 return err
             return self._handle_recurring_cancel(user, f"cancelar {recurring_id}")
 
-        if re.search(r"\b(pausa|pausar|deten|detener|frena|desactiva|desactivar)\b", norm):
+        if _PAUSE_VERB_RE.search(norm):
             if not (has_explicit_id or has_target_match or has_recurring_hint):
                 return None
             recurring_id, err = self._resolve_recurring_target(user, raw, allow_numeric_fallback=True)
@@ -1352,7 +1869,7 @@ class BotPipeline(PipelineBase):
                 return err
             return self._handle_recurring_toggle(user, f"pausar {recurring_id}")
 
-        if re.search(r"\b(activa|activar|reanuda|reanudar)\b", norm):
+        if _ACTIVATE_VERB_RE.search(norm):
             if not (has_explicit_id or has_target_match or has_recurring_hint):
                 return None
             recurring_id, err = self._resolve_recurring_target(user, raw, allow_numeric_fallback=True)
@@ -1367,16 +1884,16 @@ class BotPipeline(PipelineBase):
         existing = self._get_repo().find_recurring_by_recurrence_id(user_id, recurrence_id)
         tx_date = self._parse_iso_date(str(tx.get("date") or "")) or get_today(self.settings)
         if existing:
+            backfill: Dict[str, Any] = {}
             if not existing.get("anchor_date"):
-                self._get_repo().update_recurring_expense(
-                    int(existing.get("id")),
-                    {"anchor_date": tx_date.isoformat(), "billing_month": tx_date.month},
-                )
+                backfill.update(anchor_date=tx_date.isoformat(), billing_month=tx_date.month)
             if existing.get("reminder_hour") is None:
-                self._get_repo().update_recurring_expense(int(existing.get("id")), {"reminder_hour": 9})
+                backfill["reminder_hour"] = 9
+            if backfill:
+                self._update_recurring_expense(int(existing.get("id")), backfill)
             return existing
 
-        return self._get_repo().create_recurring_expense(
+        return self._create_recurring_expense(
             {
                 "user_id": user_id,
                 "service_name": tx.get("normalizedMerchant") or tx.get("description") or "Pago recurrente",
@@ -1398,103 +1915,95 @@ class BotPipeline(PipelineBase):
         )
 
     def _handle_recurring_offer(self, user: Dict[str, Any], text: str, pending: Dict[str, Any]) -> BotMessage:
-        answer = (text or "").strip()
-        if is_negative(answer):
-            self._get_repo().delete_pending_action(int(pending["id"]))
-            return self._make_message("✅ Entendido. No crearé recordatorio para ese gasto.", _kb([ACTION_RECURRINGS, ACTION_LIST], [ACTION_SUMMARY, ACTION_HELP]))
-        if not is_affirmative(answer):
+        repo = self._get_repo()
+        user_id = str(user.get("userId"))
+        answer = classify_yes_no(text)
+        if answer is False:
+            repo.delete_pending_action(int(pending["id"]))
+            return self._make_message("✅ Entendido. No crearé recordatorio para ese gasto.", KB_RECURRING_NAV)
+        if answer is None:
             return self._make_message(
                 "Responde <code>sí</code> para crear el recordatorio o <code>no</code> para omitir.",
-                _kb([ACTION_CONFIRM_YES, ACTION_CONFIRM_NO], [ACTION_RECURRINGS, ACTION_HELP]),
+                KB_RECURRING_CONFIRM,
             )
 
-        state = pending.get("state") or {}
-        if isinstance(state, str):
-            try:
-                state = __import__("json").loads(state)
-            except Exception:
-                state = {}
+        state = self._pending_state(pending)
         tx = state.get("tx") or {}
-        recurring = self._create_recurring_from_tx(str(user.get("userId")), tx)
+        recurring = self._create_recurring_from_tx(user_id, tx)
         pending_state = {
             "recurring_id": recurring["id"],
             "step": "ask_billing_day",
             "recurrence": recurring.get("recurrence") or "monthly",
         }
-        self._get_repo().delete_pending_action(int(pending["id"]))
-        self._upsert_pending_action(str(user.get("userId")), PENDING_RECURRING_ACTION, pending_state)
+        self._replace_pending_action(int(pending["id"]), user_id, PENDING_RECURRING_ACTION, pending_state)
         return self._make_message(
             build_setup_question("ask_billing_day", pending_state["recurrence"]),
-            _kb([ACTION_RECURRINGS, ACTION_LIST], [ACTION_SUMMARY, ACTION_HELP]),
+            KB_RECURRING_NAV,
         )
 
     def _start_recurring_from_text(self, user: Dict[str, Any], text: str) -> BotMessage:
+        user_id = str(user.get("userId"))
         content = text or ""
-        recurrence = parse_recurrence(content)
+        # Every parser below works on the same normalized text; lower it once.
+        lower = content.strip().lower()
+        recurrence = parse_recurrence(content, lowered=lower)
         service_name = parse_service_name(content) or "Pago recurrente"
-        billing_day = self._parse_billing_day_from_text(content) if recurrence in {"monthly", "quarterly", "yearly"} else None
-        billing_weekday = parse_weekday(content) if recurrence in {"weekly", "biweekly"} else None
-        reminder_hour = parse_reminder_hour(content)
+        billing_day = self._first_billing_day(_SETUP_BILLING_DAY_PATTERNS, lower) if recurrence in {"monthly", "quarterly", "yearly"} else None
+        billing_weekday = parse_weekday(content, lowered=lower) if recurrence in {"weekly", "biweekly"} else None
+        reminder_hour = parse_reminder_hour(content, lowered=lower)
         offsets = [3, 1, 0]
-        if re.search(r"\b(recordatorio|recordatorios|av[ií]same|avisa|avisar|d[ií]as?\s+antes|mismo\s+d[ií]a|d[ií]a\s+del\s+cobro)\b", content.lower()):
-            parsed_offsets = parse_remind_offsets(content)
+        if _REMINDER_DETAILS_HINT_RE.search(lower):
+            parsed_offsets = parse_remind_offsets(content, lowered=lower)
             if parsed_offsets:
                 offsets = parsed_offsets
         recurrence_id = f"REC:{service_name.upper().replace(' ', '_')[:40]}"
         parsed_amount = parse_amount_in_context(content)
         amount = parsed_amount if parsed_amount is not None else 0
-        link_match = re.search(r"(https?://[^\s]+|www\.[^\s]+)", content, flags=re.IGNORECASE)
+        link_match = _URL_RE.search(content) if _may_contain_url(lower) else None
         payment_link = link_match.group(1)[:500] if link_match else ""
         payment_reference = ""
-        ref_match = re.search(r"\b(?:ref(?:erencia)?|convenio|cuenta)\s*[:#-]?\s*([A-Za-z0-9\-_.]{4,64})\b", content, flags=re.IGNORECASE)
+        ref_match = _SETUP_REFERENCE_RE.search(content)
         if ref_match:
             payment_reference = ref_match.group(1)[:500]
         today = get_today(self.settings)
-        existing = self._get_repo().find_recurring_by_recurrence_id(str(user.get("userId")), recurrence_id)
-        if existing:
-            recurring = existing
-            self._get_repo().update_recurring_expense(
-                int(existing["id"]),
-                {
-                    "service_name": service_name,
-                    "recurrence": recurrence,
-                    "billing_day": billing_day if billing_day is not None else existing.get("billing_day"),
-                    "billing_weekday": billing_weekday if billing_weekday is not None else existing.get("billing_weekday"),
-                    "amount": amount if parsed_amount is not None else (existing.get("amount") or 0),
-                    "reminder_hour": reminder_hour if reminder_hour is not None else (existing.get("reminder_hour") or 9),
-                    "remind_offsets": offsets,
-                    "payment_link": payment_link or (existing.get("payment_link") or ""),
-                    "payment_reference": payment_reference or (existing.get("payment_reference") or ""),
-                    "status": "pending",
-                },
-            )
-        else:
-            recurring = self._get_repo().create_recurring_expense(
-                {
-                    "user_id": str(user.get("userId")),
-                    "service_name": service_name,
-                    "recurrence_id": recurrence_id,
-                    "normalized_merchant": service_name,
-                    "description": service_name,
-                    "category": "utilities",
-                    "amount": amount,
-                    "currency": "COP",
-                    "recurrence": recurrence,
-                    "billing_day": billing_day,
-                    "billing_weekday": billing_weekday,
-                    "billing_month": today.month,
-                    "anchor_date": today.isoformat(),
-                    "timezone": self.settings.timezone or "America/Bogota",
-                    "remind_offsets": offsets,
-                    "reminder_hour": reminder_hour if reminder_hour is not None else 9,
-                    "payment_link": payment_link,
-                    "payment_reference": payment_reference,
-                    "status": "pending",
-                    "source_tx_id": None,
-                }
-            )
+        recurring = self._upsert_recurring_expense(
+            {
+                "user_id": user_id,
+                "service_name": service_name,
+                "recurrence_id": recurrence_id,
+                "normalized_merchant": service_name,
+                "description": service_name,
+                "category": "utilities",
+                "amount": amount,
+                "currency": "COP",
+                "recurrence": recurrence,
+                "billing_day": billing_day,
+                "billing_weekday": billing_weekday,
+                "billing_month": today.month,
+                "anchor_date": today.isoformat(),
+                "timezone": self.settings.timezone or "America/Bogota",
+                "remind_offsets": offsets,
+                "reminder_hour": reminder_hour if reminder_hour is not None else 9,
+                "payment_link": payment_link,
+                "payment_reference": payment_reference,
+                "status": "pending",
+                "source_tx_id": None,
+            },
+            # An existing setup with the same key keeps whatever this message did not mention.
+            {
+                "service_name": service_name,
+                "recurrence": recurrence,
+                "billing_day": billing_day,
+                "billing_weekday": billing_weekday,
+                "amount": parsed_amount,
+                "reminder_hour": reminder_hour,
+                "remind_offsets": offsets,
+                "payment_link": payment_link or None,
+                "payment_reference": payment_reference or None,
+                "status": "pending",
+            },
+        )
 
-        recurring = self._get_repo().get_recurring_expense(int(recurring["id"])) or recurring
         effective_billing_day = recurring.get("billing_day")
         effective_billing_weekday = recurring.get("billing_weekday")
 
@@ -1511,48 +2020,34 @@ class BotPipeline(PipelineBase):
                 effective_billing_day,
                 effective_billing_weekday,
                 recurring.get("billing_month"),
-                self._parse_iso_date(str(recurring.get("anchor_date") or "")),
+                self._anchor_date_of(recurring),
             )
-            self._get_repo().update_recurring_expense(
+            refreshed = self._update_recurring_expense(
                 int(recurring["id"]),
                 {"status": "active", "next_due": next_due},
             )
-            refreshed = self._get_repo().get_recurring_expense(int(recurring["id"]))
             if refreshed:
-                return self._make_message(build_setup_summary(refreshed, self.settings), _kb([ACTION_RECURRINGS, ACTION_LIST], [ACTION_SUMMARY, ACTION_HELP]))
-            return self._make_message("✅ Recurrente activado.", _kb([ACTION_RECURRINGS, ACTION_LIST], [ACTION_SUMMARY, ACTION_HELP]))
+                return self._make_message(build_setup_summary(refreshed, self.settings), KB_RECURRING_NAV)
+            return self._make_message("✅ Recurrente activado.", KB_RECURRING_NAV)
         step = "ask_billing_day"
         pending_state = {
             "recurring_id": recurring["id"],
             "step": step,
             "recurrence": recurrence,
         }
-        self._upsert_pending_action(str(user.get("userId")), PENDING_RECURRING_ACTION, pending_state)
-        recurrence_label = {
-            "weekly": "semanal",
-            "biweekly": "quincenal",
-            "monthly": "mensual",
-            "quarterly": "trimestral",
-            "yearly": "anual",
-        }.get(str(recurrence), str(recurrence))
+        self._upsert_pending_action(user_id, PENDING_RECURRING_ACTION, pending_state)
+        recurrence_label = RECURRENCE_LABELS.get(str(recurrence), str(recurrence))
         intro = f"✅ Perfecto. Voy a configurar el recordatorio para <b>{service_name}</b> ({recurrence_label})."
         return self._make_message(
             f"{intro}\n\n{build_setup_question(step, recurrence)}",
-            _kb([ACTION_RECURRINGS, ACTION_LIST], [ACTION_SUMMARY, ACTION_HELP]),
+            KB_RECURRING_NAV,
         )
 
-    def _parse_billing_day_from_text(self, text: str) -> Optional[int]:
-        import re
-
-        lower = (text or "").lower()
-        matches = [
-            re.search(r"(?:todos?\s+los|cada)\s+(\d{1,2})\b", lower),
-            re.search(r"\b(\d{1,2})\s+de\s+cada\s+mes\b", lower),
-            re.search(r"\bel\s+(\d{1,2})\s+de\s+cada\s+mes\b", lower),
-            re.search(r"\bcada\s+mes\s+el\s+(\d{1,2})\b", lower),
-            re.search(r"\bcada\s+mes\s+(\d{1,2})\b", lower),
-        ]
-        for match in matches:
+    @staticmethod
+    def _first_billing_day(patterns: tuple[re.Pattern[str], ...], lower: str) -> Optional[int]:
+        # Patterns are in priority order; stop scanning as soon as one yields a valid day.
+        for pattern in patterns:
+            match = pattern.search(lower)
             if not match:
                 continue
             try:
@@ -1563,16 +2058,14 @@ class BotPipeline(PipelineBase):
                 return value
         return None
 
-    def _handle_recurring_setup(self, user: Dict[str, Any], text: str) -> BotMessage:
-        pending = self._get_repo().get_pending_action(str(user.get("userId")), PENDING_RECURRING_ACTION)
+    def _handle_recurring_setup(self, user: Dict[str, Any], text: str, pending: Optional[Dict[str, Any]] = None) -> BotMessage:
+        repo = self._get_repo()
+        user_id = str(user.get("userId"))
+        if pending is None:
+            pending = repo.get_pending_action(user_id, PENDING_RECURRING_ACTION)
         if not pending:
-            return self._make_message(HELP_MESSAGE, _kb([ACTION_RECURRINGS, ACTION_HELP]))
-        state = pending.get("state") or {}
-        if isinstance(state, str):
-            try:
-                state = __import__("json").loads(state)
-            except Exception:
-                state = {}
+            return self._make_message(HELP_MESSAGE, KB_RECURRING)
+        state = self._pending_state(pending)
         step = state.get("step") or "ask_billing_day"
         recurrence = state.get("recurrence") or "monthly"
         try:
@@ -1582,47 +2075,52 @@ class BotPipeline(PipelineBase):
         result = handle_setup_step(step, text or "", recurrence)
         if result.response:
             follow = build_setup_question(step, recurrence)
-            keyboard = _kb([ACTION_RECURRINGS, ACTION_LIST], [ACTION_SUMMARY, ACTION_HELP])
+            keyboard = KB_RECURRING_NAV
             if step in {"ask_reminder_hour"}:
-                keyboard = _kb([ACTION_CONFIRM_NO], [ACTION_RECURRINGS, ACTION_HELP])
+                keyboard = KB_RECURRING_CANCEL
             return self._make_message(f"{result.response}\n\n{follow}", keyboard)
 
         updates = result.updates or {}
-        if updates:
-            self._get_repo().update_recurring_expense(recurring_id, updates)
-
-        if result.done:
-            recurring = self._get_repo().get_recurring_expense(recurring_id)
+        if not result.done:
+            if updates:
+                self._update_recurring_expense(recurring_id, updates)
+        else:
+            # The last step's answers and the activation land in one write; next_due is computed
+            # from the stored row overlaid with this step's updates.
+            recurring = self._get_recurring_expense(recurring_id)
             if recurring:
+                merged = {**recurring, **updates}
                 today = get_today(self.settings)
                 next_due = compute_next_due(
-                    str(recurring.get("recurrence") or "monthly"),
+                    str(merged.get("recurrence") or "monthly"),
                     today,
-                    recurring.get("billing_day"),
-                    recurring.get("billing_weekday"),
-                    recurring.get("billing_month"),
-                    self._parse_iso_date(str(recurring.get("anchor_date") or "")),
+                    merged.get("billing_day"),
+                    merged.get("billing_weekday"),
+                    merged.get("billing_month"),
+                    self._anchor_date_of(merged),
                 )
-                self._get_repo().update_recurring_expense(
+                recurring = self._update_recurring_expense(
                     recurring_id,
-                    {"status": "active", "next_due": next_due},
-                )
-            self._get_repo().delete_pending_action(int(pending["id"]))
+                    {**updates, "status": "active", "next_due": next_due},
+                ) or merged
+            repo.delete_pending_action(int(pending["id"]))
             if recurring:
-                return self._make_message(build_setup_summary(recurring, self.settings), _kb([ACTION_RECURRINGS, ACTION_LIST], [ACTION_SUMMARY, ACTION_HELP]))
-            return self._make_message("✅ Recurrente activado.", _kb([ACTION_RECURRINGS, ACTION_LIST], [ACTION_SUMMARY, ACTION_HELP]))
+                return self._make_message(build_setup_summary(recurring, self.settings), KB_RECURRING_NAV)
+            return self._make_message("✅ Recurrente activado.", KB_RECURRING_NAV)
 
         next_step = result.next_step or step
         state["step"] = next_step
-        self._upsert_pending_action(str(user.get("userId")), PENDING_RECURRING_ACTION, state)
-        keyboard = _kb([ACTION_RECURRINGS, ACTION_LIST], [ACTION_SUMMARY, ACTION_HELP])
+        self._upsert_pending_action(user_id, PENDING_RECURRING_ACTION, state)
+        keyboard = KB_RECURRING_NAV
         if next_step in {"ask_reminder_hour"}:
-            keyboard = _kb([ACTION_CONFIRM_NO], [ACTION_RECURRINGS, ACTION_HELP])
+            keyboard = KB_RECURRING_CANCEL
         return self._make_message(build_setup_question(next_step, recurrence), keyboard)
 
     def _handle_recurring_edit(self, user: Dict[str, Any], text: str, pending: Optional[Dict[str, Any]] = None) -> BotMessage:
+        repo = self._get_repo()
+        user_id = str(user.get("userId"))
         if pending is None:
-            pending = self._get_repo().get_pending_action(str(user.get("userId")), "recurring_edit_reminders")
+            pending = repo.get_pending_action(user_id, "recurring_edit_reminders")
 
         content = (text or "").strip()
         parts = content.split()
@@ -1630,56 +2128,51 @@ class BotPipeline(PipelineBase):
         offsets_text = ""
 
         if pending:
-            state = pending.get("state") or {}
-            if isinstance(state, str):
-                try:
-                    state = __import__("json").loads(state)
-                except Exception:
-                    state = {}
+            state = self._pending_state(pending)
             recurring_id = state.get("recurring_id")
             offsets_text = content
         else:
             if len(parts) < 2:
                 return self._make_message(
                     "ℹ️ Dime el código y cuándo avisarte.\nEjemplo: <code>recordatorios código 12 tres días antes y el mismo día</code>.",
-                    _kb([ACTION_RECURRINGS, ACTION_HELP]),
+                    KB_RECURRING,
                 )
             recurring_id = self._extract_explicit_id(content)
             if recurring_id is not None:
-                offsets_text = re.sub(r"^\s*recordatorios?\s+(?:codigo|c[oó]digo|id)\s*#?\s*\d+\s*", "", content, flags=re.IGNORECASE).strip()
+                offsets_text = _REMINDERS_COMMAND_PREFIX_RE.sub("", content).strip()
             else:
                 try:
                     recurring_id = int(parts[1])
                 except ValueError:
-                    return self._make_message(RECURRING_INVALID_ID_MESSAGE, _kb([ACTION_RECURRINGS, ACTION_HELP]))
+                    return self._make_message(RECURRING_INVALID_ID_MESSAGE, KB_RECURRING)
                 offsets_text = " ".join(parts[2:]).strip()
 
         offsets = parse_remind_offsets(offsets_text)
         if not offsets:
             if not pending:
                 self._upsert_pending_action(
-                    str(user.get("userId")),
+                    user_id,
                     "recurring_edit_reminders",
                     {"recurring_id": recurring_id},
                 )
             return self._make_message(
                 "ℹ️ No te entendí cuándo avisar.\nPuedes escribir: <code>3 días antes y el mismo día</code>.",
-                _kb([ACTION_RECURRINGS, ACTION_HELP]),
+                KB_RECURRING,
             )
 
-        recurring = self._get_repo().get_recurring_expense(int(recurring_id))
-        if not recurring or str(recurring.get("user_id")) != str(user.get("userId")):
-            return self._make_message(RECURRING_NOT_FOUND_MESSAGE, _kb([ACTION_RECURRINGS, ACTION_HELP]))
-        self._get_repo().update_recurring_expense(int(recurring_id), {"remind_offsets": offsets})
+        recurring = self._get_recurring_expense(int(recurring_id), user_id)
+        if not recurring:
+            return self._make_message(RECURRING_NOT_FOUND_MESSAGE, KB_RECURRING)
+        self._update_recurring_expense(int(recurring_id), {"remind_offsets": offsets})
         if pending:
-            self._get_repo().delete_pending_action(int(pending["id"]))
-        return self._make_message("✅ Recordatorios actualizados.", _kb([ACTION_RECURRINGS, ACTION_LIST], [ACTION_SUMMARY, ACTION_HELP]))
+            repo.delete_pending_action(int(pending["id"]))
+        return self._make_message("✅ Recordatorios actualizados.", KB_RECURRING_NAV)
 
     def _handle_recurring_toggle(self, user: Dict[str, Any], text: str) -> BotMessage:
         content = (text or "").strip().lower()
         parts = content.split()
         if len(parts) < 2:
-            return self._make_message("ℹ️ Uso: <code>pausar código 12</code> o <code>activar código 12</code>", _kb([ACTION_RECURRINGS, ACTION_HELP]))
+            return self._make_message("ℹ️ Uso: <code>pausar código 12</code> o <code>activar código 12</code>", KB_RECURRING)
         action = parts[0]
         if action in {"pausa", "pause"}:
             action = "pausar"
@@ -1690,14 +2183,14 @@ class BotPipeline(PipelineBase):
             try:
                 recurring_id = int(parts[1])
             except ValueError:
-                return self._make_message(RECURRING_INVALID_ID_MESSAGE, _kb([ACTION_RECURRINGS, ACTION_HELP]))
-        recurring = self._get_repo().get_recurring_expense(recurring_id)
-        if not recurring or str(recurring.get("user_id")) != str(user.get("userId")):
-            return self._make_message(RECURRING_NOT_FOUND_MESSAGE, _kb([ACTION_RECURRINGS, ACTION_HELP]))
+                return self._make_message(RECURRING_INVALID_ID_MESSAGE, KB_RECURRING)
+        recurring = self._get_recurring_expense(recurring_id, str(user.get("userId")))
+        if not recurring:
+            return self._make_message(RECURRING_NOT_FOUND_MESSAGE, KB_RECURRING)
 
         if action == "pausar":
-            self._get_repo().update_recurring_expense(recurring_id, {"status": "paused"})
-            return self._make_message("⏸ Recurrente pausado.", _kb([ACTION_RECURRINGS, ACTION_LIST], [ACTION_SUMMARY, ACTION_HELP]))
+            self._update_recurring_expense(recurring_id, {"status": "paused"})
+            return self._make_message("⏸ Recurrente pausado.", KB_RECURRING_NAV)
 
         if action == "activar":
             today = get_today(self.settings)
@@ -1707,50 +2200,50 @@ class BotPipeline(PipelineBase):
                 recurring.get("billing_day"),
                 recurring.get("billing_weekday"),
                 recurring.get("billing_month"),
-                self._parse_iso_date(str(recurring.get("anchor_date") or "")),
+                self._anchor_date_of(recurring),
             )
-            self._get_repo().update_recurring_expense(recurring_id, {"status": "active", "next_due": next_due})
-            return self._make_message("▶️ Recurrente activado.", _kb([ACTION_RECURRINGS, ACTION_LIST], [ACTION_SUMMARY, ACTION_HELP]))
+            self._update_recurring_expense(recurring_id, {"status": "active", "next_due": next_due})
+            return self._make_message("▶️ Recurrente activado.", KB_RECURRING_NAV)
 
-        return self._make_message(RECURRING_INVALID_ACTION_MESSAGE, _kb([ACTION_RECURRINGS, ACTION_HELP]))
+        return self._make_message(RECURRING_INVALID_ACTION_MESSAGE, KB_RECURRING)
 
     def _handle_recurring_update_amount(self, user: Dict[str, Any], text: str) -> BotMessage:
-        parts = (text or "").strip().split()
-        if len(parts) < 3:
-            return self._make_message("ℹ️ Uso: <code>monto código 12 45000</code>", _kb([ACTION_RECURRINGS, ACTION_HELP]))
         content = (text or "").strip()
+        parts = content.split()
+        if len(parts) < 3:
+            return self._make_message("ℹ️ Uso: <code>monto código 12 45000</code>", KB_RECURRING)
         recurring_id = self._extract_explicit_id(content)
         amount_text = ""
         if recurring_id is not None:
-            amount_text = re.sub(r"^\s*(?:monto|amount)\s+(?:codigo|c[oó]digo|id)\s*#?\s*\d+\s*", "", content, flags=re.IGNORECASE).strip()
+            amount_text = _AMOUNT_COMMAND_PREFIX_RE.sub("", content).strip()
         else:
             try:
                 recurring_id = int(parts[1])
             except ValueError:
-                return self._make_message(RECURRING_INVALID_ID_MESSAGE, _kb([ACTION_RECURRINGS, ACTION_HELP]))
+                return self._make_message(RECURRING_INVALID_ID_MESSAGE, KB_RECURRING)
             amount_text = " ".join(parts[2:])
         amount = parse_amount(amount_text)
         if amount is None or amount < 0:
-            return self._make_message("⚠️ <b>Monto inválido</b>", _kb([ACTION_RECURRINGS, ACTION_HELP]))
-        recurring = self._get_repo().get_recurring_expense(recurring_id)
-        if not recurring or str(recurring.get("user_id")) != str(user.get("userId")):
-            return self._make_message(RECURRING_NOT_FOUND_MESSAGE, _kb([ACTION_RECURRINGS, ACTION_HELP]))
-        self._get_repo().update_recurring_expense(recurring_id, {"amount": amount})
-        return self._make_message("✅ Monto actualizado.", _kb([ACTION_RECURRINGS, ACTION_LIST], [ACTION_SUMMARY, ACTION_HELP]))
+            return self._make_message("⚠️ <b>Monto inválido</b>", KB_RECURRING)
+        recurring = self._get_recurring_expense(recurring_id, str(user.get("userId")))
+        if not recurring:
+            return self._make_message(RECURRING_NOT_FOUND_MESSAGE, KB_RECURRING)
+        self._update_recurring_expense(recurring_id, {"amount": amount})
+        return self._make_message("✅ Monto actualizado.", KB_RECURRING_NAV)
 
     def _handle_recurring_update_payment(self, user: Dict[str, Any], text: str) -> BotMessage:
         content = (text or "").strip()
         if not content:
             return self._make_message(
                 "ℹ️ Uso: <code>enlace código 12 https://...</code> o <code>referencia código 12 12345</code>",
-                _kb([ACTION_RECURRINGS, ACTION_HELP]),
+                KB_RECURRING,
             )
 
         recurring_id, err = self._resolve_recurring_target(user, content)
         if err:
             return err
 
-        link_match = re.search(r"(https?://[^\s]+|www\.[^\s]+)", content, flags=re.IGNORECASE)
+        link_match = _URL_RE.search(content)
         payment_link = ""
         if link_match:
             payment_link = link_match.group(1).rstrip(".,;:)>]}\"'")
@@ -1759,7 +2252,7 @@ class BotPipeline(PipelineBase):
             payment_link = payment_link[:500]
 
         payment_reference = ""
-        ref_match = re.search(r"\b(?:referencia|ref(?:erencia)?|convenio|cuenta)\s*[:#-]?\s*([A-Za-z0-9\-_.]{3,64})\b", content, flags=re.IGNORECASE)
+        ref_match = _PAYMENT_REFERENCE_RE.search(content)
         if ref_match:
             payment_reference = ref_match.group(1)[:500]
 
@@ -1767,7 +2260,7 @@ class BotPipeline(PipelineBase):
             return self._make_message(
                 "⚠️ No encontré enlace ni referencia para actualizar.\n"
                 "Ejemplo: <code>enlace código 12 https://pagos.com</code>",
-                _kb([ACTION_RECURRINGS, ACTION_HELP]),
+                KB_RECURRING,
             )
 
         updates: Dict[str, Any] = {}
@@ -1775,7 +2268,7 @@ class BotPipeline(PipelineBase):
             updates["payment_link"] = payment_link
         if payment_reference:
             updates["payment_reference"] = payment_reference
-        self._get_repo().update_recurring_expense(int(recurring_id), updates)
+        self._update_recurring_expense(int(recurring_id), updates)
 
         if payment_link and payment_reference:
             msg = "✅ Enlace y referencia actualizados."
@@ -1783,25 +2276,26 @@ class BotPipeline(PipelineBase):
             msg = "✅ Enlace actualizado."
         else:
             msg = "✅ Referencia actualizada."
-        return self._make_message(msg, _kb([ACTION_RECURRINGS, ACTION_LIST], [ACTION_SUMMARY, ACTION_HELP]))
+        return self._make_message(msg, KB_RECURRING_NAV)
 
     def _handle_recurring_cancel(self, user: Dict[str, Any], text: str) -> BotMessage:
-        parts = (text or "").strip().split()
-        if len(parts) < 2:
-            return self._make_message("ℹ️ Uso: <code>cancelar código 12</code>", _kb([ACTION_RECURRINGS, ACTION_HELP]))
+        user_id = str(user.get("userId"))
         content = (text or "").strip()
+        parts = content.split()
+        if len(parts) < 2:
+            return self._make_message("ℹ️ Uso: <code>cancelar código 12</code>", KB_RECURRING)
         recurring_id = self._extract_explicit_id(content)
         if recurring_id is None:
             try:
                 recurring_id = int(parts[1])
             except ValueError:
-                return self._make_message(RECURRING_INVALID_ID_MESSAGE, _kb([ACTION_RECURRINGS, ACTION_HELP]))
-        recurring = self._get_repo().get_recurring_expense(recurring_id)
-        if not recurring or str(recurring.get("user_id")) != str(user.get("userId")):
-            return self._make_message(RECURRING_NOT_FOUND_MESSAGE, _kb([ACTION_RECURRINGS, ACTION_HELP]))
+                return self._make_message(RECURRING_INVALID_ID_MESSAGE, KB_RECURRING)
+        recurring = self._get_recurring_expense(recurring_id, user_id)
+        if not recurring:
+            return self._make_message(RECURRING_NOT_FOUND_MESSAGE, KB_RECURRING)
         service_name = str(recurring.get("service_name") or recurring.get("normalized_merchant") or recurring.get("description") or f"Código {recurring_id}")
         self._upsert_pending_action(
-            str(user.get("userId")),
+            user_id,
             PENDING_RECURRING_CANCEL_CONFIRM,
             {"recurring_id": recurring_id},
         )
@@ -1809,57 +2303,54 @@ class BotPipeline(PipelineBase):
             "⚠️ Vas a cancelar este recurrente:\n"
             f"<b>{service_name}</b> (Código <code>{recurring_id}</code>)\n\n"
             "Responde <code>sí</code> para confirmar o <code>no</code> para mantenerlo activo.",
-            _kb([ACTION_CONFIRM_YES, ACTION_CONFIRM_NO], [ACTION_RECURRINGS, ACTION_HELP]),
+            KB_RECURRING_CONFIRM,
         )
 
     def _handle_recurring_cancel_confirm(self, user: Dict[str, Any], text: str, pending: Dict[str, Any]) -> BotMessage:
-        answer = (text or "").strip()
-        if is_negative(answer):
-            self._get_repo().delete_pending_action(int(pending["id"]))
-            return self._make_message("✅ Entendido. No cancelé ese recurrente.", _kb_main())
-        if not is_affirmative(answer):
+        repo = self._get_repo()
+        answer = classify_yes_no(text)
+        if answer is False:
+            repo.delete_pending_action(int(pending["id"]))
+            return self._make_message("✅ Entendido. No cancelé ese recurrente.", KB_MAIN)
+        if answer is None:
             return self._make_message(
                 "Responde <code>sí</code> para cancelar o <code>no</code> para conservarlo.",
-                _kb([ACTION_CONFIRM_YES, ACTION_CONFIRM_NO], [ACTION_RECURRINGS, ACTION_HELP]),
+                KB_RECURRING_CONFIRM,
             )
 
-        state = pending.get("state") or {}
-        if isinstance(state, str):
-            try:
-                state = __import__("json").loads(state)
-            except Exception:
-                state = {}
+        state = self._pending_state(pending)
         try:
             recurring_id = int(state.get("recurring_id") or 0)
         except (TypeError, ValueError):
             recurring_id = 0
-        recurring = self._get_repo().get_recurring_expense(recurring_id)
-        if not recurring or str(recurring.get("user_id")) != str(user.get("userId")):
-            self._get_repo().delete_pending_action(int(pending["id"]))
-            return self._make_message(RECURRING_NOT_FOUND_MESSAGE, _kb([ACTION_RECURRINGS, ACTION_HELP]))
+        recurring = self._get_recurring_expense(recurring_id, str(user.get("userId")))
+        if not recurring:
+            repo.delete_pending_action(int(pending["id"]))
+            return self._make_message(RECURRING_NOT_FOUND_MESSAGE, KB_RECURRING)
 
-        now = __import__("datetime").datetime.now(__import__("datetime").timezone.utc).isoformat()
-        self._get_repo().update_recurring_expense(recurring_id, {"status": "canceled", "canceled_at": now})
-        self._get_repo().delete_pending_action(int(pending["id"]))
-        return self._make_message("🛑 Recurrente cancelado.", _kb([ACTION_RECURRINGS, ACTION_LIST], [ACTION_SUMMARY, ACTION_HELP]))
+        now = datetime.now(timezone.utc).isoformat()
+        self._update_recurring_expense(recurring_id, {"status": "canceled", "canceled_at": now})
+        repo.delete_pending_action(int(pending["id"]))
+        return self._make_message("🛑 Recurrente cancelado.", KB_RECURRING_NAV)
 
     def _handle_daily_nudge_set_hour(self, user: Dict[str, Any], text: str, pending: Dict[str, Any]) -> BotMessage:
+        repo = self._get_repo()
         content = (text or "").strip()
         if is_negative(content):
-            self._get_repo().delete_pending_action(int(pending["id"]))
-            return self._make_message("✅ Entendido. Mantengo la hora actual.", _kb_main())
+            repo.delete_pending_action(int(pending["id"]))
+            return self._make_message("✅ Entendido. Mantengo la hora actual.", KB_MAIN)
         hour = parse_reminder_hour(content)
         if hour is None:
             return self._make_message(
                 "🕖 Envíame la nueva hora del recordatorio.\nEjemplos: <code>19</code>, <code>7 pm</code>, <code>19:30</code>.",
-                _kb([ACTION_CONFIRM_NO], [ACTION_HELP]),
+                KB_CANCEL,
             )
         user_id = str(user.get("userId"))
         self._save_daily_nudge_prefs(user_id, enabled=True, hour=int(hour))
-        self._get_repo().delete_pending_action(int(pending["id"]))
+        repo.delete_pending_action(int(pending["id"]))
         return self._make_message(
             f"✅ Listo. Te preguntaré por gastos cada día a las <b>{self._hour_label(int(hour))}</b>.",
-            _kb_main(),
+            KB_MAIN,
         )
 
     def _resolve_daily_nudge_action(self, data: str) -> tuple[Optional[str], Optional[int]]:
@@ -1875,37 +2366,28 @@ class BotPipeline(PipelineBase):
         if not norm:
             return None, None
 
-        if re.search(r"\b(ejemplo|ejemplos|ideas)\b", norm):
+        if _NUDGE_EXAMPLES_RE.search(norm):
             return "examples", None
 
-        if re.search(r"^(silenciar|silencia|mutear|apagar|desactivar)\b", norm):
-            if norm in {"silenciar", "silencia", "mutear", "apagar", "desactivar"} or re.search(
-                r"\b(recordatorio|recordatorios|notificacion|notificaciones|aviso|avisos)\b",
-                norm,
-            ):
+        if _NUDGE_SILENCE_RE.search(norm):
+            if norm in {"silenciar", "silencia", "mutear", "apagar", "desactivar"} or _NUDGE_TOPIC_RE.search(norm):
                 return "silence", None
 
-        if re.search(r"^(activar|activa|encender|habilitar|habilita|reanudar|reactivar)\b", norm):
-            if norm in {"activar", "activa", "encender", "habilitar", "habilita", "reanudar", "reactivar"} or re.search(
-                r"\b(recordatorio|recordatorios|notificacion|notificaciones|aviso|avisos)\b",
-                norm,
-            ):
+        if _NUDGE_ENABLE_RE.search(norm):
+            if norm in {"activar", "activa", "encender", "habilitar", "habilita", "reanudar", "reactivar"} or _NUDGE_TOPIC_RE.search(norm):
                 return "enable", None
 
         inline_hour = parse_reminder_hour(raw)
         if inline_hour is not None:
             if (
-                re.search(r"\b(cambiar|cambia|ajustar|ajusta|configurar|configura|poner|pon|hora)\b", norm)
-                and re.search(r"\b(recordatorio|recordatorios|notificacion|notificaciones|aviso|avisos|hora)\b", norm)
+                _NUDGE_CHANGE_OR_HOUR_RE.search(norm)
+                and _NUDGE_TOPIC_OR_HOUR_RE.search(norm)
             ):
                 return "set_hour", int(inline_hour)
-            if re.search(r"^(hora)\s+\d{1,2}(:\d{2})?\s*(am|pm)?\b", norm):
+            if _NUDGE_HOUR_RE.search(norm):
                 return "set_hour", int(inline_hour)
 
-        if re.search(r"\b(cambiar|cambia|ajustar|ajusta|configurar|configura)\b", norm) and re.search(
-            r"\b(hora|recordatorio|recordatorios|notificacion|notificaciones|aviso|avisos)\b",
-            norm,
-        ):
+        if _NUDGE_CHANGE_RE.search(norm) and _NUDGE_TOPIC_OR_HOUR_RE.search(norm):
             return "set_hour", None
 
         return None, None
@@ -1922,7 +2404,7 @@ class BotPipeline(PipelineBase):
             self._save_daily_nudge_prefs(user_id, enabled=False, hour=current_hour)
             return self._make_message(
                 "🔕 Recordatorio diario silenciado.\nSi quieres reactivarlo, pulsa el botón.",
-                _kb([BotAction("dailynudge:enable", "🔔 Activar recordatorio")], [ACTION_HELP]),
+                KB_DAILY_NUDGE_ENABLE,
             )
 
         if action == "examples":
@@ -1934,14 +2416,14 @@ class BotPipeline(PipelineBase):
                 "• <code>me pagaron 2m</code>\n\n"
                 "También puedes enviar varios en un mensaje:\n"
                 "<code>almuerzo 18k y taxi 12k</code>",
-                _kb([ACTION_LIST, ACTION_SUMMARY], [ACTION_HELP, BotAction("dailynudge:set_hour", "🕖 Cambiar hora")]),
+                KB_DAILY_NUDGE_ENABLED,
             )
 
         if action == "enable":
             self._save_daily_nudge_prefs(user_id, enabled=True, hour=current_hour)
             return self._make_message(
                 f"🔔 Recordatorio diario activado a las <b>{self._hour_label(current_hour)}</b>.",
-                _kb([BotAction("dailynudge:set_hour", "🕖 Cambiar hora")], [ACTION_HELP]),
+                KB_DAILY_NUDGE_SET_HOUR,
             )
 
         if action == "set_hour":
@@ -1949,103 +2431,86 @@ class BotPipeline(PipelineBase):
                 self._save_daily_nudge_prefs(user_id, enabled=True, hour=int(inline_hour))
                 return self._make_message(
                     f"✅ Listo. Cambié la hora del recordatorio a las <b>{self._hour_label(int(inline_hour))}</b>.",
-                    _kb([BotAction("dailynudge:set_hour", "🕖 Cambiar hora")], [ACTION_HELP]),
+                    KB_DAILY_NUDGE_SET_HOUR,
                 )
             self._upsert_pending_action(user_id, PENDING_DAILY_NUDGE_SET_HOUR, {"from": "daily_nudge"}, ttl_minutes=60)
             return self._make_message(
                 "🕖 ¿A qué hora quieres el recordatorio diario?\nResponde con una hora. Ej: <code>19</code> o <code>7 pm</code>.",
-                _kb([ACTION_CONFIRM_NO], [ACTION_HELP]),
+                KB_CANCEL,
             )
 
         return self._make_message(RECURRING_INVALID_ACTION_MESSAGE)
 
     def _handle_recurring_action(self, user: Dict[str, Any], data: str) -> BotMessage:
         parts = (data or "").split(":")
-        if len(parts) != 3:
+        method_name = self._RECURRING_BILL_ACTIONS.get(parts[1]) if len(parts) == 3 else None
+        if method_name is None:
             return self._make_message(RECURRING_INVALID_ACTION_MESSAGE)
-        action = parts[1]
         try:
             bill_instance_id = int(parts[2])
         except ValueError:
             return self._make_message(RECURRING_INVALID_ACTION_MESSAGE)
-        bill = self._get_repo().get_bill_instance(bill_instance_id)
-        if not bill or str(bill.get("user_id")) != str(user.get("userId")):
+        bill = self._get_repo().get_bill_instance_for_user(bill_instance_id, str(user.get("userId")))
+        if not bill:
             return self._make_message("🔒 <b>Acción no autorizada</b>")
+        return getattr(self, method_name)(user, bill_instance_id, bill)
 
-        now = __import__("datetime").datetime.now(__import__("datetime").timezone.utc).isoformat()
-        if action == "paid":
-            if str(bill.get("status")) == "paid":
-                return self._make_message("ℹ️ Este pago ya estaba confirmado.")
-            tx_id = generate_tx_id()
-            due_date = bill.get("due_date")
-            date_value = due_date.isoformat() if hasattr(due_date, "isoformat") else str(due_date)
-            amount = bill.get("amount")
-            if amount is None:
-                amount = bill.get("recurring_amount") or 0
-            tx = {
-                "txId": tx_id,
-                "userId": user.get("userId"),
-                "type": "expense",
-                "transactionKind": "regular",
-                "amount": amount or 0,
-                "currency": bill.get("currency") or "COP",
-                "category": bill.get("category") or "misc",
-                "description": bill.get("description") or bill.get("service_name") or "Pago recurrente",
-                "date": date_value,
-                "normalizedMerchant": bill.get("normalized_merchant") or bill.get("service_name") or "",
-                "paymentMethod": "cash",
-                "counterparty": "",
-                "loanRole": "",
-                "loanId": "",
-                "isRecurring": True,
-                "recurrence": bill.get("recurrence") or "",
-                "recurrenceId": bill.get("recurrence_id") or "",
-                "parseConfidence": 0.9,
-                "parserVersion": "recurring-v1",
-                "source": "recurring",
-                "sourceMessageId": "",
-                "rawText": "recurring:auto",
-                "createdAt": now,
-                "updatedAt": now,
-                "isDeleted": False,
-                "deletedAt": "",
-                "chatId": user.get("chatId"),
-            }
-            if bool(bill.get("auto_add_transaction", True)):
-                self._get_repo().append_transaction(tx)
-            self._get_repo().update_bill_instance(
-                bill_instance_id,
-                {"status": "paid", "paid_at": now, "tx_id": tx_id, "follow_up_on": None},
-            )
-            recurring = self._get_repo().get_recurring_expense(int(bill.get("recurring_id")))
-            if recurring:
-                due = self._parse_iso_date(date_value) or get_today(self.settings)
-                next_due = compute_next_due(
-                    str(recurring.get("recurrence") or "monthly"),
-                    due + __import__("datetime").timedelta(days=1),
-                    recurring.get("billing_day"),
-                    recurring.get("billing_weekday"),
-                    recurring.get("billing_month"),
-                    self._parse_iso_date(str(recurring.get("anchor_date") or "")),
-                )
-                self._get_repo().update_recurring_expense(
-                    int(recurring.get("id")),
-                    {"next_due": next_due, "last_confirmed_at": now},
-                )
-            return self._make_message("✅ Pago confirmado y registrado.")
+    def _confirm_recurring_bill_paid(self, user: Dict[str, Any], bill_instance_id: int, bill: Dict[str, Any]) -> BotMessage:
+        if str(bill.get("status")) == "paid":
+            return self._make_message("ℹ️ Este pago ya estaba confirmado.")
+        now = datetime.now(timezone.utc).isoformat()
+        tx_id = generate_tx_id()
+        due_date = bill.get("due_date")
+        date_value = due_date.isoformat() if hasattr(due_date, "isoformat") else str(due_date)
+        amount = bill.get("amount")
+        if amount is None:
+            amount = bill.get("recurring_amount") or 0
+        tx = {
+            **_RECURRING_PAID_TX_TEMPLATE,
+            "txId": tx_id,
+            "userId": user.get("userId"),
+            "amount": amount or 0,
+            "currency": bill.get("currency") or "COP",
+            "category": bill.get("category") or "misc",
+            "description": bill.get("description") or bill.get("service_name") or "Pago recurrente",
+            "date": date_value,
+            "normalizedMerchant": bill.get("normalized_merchant") or bill.get("service_name") or "",
+            "recurrence": bill.get("recurrence") or "",
+            "recurrenceId": bill.get("recurrence_id") or "",
+            "createdAt": now,
+            "updatedAt": now,
+            "chatId": user.get("chatId"),
+        }
+        due = self._parse_iso_date(date_value) or get_today(self.settings)
 
-        if action == "later":
-            follow_up = get_today(self.settings) + __import__("datetime").timedelta(days=1)
-            self._get_repo().update_bill_instance(
-                bill_instance_id,
-                {"status": "pending", "follow_up_on": follow_up.isoformat()},
+        def next_due_for(recurring: Dict[str, Any]) -> date:
+            return compute_next_due(
+                str(recurring.get("recurrence") or "monthly"),
+                due + timedelta(days=1),
+                recurring.get("billing_day"),
+                recurring.get("billing_weekday"),
+                recurring.get("billing_month"),
+                self._anchor_date_of(recurring),
             )
-            return self._make_message("⏳ Perfecto, te recordaré de nuevo mañana.")
 
-        if action == "no":
-            return self._make_message("❌ Entendido. Lo dejaré pendiente.")
+        # Transaction insert, bill update and next_due bump commit together.
+        add_tx = bool(bill.get("auto_add_transaction", True))
+        self._get_repo().confirm_bill_paid(bill_instance_id, tx_id, now, next_due_for, tx if add_tx else None)
+        if add_tx:
+            self._forget_transactions()
+        self._forget_recurrings()
+        return self._make_message("✅ Pago confirmado y registrado.")
+
+    def _postpone_recurring_bill(self, user: Dict[str, Any], bill_instance_id: int, bill: Dict[str, Any]) -> BotMessage:
+        follow_up = get_today(self.settings) + timedelta(days=1)
+        self._get_repo().update_bill_instance(
+            bill_instance_id,
+            {"status": "pending", "follow_up_on": follow_up.isoformat()},
+        )
+        return self._make_message("⏳ Perfecto, te recordaré de nuevo mañana.")
 
-        return self._make_message(RECURRING_INVALID_ACTION_MESSAGE)
+    def _decline_recurring_bill(self, user: Dict[str, Any], bill_instance_id: int, bill: Dict[str, Any]) -> BotMessage:
+        return self._make_message("❌ Entendido. Lo dejaré pendiente.")
 
     async def _transcribe_audio(self, audio_bytes: bytes) -> Optional[str]:
         try:
@@ -2056,23 +2521,7 @@ class BotPipeline(PipelineBase):
         return response.get("text") if isinstance(response, dict) else None
 
     @staticmethod
-    def _pick_latest(transactions: list[Dict[str, Any]]) -> Dict[str, Any]:
-        valid = [tx for tx in transactions if tx.get("txId") and not tx.get("isDeleted")]
-        if not valid:
-            return {"ok": False, "reason": "no_tx"}
-
-        def created_ts(item: Dict[str, Any]) -> float:
-            created_at = str(item.get("createdAt") or "")
-            try:
-                return __import__("datetime").datetime.fromisoformat(created_at.replace("Z", "+00:00")).timestamp()
-            except ValueError:
-                try:
-                    return float(str(item.get("txId") or "0").replace("TX-", ""))
-                except ValueError:
-                    return float("-inf")
-
-        valid.sort(key=created_ts, reverse=True)
-        tx = valid[0]
+    def _undo_result(tx: Dict[str, Any]) -> Dict[str, Any]:
         return {
             "ok": True,
             "txId": str(tx.get("txId")),
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import json
 import re
 from dataclasses import dataclass
 from datetime import date, datetime, timedelta
-from typing import Any, Dict, Optional
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional
 from zoneinfo import ZoneInfo
 
 from app.bot.parser import escape_html, format_currency
@@ -12,33 +14,98 @@ from app.core.config import Settings
 
 PENDING_RECURRING_ACTION = "recurring_setup"
 PENDING_RECURRING_OFFER_ACTION = "recurring_offer"
+NEXT_DUE_CACHE_MAX_ENTRIES = 4096
+RECURRENCE_LABELS = {
+    "weekly": "semanal",
+    "biweekly": "quincenal",
+    "monthly": "mensual",
+    "quarterly": "trimestral",
+    "yearly": "anual",
+}
 
 
 def _normalize_text(text: str) -> str:
     return (text or "").strip().lower()
 
 
+_AFFIRMATIVE_ANSWERS = frozenset({"si", "sí", "s", "yes", "ok", "dale", "claro", "de una", "confirm:yes", "confirm_yes"})
+_NEGATIVE_ANSWERS = frozenset({"no", "ninguno", "ninguna", "nah", "na", "n", "confirm:no", "confirm_no"})
+_AFFIRMATIVE_RE = re.compile(r"\b(si|sí|yes|ok)\b")
+_NEGATIVE_RE = re.compile(r"\bno\b")
+_LINK_RE = re.compile(r"(https?://[^\s]+|www\.[^\s]+)", re.IGNORECASE)
+_SMALL_INT_RE = re.compile(r"\b(\d{1,2})\b")
+_OFFSET_NUMBER_RE = re.compile(r"-?\d{1,2}")
+_CONTEXT_AMPM_HOUR_RE = re.compile(r"\ba\s+las?\s+(\d{1,2})(?::\d{1,2})?\s*(a\.?\s*m\.?|p\.?\s*m\.?)\b", re.IGNORECASE)
+_AMPM_HOUR_RE = re.compile(r"\b(\d{1,2})(?::\d{1,2})?\s*(a\.?\s*m\.?|p\.?\s*m\.?)\b", re.IGNORECASE)
+_CONTEXT_24H_HOUR_RE = re.compile(r"\ba\s+las?\s+(\d{1,2})(?::\d{1,2})?\b", re.IGNORECASE)
+_HHMM_RE = re.compile(r"\b(\d{1,2}):\d{1,2}\b")
+_THOUSANDS_SUFFIX_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*(k|luka?s?|luca?s?)\b")
+_MILLIONS_SUFFIX_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*(m|palo?s?)\b")
+_NUMBER_RE = re.compile(r"\b(\d+(?:[.,]\d+)?)\b")
+_CURRENCY_HINT_RE = re.compile(r"(\$|cop|peso|pesos|\bk\b|\bm\b|luka|luca|palo|palos)")
+_AMOUNT_CONTEXT_RE = re.compile(r"\b(monto|valor|cuesta|cobro|cobran|pago de|pagar|pago|total|por)\b")
+_CURRENCY_OR_MIL_RE = re.compile(r"(\$|cop|peso|pesos|mil)")
+_BIWEEKLY_RE = re.compile(r"\b(quincenal|cada\s+15\s+d[ií]as)\b")
+_WEEKLY_RE = re.compile(r"\b(semanal|cada\s+semana|todos\s+los\s+(lunes|martes|miercoles|miércoles|jueves|viernes|sabado|sábado|domingo))\b")
+_QUARTERLY_RE = re.compile(r"\b(trimestral|cada\s+3\s+meses)\b")
+_YEARLY_RE = re.compile(r"\b(anual|cada\s+a[nñ]o)\b")
+_PAGAR_SERVICE_RE = re.compile(r"pagar\s+(.+)", re.IGNORECASE)
+_SETUP_SERVICE_RE = re.compile(r"(?:nuevo|crear|crea|agregar|agrega)?\s*(?:recordatorio|recurrente|suscripci[oó]n)\s+(.+)", re.IGNORECASE)
+_SERVICE_SCHEDULE_RE = re.compile(r"\b(todos?\s+los\s+\d{1,2}(?:\s+de\s+cada\s+mes)?|cada\s+mes|de\s+cada\s+mes|mensual|semanal|quincenal|trimestral|anual)\b", re.IGNORECASE)
+_SERVICE_TIME_RE = re.compile(r"\b(a\s+las?\s+\d{1,2}(?::\d{2})?\s*(?:[ap]\.?m\.?)?|a\s+\d{1,2}(?::\d{2})?\s*(?:[ap]\.?m\.?)?)\b", re.IGNORECASE)
+_SERVICE_PERIOD_RE = re.compile(r"\b(cada\s+semana|cada\s+15\s+d[ií]as|cada\s+3\s+meses|cada\s+a[nñ]o)\b", re.IGNORECASE)
+_SERVICE_EL_DAY_RE = re.compile(r"\bel\s+\d{1,2}\b", re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r"\s+")
+_TRAILING_CONNECTOR_RE = re.compile(r"\b(de|del|a|al)\b\s*$", re.IGNORECASE)
+_SAME_DAY_RE = re.compile(
+    r"\bmismo\s+d[ií]a\b"
+    r"|\bel\s+mismo\s+d[ií]a\b"
+    r"|\bd[ií]a\s+del\s+cobro\b"
+    r"|\bd[ií]a\s+de[l]?\s+vencimiento\b"
+    r"|\bel\s+d[ií]a\s+que\s+vence\b"
+    r"|\bel\s+d[ií]a\b"
+    r"|\b0\s*d[ií]as?\b"
+)
+
+
+def _is_affirmative_normalized(t: str) -> bool:
+    return t in _AFFIRMATIVE_ANSWERS or bool(_AFFIRMATIVE_RE.search(t))
+
+
+def _is_negative_normalized(t: str) -> bool:
+    return t in _NEGATIVE_ANSWERS or bool(_NEGATIVE_RE.search(t))
+
+
 def is_affirmative(text: str) -> bool:
-    t = _normalize_text(text)
-    if t in {"si", "sí", "s", "yes", "ok", "dale", "claro", "de una", "confirm:yes", "confirm_yes"}:
-        return True
-    return bool(re.search(r"\b(si|sí|yes|ok)\b", t))
+    return _is_affirmative_normalized(_normalize_text(text))
 
 
 def is_negative(text: str) -> bool:
+    return _is_negative_normalized(_normalize_text(text))
+
+
+def classify_yes_no(text: str) -> Optional[bool]:
+    # False = no, True = yes, None = unclear. Negative wins when both match ("si, mejor no").
+    # Button payloads and one-word replies hit the exact sets, so check those before any regex.
     t = _normalize_text(text)
-    if t in {"no", "ninguno", "ninguna", "nah", "na", "n", "confirm:no", "confirm_no"}:
+    if t in _NEGATIVE_ANSWERS:
+        return False
+    if t in _AFFIRMATIVE_ANSWERS:
         return True
-    return bool(re.search(r"\bno\b", t))
+    if _NEGATIVE_RE.search(t):
+        return False
+    if _AFFIRMATIVE_RE.search(t):
+        return True
+    return None
 
 
 def _extract_link(text: str) -> Optional[str]:
-    match = re.search(r"(https?://[^\s]+|www\.[^\s]+)", text or "", flags=re.IGNORECASE)
+    match = _LINK_RE.search(text or "")
     return match.group(1) if match else None
 
 
 def _parse_int(text: str) -> Optional[int]:
-    match = re.search(r"\b(\d{1,2})\b", text or "")
+    match = _SMALL_INT_RE.search(text or "")
     if not match:
         return None
     try:
@@ -56,41 +123,28 @@ def parse_billing_day(text: str) -> Optional[int]:
     return None
 
 
-def parse_remind_offsets(text: str) -> list[int]:
+def parse_remind_offsets(text: str, lowered: Optional[str] = None) -> list[int]:
     values = []
     source = text or ""
-    for raw in re.findall(r"-?\d{1,2}", source):
+    for raw in _OFFSET_NUMBER_RE.findall(source):
         try:
             value = abs(int(raw))
         except ValueError:
             continue
         if value not in values:
             values.append(value)
-    norm = _normalize_text(source)
-    same_day_patterns = [
-        r"\bmismo\s+d[ií]a\b",
-        r"\bel\s+mismo\s+d[ií]a\b",
-        r"\bd[ií]a\s+del\s+cobro\b",
-        r"\bd[ií]a\s+de[l]?\s+vencimiento\b",
-        r"\bel\s+d[ií]a\s+que\s+vence\b",
-        r"\bel\s+d[ií]a\b",
-        r"\b0\s*d[ií]as?\b",
-    ]
-    if any(re.search(pattern, norm) for pattern in same_day_patterns) and 0 not in values:
+    norm = lowered if lowered is not None else _normalize_text(source)
+    if _SAME_DAY_RE.search(norm) and 0 not in values:
         values.append(0)
     values = [v for v in values if v >= 0]
     values.sort(reverse=True)
     return values
 
 
-def parse_reminder_hour(text: str) -> Optional[int]:
-    t = _normalize_text(text)
+def parse_reminder_hour(text: str, lowered: Optional[str] = None) -> Optional[int]:
+    t = lowered if lowered is not None else _normalize_text(text)
     # Prefer explicit "a las" context to avoid taking day-of-month numbers as hour.
-    match_context_ampm = re.search(
-        r"\ba\s+las?\s+(\d{1,2})(?::\d{1,2})?\s*(a\.?\s*m\.?|p\.?\s*m\.?)\b",
-        t,
-        flags=re.IGNORECASE,
-    )
+    match_context_ampm = _CONTEXT_AMPM_HOUR_RE.search(t)
     if match_context_ampm:
         try:
             hour = int(match_context_ampm.group(1))
@@ -102,7 +156,7 @@ def parse_reminder_hour(text: str) -> Optional[int]:
                 return 0 if hour == 12 else hour
             return 12 if hour == 12 else hour + 12
 
-    for match_ampm in re.finditer(r"\b(\d{1,2})(?::\d{1,2})?\s*(a\.?\s*m\.?|p\.?\s*m\.?)\b", t, flags=re.IGNORECASE):
+    for match_ampm in _AMPM_HOUR_RE.finditer(t):
         try:
             hour = int(match_ampm.group(1))
         except ValueError:
@@ -114,7 +168,7 @@ def parse_reminder_hour(text: str) -> Optional[int]:
             return 0 if hour == 12 else hour
         return 12 if hour == 12 else hour + 12
 
-    match_context_24h = re.search(r"\ba\s+las?\s+(\d{1,2})(?::\d{1,2})?\b", t, flags=re.IGNORECASE)
+    match_context_24h = _CONTEXT_24H_HOUR_RE.search(t)
     if match_context_24h:
         try:
             hour = int(match_context_24h.group(1))
@@ -123,7 +177,7 @@ def parse_reminder_hour(text: str) -> Optional[int]:
         if 0 <= hour <= 23:
             return hour
 
-    match_hhmm = re.search(r"\b(\d{1,2}):\d{1,2}\b", t)
+    match_hhmm = _HHMM_RE.search(t)
     if match_hhmm:
         try:
             hour = int(match_hhmm.group(1))
@@ -136,17 +190,9 @@ def parse_reminder_hour(text: str) -> Optional[int]:
 
 def parse_amount(text: str) -> Optional[float]:
     raw = (text or "").lower().replace("$", "").replace(".", "")
-    raw = re.sub(
-        r"(\d+(?:[.,]\d+)?)\s*(k|luka?s?|luca?s?)\b",
-        lambda m: str(int(float(m.group(1).replace(",", ".")) * 1000)),
-        raw,
-    )
-    raw = re.sub(
-        r"(\d+(?:[.,]\d+)?)\s*(m|palo?s?)\b",
-        lambda m: str(int(float(m.group(1).replace(",", ".")) * 1000000)),
-        raw,
-    )
-    match = re.search(r"\b(\d+(?:[.,]\d+)?)\b", raw)
+    raw = _THOUSANDS_SUFFIX_RE.sub(lambda m: str(int(float(m.group(1).replace(",", ".")) * 1000)), raw)
+    raw = _MILLIONS_SUFFIX_RE.sub(lambda m: str(int(float(m.group(1).replace(",", ".")) * 1000000)), raw)
+    match = _NUMBER_RE.search(raw)
     if not match:
         return None
     try:
@@ -160,62 +206,48 @@ def parse_amount_in_context(text: str) -> Optional[float]:
     if not raw:
         return None
     norm = raw.lower()
-    if re.search(r"(\$|cop|peso|pesos|\bk\b|\bm\b|luka|luca|palo|palos)", norm):
+    if _CURRENCY_HINT_RE.search(norm):
         return parse_amount(raw)
-    if not re.search(r"\b(monto|valor|cuesta|cobro|cobran|pago de|pagar|pago|total|por)\b", norm):
+    if not _AMOUNT_CONTEXT_RE.search(norm):
         return None
     amount = parse_amount(raw)
     if amount is None:
         return None
-    if amount < 1000 and not re.search(r"(\$|cop|peso|pesos|mil)", norm):
+    if amount < 1000 and not _CURRENCY_OR_MIL_RE.search(norm):
         return None
     return amount
 
 
-def parse_recurrence(text: str) -> str:
-    t = _normalize_text(text)
-    if re.search(r"\b(quincenal|cada\s+15\s+d[ií]as)\b", t):
+def parse_recurrence(text: str, lowered: Optional[str] = None) -> str:
+    t = lowered if lowered is not None else _normalize_text(text)
+    if _BIWEEKLY_RE.search(t):
         return "biweekly"
-    if re.search(r"\b(semanal|cada\s+semana|todos\s+los\s+(lunes|martes|miercoles|miércoles|jueves|viernes|sabado|sábado|domingo))\b", t):
+    if _WEEKLY_RE.search(t):
         return "weekly"
-    if re.search(r"\b(trimestral|cada\s+3\s+meses)\b", t):
+    if _QUARTERLY_RE.search(t):
         return "quarterly"
-    if re.search(r"\b(anual|cada\s+a[nñ]o)\b", t):
+    if _YEARLY_RE.search(t):
         return "yearly"
     return "monthly"
 
 
 def parse_service_name(text: str) -> Optional[str]:
     t = (text or "").strip()
-    match = re.search(r"pagar\s+(.+)", t, flags=re.IGNORECASE)
+    match = _PAGAR_SERVICE_RE.search(t)
     if not match:
-        alt = re.search(
-            r"(?:nuevo|crear|crea|agregar|agrega)?\s*(?:recordatorio|recurrente|suscripci[oó]n)\s+(.+)",
-            t,
-            flags=re.IGNORECASE,
-        )
+        alt = _SETUP_SERVICE_RE.search(t)
         if alt:
             match = alt
         else:
             return None
     service = match.group(1)
     # Remove scheduling/time phrases so the service key remains stable for search/update.
-    service = re.sub(
-        r"\b(todos?\s+los\s+\d{1,2}(?:\s+de\s+cada\s+mes)?|cada\s+mes|de\s+cada\s+mes|mensual|semanal|quincenal|trimestral|anual)\b",
-        "",
-        service,
-        flags=re.IGNORECASE,
-    )
-    service = re.sub(
-        r"\b(a\s+las?\s+\d{1,2}(?::\d{2})?\s*(?:[ap]\.?m\.?)?|a\s+\d{1,2}(?::\d{2})?\s*(?:[ap]\.?m\.?)?)\b",
-        "",
-        service,
-        flags=re.IGNORECASE,
-    )
-    service = re.sub(r"\b(cada\s+semana|cada\s+15\s+d[ií]as|cada\s+3\s+meses|cada\s+a[nñ]o)\b", "", service, flags=re.IGNORECASE)
-    service = re.sub(r"\bel\s+\d{1,2}\b", "", service, flags=re.IGNORECASE)
-    service = re.sub(r"\s+", " ", service).strip(" .,")
-    service = re.sub(r"\b(de|del|a|al)\b\s*$", "", service, flags=re.IGNORECASE).strip(" .,")
+    service = _SERVICE_SCHEDULE_RE.sub("", service)
+    service = _SERVICE_TIME_RE.sub("", service)
+    service = _SERVICE_PERIOD_RE.sub("", service)
+    service = _SERVICE_EL_DAY_RE.sub("", service)
+    service = _WHITESPACE_RE.sub(" ", service).strip(" .,")
+    service = _TRAILING_CONNECTOR_RE.sub("", service).strip(" .,")
     return service[:128] if service else None
 
 
@@ -237,12 +269,13 @@ _WEEKDAY_MAP = {
     "domingo": 6,
     "dom": 6,
 }
+_WEEKDAY_PATTERNS = tuple((re.compile(rf"\b{re.escape(key)}\b"), value) for key, value in _WEEKDAY_MAP.items())
 
 
-def parse_weekday(text: str) -> Optional[int]:
-    t = _normalize_text(text)
-    for key, value in _WEEKDAY_MAP.items():
-        if re.search(rf"\b{re.escape(key)}\b", t):
+def parse_weekday(text: str, lowered: Optional[str] = None) -> Optional[int]:
+    t = lowered if lowered is not None else _normalize_text(text)
+    for pattern, value in _WEEKDAY_PATTERNS:
+        if pattern.search(t):
             return value
     return None
 
@@ -268,6 +301,8 @@ def _add_months(source: date, months: int) -> date:
     return date(year, month, day)
 
 
+# Pure calendar math over hashable inputs; the scheduler and the bot ask for the same schedules all day.
+@lru_cache(maxsize=NEXT_DUE_CACHE_MAX_ENTRIES)
 def compute_next_due(
     recurrence: str,
     today: date,
@@ -344,14 +379,7 @@ def build_setup_question(step: str, recurrence: str) -> str:
 
 
 def _format_recurrence_label(recurrence: str) -> str:
-    mapping = {
-        "weekly": "semanal",
-        "biweekly": "quincenal",
-        "monthly": "mensual",
-        "quarterly": "trimestral",
-        "yearly": "anual",
-    }
-    return mapping.get(recurrence, recurrence)
+    return RECURRENCE_LABELS.get(recurrence, recurrence)
 
 
 def build_setup_summary(recurring: Dict[str, Any], settings: Settings) -> str:
@@ -377,7 +405,7 @@ def build_setup_summary(recurring: Dict[str, Any], settings: Settings) -> str:
     offsets = recurring.get("remind_offsets") or [3, 1, 0]
     if isinstance(offsets, str):
         try:
-            offsets = __import__("json").loads(offsets)
+            offsets = json.loads(offsets)
         except Exception:
             offsets = [3, 1, 0]
     offsets = [int(v) for v in offsets if isinstance(v, (int, float, str)) and str(v).isdigit()]
@@ -410,33 +438,47 @@ class SetupResult:
     next_step: Optional[str] = None
 
 
-def handle_setup_step(step: str, text: str, recurrence: str) -> SetupResult:
-    if step == "ask_billing_day":
-        if recurrence in {"weekly", "biweekly"}:
-            weekday = parse_weekday(text)
-            if weekday is None:
-                return SetupResult("⚠️ No entendí el día. Prueba con: <code>lunes</code>, <code>martes</code> o <code>miércoles</code>.")
-            return SetupResult("", updates={"billing_weekday": weekday}, done=True)
-        day = parse_billing_day(text)
-        if day is None:
-            return SetupResult("⚠️ No entendí el día. Escribe un número entre <code>1</code> y <code>31</code>.")
-        return SetupResult("", updates={"billing_day": day}, done=True)
+def _setup_billing_day(text: str, recurrence: str) -> SetupResult:
+    if recurrence in {"weekly", "biweekly"}:
+        weekday = parse_weekday(text)
+        if weekday is None:
+            return SetupResult("⚠️ No entendí el día. Prueba con: <code>lunes</code>, <code>martes</code> o <code>miércoles</code>.")
+        return SetupResult("", updates={"billing_weekday": weekday}, done=True)
+    day = parse_billing_day(text)
+    if day is None:
+        return SetupResult("⚠️ No entendí el día. Escribe un número entre <code>1</code> y <code>31</code>.")
+    return SetupResult("", updates={"billing_day": day}, done=True)
 
-    if step == "ask_reminders":
-        offsets = parse_remind_offsets(text)
-        if not offsets:
-            return SetupResult("⚠️ No entendí los recordatorios. Usa este formato: <code>3,1,0</code>.")
-        return SetupResult("", updates={"remind_offsets": offsets}, next_step="ask_reminder_hour")
 
-    if step == "ask_reminder_hour":
-        hour = parse_reminder_hour(text)
-        if hour is None:
-            return SetupResult("⚠️ No entendí la hora. Usa formato 24 horas, por ejemplo: <code>08:00</code> o <code>20</code>.")
-        return SetupResult("", updates={"reminder_hour": hour}, done=True)
+def _setup_reminders(text: str, recurrence: str) -> SetupResult:
+    offsets = parse_remind_offsets(text)
+    if not offsets:
+        return SetupResult("⚠️ No entendí los recordatorios. Usa este formato: <code>3,1,0</code>.")
+    return SetupResult("", updates={"remind_offsets": offsets}, next_step="ask_reminder_hour")
+
 
+def _setup_reminder_hour(text: str, recurrence: str) -> SetupResult:
+    hour = parse_reminder_hour(text)
+    if hour is None:
+        return SetupResult("⚠️ No entendí la hora. Usa formato 24 horas, por ejemplo: <code>08:00</code> o <code>20</code>.")
+    return SetupResult("", updates={"reminder_hour": hour}, done=True)
+
+
+def _setup_unknown(text: str, recurrence: str) -> SetupResult:
     return SetupResult("⚠️ No entendí el mensaje. Intenta de nuevo.")
 
 
+_SETUP_STEP_HANDLERS: Dict[str, Callable[[str, str], SetupResult]] = {
+    "ask_billing_day": _setup_billing_day,
+    "ask_reminders": _setup_reminders,
+    "ask_reminder_hour": _setup_reminder_hour,
+}
+
+
+def handle_setup_step(step: str, text: str, recurrence: str) -> SetupResult:
+    return _SETUP_STEP_HANDLERS.get(step, _setup_unknown)(text, recurrence)
+
+
 def get_today(settings: Settings) -> date:
     tz_name = settings.timezone or "America/Bogota"
     return datetime.now(ZoneInfo(tz_name)).date()
@@ -4,18 +4,18 @@ from dataclasses import dataclass, field
 from typing import List, Optional
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class BotAction:
     id: str
     label: str
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class BotKeyboard:
     rows: List[List[BotAction]] = field(default_factory=list)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class BotMessage:
     text: str
     keyboard: Optional[BotKeyboard] = None
@@ -25,7 +25,7 @@ class BotMessage:
     document_mime: Optional[str] = None
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class BotInput:
     channel: str
     chat_id: Optional[str | int]
@@ -22,6 +22,10 @@ class Settings:
     rate_limit_per_user_per_min: int = 60
     rate_limit_per_ip_per_min: int = 120
     rate_limit_onboarding_per_min: int = 10
+    max_parallel_turns: int = 8
+    user_cache_ttl_seconds: int = 60
+    ai_cache_ttl_seconds: int = 300
+    ai_marshal_max_chars: int = 1000
     timezone: str = "America/Bogota"
 
 
@@ -64,4 +68,8 @@ def load_settings() -> Settings:
         rate_limit_per_user_per_min=_get_int_env("RATE_LIMIT_USER_PER_MIN", 60),
         rate_limit_per_ip_per_min=_get_int_env("RATE_LIMIT_IP_PER_MIN", 120),
         rate_limit_onboarding_per_min=_get_int_env("RATE_LIMIT_ONBOARDING_PER_MIN", 10),
+        max_parallel_turns=_get_int_env("MAX_PARALLEL_TURNS", 8),
+        user_cache_ttl_seconds=_get_int_env("USER_CACHE_TTL_SECONDS", 60),
+        ai_cache_ttl_seconds=_get_int_env("AI_CACHE_TTL_SECONDS", 300),
+        ai_marshal_max_chars=_get_int_env("AI_MARSHAL_MAX_CHARS", 1000),
     )
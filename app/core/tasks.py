@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Coroutine, Dict, Optional, Set
+
+from app.core.logging import logger
+
+BACKGROUND_DRAIN_TIMEOUT_SECONDS = 20.0
+
+_background_tasks: Set[asyncio.Task] = set()
+_ordered_tails: Dict[str, asyncio.Task] = {}
+
+
+def spawn(coro: Coroutine[Any, Any, Any], name: str = "background") -> asyncio.Task:
+    # Keep a strong reference so the event loop does not drop the task mid-flight.
+    task = asyncio.get_running_loop().create_task(coro)
+    _background_tasks.add(task)
+
+    def _done(finished: asyncio.Task) -> None:
+        _background_tasks.discard(finished)
+        if finished.cancelled():
+            return
+        exc = finished.exception()
+        if exc is not None:
+            logger.error("Background task %s failed: %s", name, exc, exc_info=exc)
+
+    task.add_done_callback(_done)
+    return task
+
+
+def spawn_ordered(key: Optional[str], coro: Coroutine[Any, Any, Any], name: str = "background") -> asyncio.Task:
+    # Tasks sharing a key run one after another in spawn order; different keys still run in parallel.
+    # The tail is swapped synchronously, so arrival order is fixed before the first await.
+    if key is None:
+        return spawn(coro, name=name)
+    previous = _ordered_tails.get(key)
+
+    async def _run() -> Any:
+        started = False
+        try:
+            if previous is not None:
+                await asyncio.wait({previous})
+            started = True
+            return await coro
+        finally:
+            if not started:
+                coro.close()
+
+    task = spawn(_run(), name=name)
+    _ordered_tails[key] = task
+
+    def _release(finished: asyncio.Task) -> None:
+        if _ordered_tails.get(key) is finished:
+            _ordered_tails.pop(key, None)
+
+    task.add_done_callback(_release)
+    return task
+
+
+async def drain_background_tasks(timeout: float = BACKGROUND_DRAIN_TIMEOUT_SECONDS) -> None:
+    # Webhooks are acknowledged before processing, so Telegram/Evolution will not resend what is still
+    # in flight at shutdown: give it time to finish, then cancel the stragglers.
+    pending = set(_background_tasks)
+    if not pending:
+        return
+    _, still_running = await asyncio.wait(pending, timeout=timeout)
+    if still_running:
+        logger.warning("Cancelling %s background tasks still running at shutdown", len(still_running))
+        for task in still_running:
+            task.cancel()
+        await asyncio.gather(*still_running, return_exceptions=True)
@@ -2,7 +2,8 @@
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from app.core.config import load_settings
-from app.bot.handlers import error_handler, get_handlers, PipelineFactory
+from app.core.tasks import drain_background_tasks
+from app.bot.handlers import close_pipeline, error_handler, get_handlers, PipelineFactory
 from app.routers.telegram import build_telegram_router
 from app.services.telegram import build_telegram_app
 from app.routers.evolution import build_evolution_router
@@ -47,4 +48,7 @@ async def on_shutdown() -> None:
     scheduler = getattr(app.state, "recurring_scheduler", None)
     if scheduler:
         scheduler.shutdown(wait=False)
+    await drain_background_tasks()
     await telegram_app.shutdown()
+    await close_pipeline()
+    await pipeline.aclose()
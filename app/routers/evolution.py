@@ -8,6 +8,7 @@ from app.bot.pipeline import BotPipeline
 from app.channels.evolution_adapter import parse_evolution_webhook, send_evolution_message
 from app.core.config import Settings
 from app.core.logging import logger, set_client_ip, set_trace_id
+from app.core.tasks import spawn_ordered
 from app.services.evolution import EvolutionClient
 
 
@@ -39,14 +40,19 @@ def build_evolution_router(pipeline: BotPipeline, evolution_client: EvolutionCli
         if not bot_input:
             return {"ok": True}
 
-        try:
-            responses = await pipeline.handle_message(bot_input)
-            for response in responses:
-                await send_evolution_message(evolution_client, str(bot_input.chat_id), response)
-        except Exception:
-            logger.exception("EV pipeline/send failed")
-            return {"ok": True}
-
+        async def _process() -> None:
+            try:
+                responses = await pipeline.handle_message(
+                    bot_input,
+                    send_early=lambda early: send_evolution_message(evolution_client, str(bot_input.chat_id), early),
+                )
+                for response in responses:
+                    await send_evolution_message(evolution_client, str(bot_input.chat_id), response)
+            except Exception:
+                logger.exception("EV pipeline/send failed")
+
+        chat_key = f"evolution:{bot_input.chat_id}" if bot_input.chat_id is not None else None
+        spawn_ordered(chat_key, _process(), name="evolution_message")
         return {"ok": True}
 
     return router
@@ -7,6 +7,7 @@ from telegram.ext import Application
 from app.core.config import Settings
 from app.core.logging import logger, set_client_ip, set_trace_id
 from app.core.rate_limit import rate_limiter
+from app.core.tasks import spawn_ordered
 
 
 def build_telegram_router(telegram_app: Application, settings: Settings) -> APIRouter:
@@ -48,7 +49,11 @@ def build_telegram_router(telegram_app: Application, settings: Settings) -> APIR
                 raise HTTPException(status_code=429, detail="Too Many Requests")
         data = await request.json()
         update = Update.de_json(data, telegram_app.bot)
-        await telegram_app.process_update(update)
+        # Acknowledge right away. Updates of one chat are chained in arrival order, so voice downloads,
+        # rate-limit replies and the reply sends of a turn never overlap the next turn of that chat.
+        chat = update.effective_chat
+        chat_key = f"telegram:{chat.id}" if chat is not None else None
+        spawn_ordered(chat_key, telegram_app.process_update(update), name="telegram_update")
         return {"ok": True}
 
     return router
@@ -2,10 +2,20 @@
 
 import json
 import logging
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 import httpx
 
+try:
+    import orjson  # type: ignore
+except Exception:  # pragma: no cover - optional dependency at runtime
+    orjson = None
+
+try:
+    import h2  # type: ignore  # noqa: F401
+except Exception:  # pragma: no cover - optional dependency at runtime
+    h2 = None
+
 from app.core.config import Settings
 from app.core.circuit_breaker import CircuitBreaker, guarded_call
 from app.core.retry import async_retry
@@ -13,6 +23,18 @@ from app.core.logging import logger
 
 GROQ_CHAT_URL = "https://api.groq.com/openai/v1/chat/completions"
 GROQ_TRANSCRIBE_URL = "https://api.groq.com/openai/v1/audio/transcriptions"
+GROQ_TIMEOUT_SECONDS = 60
+GROQ_MAX_CONNECTIONS = 100
+GROQ_MAX_KEEPALIVE_CONNECTIONS = 20
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers keep catching the stdlib type.
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+
+def _json_dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode("utf-8")
 
 
 class GroqClient:
@@ -21,11 +43,31 @@ class GroqClient:
         self._breaker = CircuitBreaker(on_state_change=self._on_breaker_change)
         self._retries = retries
         self._backoff = backoff_seconds
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # One pooled client per GroqClient keeps TLS sessions alive across calls; with h2
+        # installed, concurrent multi-segment requests multiplex over a single connection.
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=h2 is not None,
+                timeout=GROQ_TIMEOUT_SECONDS,
+                limits=httpx.Limits(
+                    max_connections=GROQ_MAX_CONNECTIONS,
+                    max_keepalive_connections=GROQ_MAX_KEEPALIVE_CONNECTIONS,
+                ),
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
     def _on_breaker_change(self, old: str, new: str) -> None:
         logger.warning("Groq circuit breaker transition %s -> %s", old, new)
 
-    async def chat_completion(self, system_prompt: str, user_message: str) -> str:
+    async def chat_completion(self, system_prompt: str, user_message: str, max_tokens: Optional[int] = None) -> str:
         if not self.settings.groq_api_key:
             raise RuntimeError("GROQ_API_KEY is required for AI parsing")
 
@@ -43,12 +85,11 @@ class GroqClient:
                     {"role": "user", "content": user_message},
                 ],
                 "temperature": 0,
-                "max_tokens": self.settings.max_output_tokens,
+                "max_tokens": max_tokens or self.settings.max_output_tokens,
             }
-            async with httpx.AsyncClient(timeout=60) as client:
-                response = await client.post(GROQ_CHAT_URL, headers=headers, json=payload)
-                response.raise_for_status()
-                data = response.json()
+            response = await self._get_client().post(GROQ_CHAT_URL, headers=headers, content=_json_dumps(payload))
+            response.raise_for_status()
+            data = _json_loads(response.content)
             self._breaker.record_success()
             return data["choices"][0]["message"]["content"]
 
@@ -83,10 +124,9 @@ class GroqClient:
                 "model": "whisper-large-v3",
                 "response_format": "json",
             }
-            async with httpx.AsyncClient(timeout=60) as client:
-                response = await client.post(GROQ_TRANSCRIBE_URL, headers=headers, files=files, data=data)
-                response.raise_for_status()
-                return response.json()
+            response = await self._get_client().post(GROQ_TRANSCRIBE_URL, headers=headers, files=files, data=data)
+            response.raise_for_status()
+            return response.json()
 
         async def wrapped():
             try:
@@ -110,10 +150,10 @@ class GroqClient:
 def extract_json(content: str) -> Dict[str, Any]:
     clean = content.replace("```json", "").replace("```", "").strip()
     try:
-        return json.loads(clean)
+        return _json_loads(clean)
     except json.JSONDecodeError:
         start = clean.find("{")
         end = clean.rfind("}")
         if start != -1 and end != -1 and end > start:
-            return json.loads(clean[start : end + 1])
+            return _json_loads(clean[start : end + 1])
         raise
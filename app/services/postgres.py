@@ -2,15 +2,58 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Iterable, Optional
 import json
 
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session
 
+try:
+    import orjson  # type: ignore
+except Exception:  # pragma: no cover - optional dependency at runtime
+    orjson = None
+
 from app.core.logging import logger
 
+_RECURRING_INSERT_SQL = """
+    insert into recurring_expenses (
+        user_id, service_name, recurrence_id, normalized_merchant, description, category, amount, currency,
+        recurrence, billing_day, billing_weekday, billing_month, anchor_date, timezone, payment_link,
+        payment_reference, remind_offsets, reminder_hour, next_due, status, auto_add_transaction, canceled_at,
+        source_tx_id, created_at, updated_at
+    ) values (
+        :user_id, :service_name, :recurrence_id, :normalized_merchant, :description, :category, :amount, :currency,
+        :recurrence, :billing_day, :billing_weekday, :billing_month, :anchor_date, :timezone, :payment_link,
+        :payment_reference, cast(:remind_offsets as jsonb), :reminder_hour, :next_due, :status, :auto_add_transaction, :canceled_at,
+        :source_tx_id, :created_at, :updated_at
+    )
+"""
+
+_PENDING_UPSERT_SQL = """
+    insert into bot_pending_actions (user_id, action_type, state, expires_at, created_at, updated_at)
+    values (:user_id, :action_type, cast(:state as jsonb), :expires_at, :now, :now)
+    on conflict (user_id, action_type)
+    do update set state = excluded.state, expires_at = excluded.expires_at, updated_at = excluded.updated_at
+    returning *
+"""
+
+_BILL_INSTANCE_SELECT_SQL = """
+    select b.*, r.user_id, r.service_name, r.amount as recurring_amount, r.currency, r.category, r.description,
+           r.normalized_merchant, r.recurrence, r.recurrence_id, r.auto_add_transaction
+    from bill_instances b
+    join recurring_expenses r on r.id = b.recurring_id
+"""
+
+# Pending-action state is decoded and re-encoded on nearly every message; orjson does both several times faster.
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+
+def _json_dumps(obj: Any) -> str:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(obj, separators=(",", ":"))
+
 
 @dataclass
 class PostgresRepo:
@@ -43,6 +86,30 @@ class PostgresRepo:
                 "chatId": row["external_chat_id"],
             }
 
+    def touch_and_get_active_user(self, channel: str, external_user_id: str) -> Optional[Dict[str, Any]]:
+        ts = self._now_iso()
+        sql = text(
+            """
+            update users u
+            set last_seen_at = :ts, updated_at = :ts
+            from user_identities i
+            where u.id = i.user_id and i.channel = :channel and i.external_user_id = :external_user_id
+            and u.status = 'active'
+            returning u.id as user_id, u.status, u.last_seen_at, i.external_chat_id
+            """
+        )
+        with self._session() as session:
+            row = session.execute(sql, {"ts": ts, "channel": channel, "external_user_id": external_user_id}).mappings().first()
+            session.commit()
+            if not row:
+                return None
+            return {
+                "userId": row["user_id"],
+                "status": row["status"],
+                "lastSeenAt": row["last_seen_at"],
+                "chatId": row["external_chat_id"],
+            }
+
     def update_user_last_seen(self, channel: str, external_user_id: str, timestamp: Optional[str] = None) -> None:
         ts = timestamp or self._now_iso()
         with self._session() as session:
@@ -168,73 +235,83 @@ class PostgresRepo:
     def append_transactions(self, txs: list[Dict[str, Any]]) -> None:
         if not txs:
             return
-        now = self._now_iso()
         with self._session() as session:
-            for tx in txs:
-                params = {
-                    "tx_id": str(tx.get("txId") or ""),
-                    "user_id": str(tx.get("userId") or ""),
-                    "type": tx.get("type"),
-                    "transaction_kind": tx.get("transactionKind"),
-                    "amount": tx.get("amount"),
-                    "currency": tx.get("currency"),
-                    "category": tx.get("category"),
-                    "description": tx.get("description"),
-                    "date": tx.get("date") or None,
-                    "normalized_merchant": tx.get("normalizedMerchant"),
-                    "payment_method": tx.get("paymentMethod"),
-                    "counterparty": tx.get("counterparty"),
-                    "loan_role": tx.get("loanRole"),
-                    "loan_id": tx.get("loanId"),
-                    "is_recurring": tx.get("isRecurring"),
-                    "recurrence": tx.get("recurrence"),
-                    "recurrence_id": tx.get("recurrenceId"),
-                    "parse_confidence": tx.get("parseConfidence"),
-                    "parser_version": tx.get("parserVersion"),
-                    "source": tx.get("source"),
-                    "source_message_id": str(tx.get("sourceMessageId") or ""),
-                    "raw_text": tx.get("rawText"),
-                    "created_at": tx.get("createdAt") or now,
-                    "updated_at": tx.get("updatedAt") or now,
-                    "is_deleted": tx.get("isDeleted"),
-                    "deleted_at": tx.get("deletedAt") or None,
-                    "chat_id": str(tx.get("chatId")) if tx.get("chatId") is not None else None,
-                }
-                session.execute(
-                    text(
-                        """
-                        insert into transactions (
-                            tx_id, user_id, type, transaction_kind, amount, currency, category, description, date,
-                            normalized_merchant, payment_method, counterparty, loan_role, loan_id, is_recurring,
-                            recurrence, recurrence_id, parse_confidence, parser_version, source, source_message_id,
-                            raw_text, created_at, updated_at, is_deleted, deleted_at, chat_id
-                        ) values (
-                            :tx_id, :user_id, :type, :transaction_kind, :amount, :currency, :category, :description, :date,
-                            :normalized_merchant, :payment_method, :counterparty, :loan_role, :loan_id, :is_recurring,
-                            :recurrence, :recurrence_id, :parse_confidence, :parser_version, :source, :source_message_id,
-                            :raw_text, :created_at, :updated_at, :is_deleted, :deleted_at, :chat_id
-                        )
-                        """
-                    ),
-                    params,
-                )
-                session.execute(
-                    text(
-                        """
-                        insert into audit_events (entity_type, entity_id, action, payload, created_at, actor_user_id, source)
-                        values ('transaction', :tx_id, 'create', cast(:payload as jsonb), :now, :user_id, :source)
-                        """
-                    ),
-                    {
-                        "tx_id": params["tx_id"],
-                        "payload": "{}",
-                        "now": now,
-                        "user_id": params["user_id"],
-                        "source": params["source"],
-                    },
-                )
+            self._insert_transactions(session, txs, self._now_iso())
             session.commit()
 
+    def commit_multi_tx(self, txs: list[Dict[str, Any]], pending_id: int) -> None:
+        # Confirmed transactions land together with the removal of the confirmation that produced them.
+        with self._session() as session:
+            self._insert_transactions(session, txs, self._now_iso())
+            session.execute(text("delete from bot_pending_actions where id = :id"), {"id": pending_id})
+            session.commit()
+
+    @staticmethod
+    def _insert_transactions(session: Session, txs: list[Dict[str, Any]], now: str) -> None:
+        for tx in txs:
+            params = {
+                "tx_id": str(tx.get("txId") or ""),
+                "user_id": str(tx.get("userId") or ""),
+                "type": tx.get("type"),
+                "transaction_kind": tx.get("transactionKind"),
+                "amount": tx.get("amount"),
+                "currency": tx.get("currency"),
+                "category": tx.get("category"),
+                "description": tx.get("description"),
+                "date": tx.get("date") or None,
+                "normalized_merchant": tx.get("normalizedMerchant"),
+                "payment_method": tx.get("paymentMethod"),
+                "counterparty": tx.get("counterparty"),
+                "loan_role": tx.get("loanRole"),
+                "loan_id": tx.get("loanId"),
+                "is_recurring": tx.get("isRecurring"),
+                "recurrence": tx.get("recurrence"),
+                "recurrence_id": tx.get("recurrenceId"),
+                "parse_confidence": tx.get("parseConfidence"),
+                "parser_version": tx.get("parserVersion"),
+                "source": tx.get("source"),
+                "source_message_id": str(tx.get("sourceMessageId") or ""),
+                "raw_text": tx.get("rawText"),
+                "created_at": tx.get("createdAt") or now,
+                "updated_at": tx.get("updatedAt") or now,
+                "is_deleted": tx.get("isDeleted"),
+                "deleted_at": tx.get("deletedAt") or None,
+                "chat_id": str(tx.get("chatId")) if tx.get("chatId") is not None else None,
+            }
+            session.execute(
+                text(
+                    """
+                    insert into transactions (
+                        tx_id, user_id, type, transaction_kind, amount, currency, category, description, date,
+                        normalized_merchant, payment_method, counterparty, loan_role, loan_id, is_recurring,
+                        recurrence, recurrence_id, parse_confidence, parser_version, source, source_message_id,
+                        raw_text, created_at, updated_at, is_deleted, deleted_at, chat_id
+                    ) values (
+                        :tx_id, :user_id, :type, :transaction_kind, :amount, :currency, :category, :description, :date,
+                        :normalized_merchant, :payment_method, :counterparty, :loan_role, :loan_id, :is_recurring,
+                        :recurrence, :recurrence_id, :parse_confidence, :parser_version, :source, :source_message_id,
+                        :raw_text, :created_at, :updated_at, :is_deleted, :deleted_at, :chat_id
+                    )
+                    """
+                ),
+                params,
+            )
+            session.execute(
+                text(
+                    """
+                    insert into audit_events (entity_type, entity_id, action, payload, created_at, actor_user_id, source)
+                    values ('transaction', :tx_id, 'create', cast(:payload as jsonb), :now, :user_id, :source)
+                    """
+                ),
+                {
+                    "tx_id": params["tx_id"],
+                    "payload": "{}",
+                    "now": now,
+                    "user_id": params["user_id"],
+                    "source": params["source"],
+                },
+            )
+
     def list_transactions(self, user_id: str, include_deleted: bool = False) -> list[Dict[str, Any]]:
         sql = text(
             """
@@ -246,40 +323,66 @@ class PostgresRepo:
         )
         with self._session() as session:
             rows = session.execute(sql, {"user_id": user_id, "include_deleted": include_deleted}).mappings().all()
-            result = []
-            for row in rows:
-                result.append(
-                    {
-                        "txId": row["tx_id"],
-                        "userId": row["user_id"],
-                        "type": row["type"],
-                        "transactionKind": row["transaction_kind"],
-                        "amount": float(row["amount"]) if row["amount"] is not None else 0,
-                        "currency": row["currency"],
-                        "category": row["category"],
-                        "description": row["description"],
-                        "date": row["date"].isoformat() if row["date"] is not None else "",
-                        "normalizedMerchant": row["normalized_merchant"],
-                        "paymentMethod": row["payment_method"],
-                        "counterparty": row["counterparty"],
-                        "loanRole": row["loan_role"],
-                        "loanId": row["loan_id"],
-                        "isRecurring": bool(row["is_recurring"]),
-                        "recurrence": row["recurrence"],
-                        "recurrenceId": row["recurrence_id"],
-                        "parseConfidence": float(row["parse_confidence"]) if row["parse_confidence"] is not None else 0.0,
-                        "parserVersion": row["parser_version"],
-                        "source": row["source"],
-                        "sourceMessageId": row["source_message_id"],
-                        "rawText": row["raw_text"],
-                        "createdAt": row["created_at"].isoformat() if row["created_at"] else "",
-                        "updatedAt": row["updated_at"].isoformat() if row["updated_at"] else "",
-                        "isDeleted": bool(row["is_deleted"]),
-                        "deletedAt": row["deleted_at"].isoformat() if row["deleted_at"] else "",
-                        "chatId": row["chat_id"],
-                    }
-                )
-            return result
+            return [self._transaction_from_row(row) for row in rows]
+
+    def pop_latest_active_transaction(self, user_id: str) -> Optional[Dict[str, Any]]:
+        # skip locked: two concurrent undos delete the two newest rows instead of racing for one.
+        now = self._now_iso()
+        sql = text(
+            """
+            update transactions
+            set is_deleted = true, updated_at = :now, deleted_at = :now
+            where tx_id = (
+                select tx_id from transactions
+                where user_id = :user_id and is_deleted = false
+                order by created_at desc nulls last, tx_id desc
+                limit 1
+                for update skip locked
+            )
+            returning *
+            """
+        )
+        with self._session() as session:
+            row = session.execute(sql, {"now": now, "user_id": user_id}).mappings().first()
+            session.commit()
+            return self._transaction_from_row(row) if row else None
+
+    def count_active_transactions(self, user_id: str) -> int:
+        sql = text("select count(*) from transactions where user_id = :user_id and is_deleted = false")
+        with self._session() as session:
+            return int(session.execute(sql, {"user_id": user_id}).scalar() or 0)
+
+    @staticmethod
+    def _transaction_from_row(row: Any) -> Dict[str, Any]:
+        return {
+            "txId": row["tx_id"],
+            "userId": row["user_id"],
+            "type": row["type"],
+            "transactionKind": row["transaction_kind"],
+            "amount": float(row["amount"]) if row["amount"] is not None else 0,
+            "currency": row["currency"],
+            "category": row["category"],
+            "description": row["description"],
+            "date": row["date"].isoformat() if row["date"] is not None else "",
+            "normalizedMerchant": row["normalized_merchant"],
+            "paymentMethod": row["payment_method"],
+            "counterparty": row["counterparty"],
+            "loanRole": row["loan_role"],
+            "loanId": row["loan_id"],
+            "isRecurring": bool(row["is_recurring"]),
+            "recurrence": row["recurrence"],
+            "recurrenceId": row["recurrence_id"],
+            "parseConfidence": float(row["parse_confidence"]) if row["parse_confidence"] is not None else 0.0,
+            "parserVersion": row["parser_version"],
+            "source": row["source"],
+            "sourceMessageId": row["source_message_id"],
+            "rawText": row["raw_text"],
+            "createdAt": row["created_at"].isoformat() if row["created_at"] else "",
+            "updatedAt": row["updated_at"].isoformat() if row["updated_at"] else "",
+            "isDeleted": bool(row["is_deleted"]),
+            "deletedAt": row["deleted_at"].isoformat() if row["deleted_at"] else "",
+            "chatId": row["chat_id"],
+        }
 
     def mark_transaction_deleted(self, tx_id: str) -> None:
         now = self._now_iso()
@@ -364,9 +467,9 @@ class PostgresRepo:
             row = session.execute(sql, {"user_id": user_id, "recurrence_id": recurrence_id}).mappings().first()
             return dict(row) if row else None
 
-    def create_recurring_expense(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        now = self._now_iso()
-        params = {
+    @staticmethod
+    def _recurring_insert_params(data: Dict[str, Any], now: str) -> Dict[str, Any]:
+        return {
             "user_id": data.get("user_id"),
             "service_name": data.get("service_name") or data.get("normalized_merchant") or data.get("description") or "Pago recurrente",
             "recurrence_id": data.get("recurrence_id"),
@@ -393,26 +496,45 @@ class PostgresRepo:
             "created_at": data.get("created_at") or now,
             "updated_at": data.get("updated_at") or now,
         }
+
+    def create_recurring_expense(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        params = self._recurring_insert_params(data, self._now_iso())
         with self._session() as session:
-            row = session.execute(
-                text(
-                    """
-                    insert into recurring_expenses (
-                        user_id, service_name, recurrence_id, normalized_merchant, description, category, amount, currency,
-                        recurrence, billing_day, billing_weekday, billing_month, anchor_date, timezone, payment_link,
-                        payment_reference, remind_offsets, reminder_hour, next_due, status, auto_add_transaction, canceled_at,
-                        source_tx_id, created_at, updated_at
-                    ) values (
-                        :user_id, :service_name, :recurrence_id, :normalized_merchant, :description, :category, :amount, :currency,
-                        :recurrence, :billing_day, :billing_weekday, :billing_month, :anchor_date, :timezone, :payment_link,
-                        :payment_reference, cast(:remind_offsets as jsonb), :reminder_hour, :next_due, :status, :auto_add_transaction, :canceled_at,
-                        :source_tx_id, :created_at, :updated_at
-                    )
-                    returning *
-                    """
-                ),
-                params,
-            ).mappings().first()
+            row = session.execute(text(f"{_RECURRING_INSERT_SQL} returning *"), params).mappings().first()
+            session.commit()
+            return dict(row)
+
+    def upsert_recurring_expense(self, data: Dict[str, Any], updates: Dict[str, Any]) -> Dict[str, Any]:
+        # One round-trip for "create or refresh by (user_id, recurrence_id)". A None in updates keeps the
+        # stored value, falling back to the one from data when the stored column is null too.
+        now = self._now_iso()
+        params = self._recurring_insert_params(data, now)
+        assignments = ["updated_at = excluded.updated_at"]
+        for key, value in updates.items():
+            if key == "remind_offsets":
+                params["set_remind_offsets"] = json.dumps(value) if value is not None else None
+                assignments.append(
+                    "remind_offsets = coalesce(cast(:set_remind_offsets as jsonb), recurring_expenses.remind_offsets, excluded.remind_offsets)"
+                )
+            else:
+                params[f"set_{key}"] = value
+                assignments.append(f"{key} = coalesce(:set_{key}, recurring_expenses.{key}, excluded.{key})")
+        if "status" in updates and "canceled_at" not in updates:
+            # Reviving a canceled row must not keep its cancellation timestamp.
+            assignments.append(
+                "canceled_at = case when coalesce(:set_status, recurring_expenses.status, excluded.status) = 'canceled' "
+                "then recurring_expenses.canceled_at else null end"
+            )
+        sql = text(
+            f"""
+            {_RECURRING_INSERT_SQL}
+            on conflict (user_id, recurrence_id)
+            do update set {', '.join(assignments)}
+            returning *
+            """
+        )
+        with self._session() as session:
+            row = session.execute(sql, params).mappings().first()
             session.commit()
             return dict(row)
 
@@ -424,9 +546,17 @@ class PostgresRepo:
             ).mappings().first()
             return dict(row) if row else None
 
-    def update_recurring_expense(self, recurring_id: int, updates: Dict[str, Any]) -> None:
+    def get_recurring_expense_for_user(self, recurring_id: int, user_id: str) -> Optional[Dict[str, Any]]:
+        with self._session() as session:
+            row = session.execute(
+                text("select * from recurring_expenses where id = :id and user_id = :user_id"),
+                {"id": recurring_id, "user_id": user_id},
+            ).mappings().first()
+            return dict(row) if row else None
+
+    def update_recurring_expense(self, recurring_id: int, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         if not updates:
-            return
+            return None
         updates = dict(updates)
         if "remind_offsets" in updates and not isinstance(updates["remind_offsets"], str):
             updates["remind_offsets"] = json.dumps(updates["remind_offsets"])
@@ -437,11 +567,35 @@ class PostgresRepo:
                 fields.append("remind_offsets = cast(:remind_offsets as jsonb)")
             else:
                 fields.append(f"{key} = :{key}")
-        sql = text(f"update recurring_expenses set {', '.join(fields)} where id = :id")
+        sql = text(f"update recurring_expenses set {', '.join(fields)} where id = :id returning *")
         updates["id"] = recurring_id
         with self._session() as session:
-            session.execute(sql, updates)
+            row = session.execute(sql, updates).mappings().first()
+            session.commit()
+            return dict(row) if row else None
+
+    def cancel_recurring_expenses(self, user_id: str, recurring_ids: list[int], canceled_at: str) -> int:
+        if not recurring_ids:
+            return 0
+        sql = text(
+            """
+            update recurring_expenses
+            set status = 'canceled', canceled_at = :canceled_at, updated_at = :now
+            where user_id = :user_id and id in :recurring_ids
+            """
+        ).bindparams(bindparam("recurring_ids", expanding=True))
+        with self._session() as session:
+            result = session.execute(
+                sql,
+                {
+                    "canceled_at": canceled_at,
+                    "now": self._now_iso(),
+                    "user_id": user_id,
+                    "recurring_ids": list(recurring_ids),
+                },
+            )
             session.commit()
+            return int(result.rowcount or 0)
 
     def list_active_recurring_expenses(self) -> list[Dict[str, Any]]:
         sql = text("select * from recurring_expenses where status = 'active'")
@@ -449,16 +603,28 @@ class PostgresRepo:
             rows = session.execute(sql).mappings().all()
             return [dict(row) for row in rows]
 
-    def list_recurring_expenses(self, user_id: str) -> list[Dict[str, Any]]:
+    def list_recurring_expenses(
+        self,
+        user_id: str,
+        status: Optional[str] = None,
+        include_canceled: bool = True,
+    ) -> list[Dict[str, Any]]:
+        filters = ["user_id = :user_id"]
+        params: Dict[str, Any] = {"user_id": user_id}
+        if status is not None:
+            filters.append("lower(status) = :status")
+            params["status"] = status.lower()
+        if not include_canceled:
+            filters.append("lower(coalesce(status, '')) <> 'canceled'")
         sql = text(
-            """
+            f"""
             select * from recurring_expenses
-            where user_id = :user_id
+            where {" and ".join(filters)}
             order by created_at desc
             """
         )
         with self._session() as session:
-            rows = session.execute(sql, {"user_id": user_id}).mappings().all()
+            rows = session.execute(sql, params).mappings().all()
             return [dict(row) for row in rows]
 
     def upsert_bill_instance(
@@ -521,19 +687,61 @@ class PostgresRepo:
             session.commit()
 
     def get_bill_instance(self, bill_instance_id: int) -> Optional[Dict[str, Any]]:
-        sql = text(
-            """
-            select b.*, r.user_id, r.service_name, r.amount as recurring_amount, r.currency, r.category, r.description,
-                   r.normalized_merchant, r.recurrence, r.recurrence_id, r.auto_add_transaction
-            from bill_instances b
-            join recurring_expenses r on r.id = b.recurring_id
-            where b.id = :bill_instance_id
-            """
-        )
         with self._session() as session:
-            row = session.execute(sql, {"bill_instance_id": bill_instance_id}).mappings().first()
+            row = session.execute(
+                text(f"{_BILL_INSTANCE_SELECT_SQL} where b.id = :bill_instance_id"),
+                {"bill_instance_id": bill_instance_id},
+            ).mappings().first()
+            return dict(row) if row else None
+
+    def get_bill_instance_for_user(self, bill_instance_id: int, user_id: str) -> Optional[Dict[str, Any]]:
+        with self._session() as session:
+            row = session.execute(
+                text(f"{_BILL_INSTANCE_SELECT_SQL} where b.id = :bill_instance_id and r.user_id = :user_id"),
+                {"bill_instance_id": bill_instance_id, "user_id": user_id},
+            ).mappings().first()
             return dict(row) if row else None
 
+    def confirm_bill_paid(
+        self,
+        bill_instance_id: int,
+        tx_id: str,
+        paid_at: str,
+        next_due_fn: Callable[[Dict[str, Any]], Any],
+        tx: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        now = self._now_iso()
+        with self._session() as session:
+            if tx is not None:
+                self._insert_transactions(session, [tx], now)
+            recurring = session.execute(
+                text(
+                    """
+                    update bill_instances b
+                    set status = 'paid', paid_at = :paid_at, tx_id = :tx_id, follow_up_on = null, updated_at = :now
+                    from recurring_expenses r
+                    where b.id = :bill_instance_id and r.id = b.recurring_id
+                    returning r.*
+                    """
+                ),
+                {"bill_instance_id": bill_instance_id, "paid_at": paid_at, "tx_id": tx_id, "now": now},
+            ).mappings().first()
+            updated = None
+            if recurring:
+                updated = session.execute(
+                    text(
+                        """
+                        update recurring_expenses
+                        set next_due = :next_due, last_confirmed_at = :paid_at, updated_at = :now
+                        where id = :id
+                        returning *
+                        """
+                    ),
+                    {"id": recurring["id"], "next_due": next_due_fn(dict(recurring)), "paid_at": paid_at, "now": now},
+                ).mappings().first()
+            session.commit()
+            return dict(updated) if updated else None
+
     def mark_overdue_bill_instances(self, today_iso: str) -> int:
         with self._session() as session:
             result = session.execute(
@@ -674,25 +882,42 @@ class PostgresRepo:
         now = self._now_iso()
         with self._session() as session:
             row = session.execute(
-                text(
-                    """
-                    insert into bot_pending_actions (user_id, action_type, state, expires_at, created_at, updated_at)
-                    values (:user_id, :action_type, cast(:state as jsonb), :expires_at, :now, :now)
-                    on conflict (user_id, action_type)
-                    do update set state = excluded.state, expires_at = excluded.expires_at, updated_at = excluded.updated_at
-                    returning *
-                    """
-                ),
+                text(_PENDING_UPSERT_SQL),
                 {
                     "user_id": user_id,
                     "action_type": action_type,
-                    "state": json.dumps(state),
+                    "state": _json_dumps(state),
                     "expires_at": expires_at,
                     "now": now,
                 },
             ).mappings().first()
             session.commit()
-            return dict(row)
+            return self._pending_from_row(row)
+
+    def replace_pending_action(
+        self,
+        pending_id: int,
+        user_id: str,
+        action_type: str,
+        state: Dict[str, Any],
+        expires_at: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        # Moving a conversation to its next pending step: drop the old row and write the new one in one commit.
+        now = self._now_iso()
+        with self._session() as session:
+            session.execute(text("delete from bot_pending_actions where id = :id"), {"id": pending_id})
+            row = session.execute(
+                text(_PENDING_UPSERT_SQL),
+                {
+                    "user_id": user_id,
+                    "action_type": action_type,
+                    "state": _json_dumps(state),
+                    "expires_at": expires_at,
+                    "now": now,
+                },
+            ).mappings().first()
+            session.commit()
+            return self._pending_from_row(row)
 
     def get_pending_action(self, user_id: str, action_type: str) -> Optional[Dict[str, Any]]:
         sql = text(
@@ -703,7 +928,34 @@ class PostgresRepo:
         )
         with self._session() as session:
             row = session.execute(sql, {"user_id": user_id, "action_type": action_type}).mappings().first()
-            return dict(row) if row else None
+            return self._pending_from_row(row) if row else None
+
+    def list_pending_actions(self, user_id: str, action_types: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        action_types = list(action_types)
+        if not action_types:
+            return {}
+        sql = text(
+            """
+            select * from bot_pending_actions
+            where user_id = :user_id and action_type in :action_types
+            """
+        ).bindparams(bindparam("action_types", expanding=True))
+        with self._session() as session:
+            rows = session.execute(sql, {"user_id": user_id, "action_types": action_types}).mappings().all()
+            return {str(row["action_type"]): self._pending_from_row(row) for row in rows}
+
+    @staticmethod
+    def _pending_from_row(row: Any) -> Dict[str, Any]:
+        # state is jsonb and comes back decoded; only legacy text payloads need parsing here.
+        pending = dict(row)
+        state = pending.get("state")
+        if isinstance(state, str):
+            try:
+                state = _json_loads(state)
+            except ValueError:
+                state = None
+        pending["state"] = state if isinstance(state, dict) else {}
+        return pending
 
     def delete_pending_action(self, pending_id: int) -> None:
         with self._session() as session:
@@ -723,6 +975,9 @@ class ResilientPostgresRepo:
     def find_user_by_channel(self, channel: str, external_user_id: str) -> Optional[Dict[str, Any]]:
         return self.repo.find_user_by_channel(channel, external_user_id)
 
+    def touch_and_get_active_user(self, channel: str, external_user_id: str) -> Optional[Dict[str, Any]]:
+        return self.repo.touch_and_get_active_user(channel, external_user_id)
+
     def update_user_last_seen(self, channel: str, external_user_id: str, timestamp: Optional[str] = None) -> None:
         return self.repo.update_user_last_seen(channel, external_user_id, timestamp)
 
@@ -744,9 +999,18 @@ class ResilientPostgresRepo:
     def append_transactions(self, txs: list[Dict[str, Any]]) -> None:
         return self.repo.append_transactions(txs)
 
+    def commit_multi_tx(self, txs: list[Dict[str, Any]], pending_id: int) -> None:
+        return self.repo.commit_multi_tx(txs, pending_id)
+
     def list_transactions(self, user_id: str, include_deleted: bool = False) -> list[Dict[str, Any]]:
         return self.repo.list_transactions(user_id, include_deleted)
 
+    def pop_latest_active_transaction(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return self.repo.pop_latest_active_transaction(user_id)
+
+    def count_active_transactions(self, user_id: str) -> int:
+        return self.repo.count_active_transactions(user_id)
+
     def mark_transaction_deleted(self, tx_id: str) -> None:
         return self.repo.mark_transaction_deleted(tx_id)
 
@@ -765,17 +1029,31 @@ class ResilientPostgresRepo:
     def create_recurring_expense(self, data: Dict[str, Any]) -> Dict[str, Any]:
         return self.repo.create_recurring_expense(data)
 
+    def upsert_recurring_expense(self, data: Dict[str, Any], updates: Dict[str, Any]) -> Dict[str, Any]:
+        return self.repo.upsert_recurring_expense(data, updates)
+
     def get_recurring_expense(self, recurring_id: int) -> Optional[Dict[str, Any]]:
         return self.repo.get_recurring_expense(recurring_id)
 
-    def update_recurring_expense(self, recurring_id: int, updates: Dict[str, Any]) -> None:
+    def get_recurring_expense_for_user(self, recurring_id: int, user_id: str) -> Optional[Dict[str, Any]]:
+        return self.repo.get_recurring_expense_for_user(recurring_id, user_id)
+
+    def update_recurring_expense(self, recurring_id: int, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         return self.repo.update_recurring_expense(recurring_id, updates)
 
+    def cancel_recurring_expenses(self, user_id: str, recurring_ids: list[int], canceled_at: str) -> int:
+        return self.repo.cancel_recurring_expenses(user_id, recurring_ids, canceled_at)
+
     def list_active_recurring_expenses(self) -> list[Dict[str, Any]]:
         return self.repo.list_active_recurring_expenses()
 
-    def list_recurring_expenses(self, user_id: str) -> list[Dict[str, Any]]:
-        return self.repo.list_recurring_expenses(user_id)
+    def list_recurring_expenses(
+        self,
+        user_id: str,
+        status: Optional[str] = None,
+        include_canceled: bool = True,
+    ) -> list[Dict[str, Any]]:
+        return self.repo.list_recurring_expenses(user_id, status, include_canceled)
 
     def upsert_bill_instance(
         self,
@@ -803,6 +1081,19 @@ class ResilientPostgresRepo:
     def get_bill_instance(self, bill_instance_id: int) -> Optional[Dict[str, Any]]:
         return self.repo.get_bill_instance(bill_instance_id)
 
+    def get_bill_instance_for_user(self, bill_instance_id: int, user_id: str) -> Optional[Dict[str, Any]]:
+        return self.repo.get_bill_instance_for_user(bill_instance_id, user_id)
+
+    def confirm_bill_paid(
+        self,
+        bill_instance_id: int,
+        tx_id: str,
+        paid_at: str,
+        next_due_fn: Callable[[Dict[str, Any]], Any],
+        tx: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        return self.repo.confirm_bill_paid(bill_instance_id, tx_id, paid_at, next_due_fn, tx)
+
     def mark_overdue_bill_instances(self, today_iso: str) -> int:
         return self.repo.mark_overdue_bill_instances(today_iso)
 
@@ -842,8 +1133,21 @@ class ResilientPostgresRepo:
     ) -> Dict[str, Any]:
         return self.repo.upsert_pending_action(user_id, action_type, state, expires_at)
 
+    def replace_pending_action(
+        self,
+        pending_id: int,
+        user_id: str,
+        action_type: str,
+        state: Dict[str, Any],
+        expires_at: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        return self.repo.replace_pending_action(pending_id, user_id, action_type, state, expires_at)
+
     def get_pending_action(self, user_id: str, action_type: str) -> Optional[Dict[str, Any]]:
         return self.repo.get_pending_action(user_id, action_type)
 
+    def list_pending_actions(self, user_id: str, action_types: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        return self.repo.list_pending_actions(user_id, action_types)
+
     def delete_pending_action(self, pending_id: int) -> None:
         return self.repo.delete_pending_action(pending_id)
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import json
 from datetime import date, datetime, timedelta, timezone
 from typing import Any, Dict, Iterable, Optional
 from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
@@ -16,6 +17,16 @@ from app.services.evolution import EvolutionClient
 from app.services.repositories import DataRepo
 
 
+_DAILY_NUDGE_ACTIONS = (
+    ("dailynudge:examples", "✍️ Ejemplos"),
+    ("/help", "ℹ️ Ayuda"),
+    ("/list", "🧾 Ver movimientos"),
+    ("/summary", "📊 Resumen"),
+    ("dailynudge:set_hour", "🕖 Cambiar hora"),
+    ("dailynudge:silence", "🔕 Silenciar"),
+)
+
+
 def _today_for_timezone(tz_name: str) -> date:
     try:
         return datetime.now(ZoneInfo(tz_name)).date()
@@ -97,12 +108,7 @@ def _daily_nudge_prefs(repo: DataRepo, user_id: str) -> tuple[bool, int]:
     pending = repo.get_pending_action(user_id, "daily_nudge_prefs")
     state: Dict[str, Any] = {}
     if pending:
-        raw = pending.get("state") or {}
-        if isinstance(raw, str):
-            try:
-                raw = __import__("json").loads(raw)
-            except Exception:
-                raw = {}
+        raw = pending.get("state")
         if isinstance(raw, dict):
             state = raw
     enabled = bool(state.get("enabled", True))
@@ -146,7 +152,7 @@ def _extract_offsets(recurring: Dict[str, Any]) -> list[int]:
         return values
     if isinstance(offsets, str):
         try:
-            data = __import__("json").loads(offsets)
+            data = json.loads(offsets)
             if isinstance(data, list):
                 return [int(item) for item in data if str(item).isdigit()]
         except Exception:
@@ -164,14 +170,9 @@ async def _process_daily_expense_nudges(
     current_hour = _hour_for_timezone(scheduler_tz)
     today = _today_for_timezone(scheduler_tz)
     prompt_text = _daily_expense_nudge_text()
-    actions = [
-        ("dailynudge:examples", "✍️ Ejemplos"),
-        ("/help", "ℹ️ Ayuda"),
-        ("/list", "🧾 Ver movimientos"),
-        ("/summary", "📊 Resumen"),
-        ("dailynudge:set_hour", "🕖 Cambiar hora"),
-        ("dailynudge:silence", "🔕 Silenciar"),
-    ]
+    # The nudge is identical for every user, so build both channel payloads once per run.
+    telegram_markup = _build_keyboard(_DAILY_NUDGE_ACTIONS, row_size=2)
+    evolution_message = _build_bot_message(prompt_text, _DAILY_NUDGE_ACTIONS, row_size=2)
 
     channel_map: Dict[str, Dict[str, str]] = {}
     for item in repo.list_active_users_with_chat("telegram"):
@@ -208,7 +209,7 @@ async def _process_daily_expense_nudges(
                         text=prompt_text,
                         parse_mode="HTML",
                         disable_web_page_preview=True,
-                        reply_markup=_build_keyboard(actions, row_size=2),
+                        reply_markup=telegram_markup,
                     )
                     delivered = True
                 except Exception as exc:
@@ -220,7 +221,7 @@ async def _process_daily_expense_nudges(
                     await send_evolution_message(
                         evolution_client,
                         str(evolution_chat),
-                        _build_bot_message(prompt_text, actions, row_size=2),
+                        evolution_message,
                     )
                     delivered = True
                 except Exception as exc:
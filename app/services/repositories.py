@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Any, Dict, Iterable, Optional, Protocol
+from typing import Any, Callable, Dict, Iterable, Optional, Protocol
 
 
 @dataclass(frozen=True)
@@ -14,6 +14,8 @@ class InviteRecord:
 class DataRepo(Protocol):
     def find_user_by_channel(self, channel: str, external_user_id: str) -> Optional[Dict[str, Any]]: ...
 
+    def touch_and_get_active_user(self, channel: str, external_user_id: str) -> Optional[Dict[str, Any]]: ...
+
     def update_user_last_seen(self, channel: str, external_user_id: str, timestamp: Optional[str] = None) -> None: ...
 
     def create_user(self, user_id: str, channel: str, external_user_id: str, chat_id: Optional[str]) -> None: ...
@@ -28,8 +30,14 @@ class DataRepo(Protocol):
 
     def append_transactions(self, txs: list[Dict[str, Any]]) -> None: ...
 
+    def commit_multi_tx(self, txs: list[Dict[str, Any]], pending_id: int) -> None: ...
+
     def list_transactions(self, user_id: str, include_deleted: bool = False) -> list[Dict[str, Any]]: ...
 
+    def pop_latest_active_transaction(self, user_id: str) -> Optional[Dict[str, Any]]: ...
+
+    def count_active_transactions(self, user_id: str) -> int: ...
+
     def mark_transaction_deleted(self, tx_id: str) -> None: ...
     def mark_all_transactions_deleted(self, user_id: str) -> int: ...
 
@@ -39,13 +47,24 @@ class DataRepo(Protocol):
 
     def create_recurring_expense(self, data: Dict[str, Any]) -> Dict[str, Any]: ...
 
+    def upsert_recurring_expense(self, data: Dict[str, Any], updates: Dict[str, Any]) -> Dict[str, Any]: ...
+
     def get_recurring_expense(self, recurring_id: int) -> Optional[Dict[str, Any]]: ...
 
-    def update_recurring_expense(self, recurring_id: int, updates: Dict[str, Any]) -> None: ...
+    def get_recurring_expense_for_user(self, recurring_id: int, user_id: str) -> Optional[Dict[str, Any]]: ...
+
+    def update_recurring_expense(self, recurring_id: int, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]: ...
+
+    def cancel_recurring_expenses(self, user_id: str, recurring_ids: list[int], canceled_at: str) -> int: ...
 
     def list_active_recurring_expenses(self) -> list[Dict[str, Any]]: ...
 
-    def list_recurring_expenses(self, user_id: str) -> list[Dict[str, Any]]: ...
+    def list_recurring_expenses(
+        self,
+        user_id: str,
+        status: Optional[str] = None,
+        include_canceled: bool = True,
+    ) -> list[Dict[str, Any]]: ...
 
     def upsert_bill_instance(
         self,
@@ -62,6 +81,17 @@ class DataRepo(Protocol):
 
     def get_bill_instance(self, bill_instance_id: int) -> Optional[Dict[str, Any]]: ...
 
+    def get_bill_instance_for_user(self, bill_instance_id: int, user_id: str) -> Optional[Dict[str, Any]]: ...
+
+    def confirm_bill_paid(
+        self,
+        bill_instance_id: int,
+        tx_id: str,
+        paid_at: str,
+        next_due_fn: Callable[[Dict[str, Any]], Any],
+        tx: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Dict[str, Any]]: ...
+
     def mark_overdue_bill_instances(self, today_iso: str) -> int: ...
     def list_due_follow_up_bill_instances(self, today_iso: str) -> list[Dict[str, Any]]: ...
 
@@ -86,8 +116,19 @@ class DataRepo(Protocol):
         expires_at: Optional[str] = None,
     ) -> Dict[str, Any]: ...
 
+    def replace_pending_action(
+        self,
+        pending_id: int,
+        user_id: str,
+        action_type: str,
+        state: Dict[str, Any],
+        expires_at: Optional[str] = None,
+    ) -> Dict[str, Any]: ...
+
     def get_pending_action(self, user_id: str, action_type: str) -> Optional[Dict[str, Any]]: ...
 
+    def list_pending_actions(self, user_id: str, action_types: Iterable[str]) -> Dict[str, Dict[str, Any]]: ...
+
     def delete_pending_action(self, pending_id: int) -> None: ...
 
 
@@ -99,6 +140,13 @@ class CompositeRepo:
     def find_user_by_channel(self, channel: str, external_user_id: str) -> Optional[Dict[str, Any]]:
         return self.primary.find_user_by_channel(channel, external_user_id)
 
+    def touch_and_get_active_user(self, channel: str, external_user_id: str) -> Optional[Dict[str, Any]]:
+        user = self.primary.touch_and_get_active_user(channel, external_user_id)
+        if user:
+            for writer in self.secondary_writers:
+                _safe_call(lambda: writer.update_user_last_seen(channel, external_user_id))
+        return user
+
     def update_user_last_seen(self, channel: str, external_user_id: str, timestamp: Optional[str] = None) -> None:
         self.primary.update_user_last_seen(channel, external_user_id, timestamp)
         for writer in self.secondary_writers:
@@ -132,9 +180,25 @@ class CompositeRepo:
         for writer in self.secondary_writers:
             _safe_call(lambda: writer.append_transactions(txs))
 
+    def commit_multi_tx(self, txs: list[Dict[str, Any]], pending_id: int) -> None:
+        self.primary.commit_multi_tx(txs, pending_id)
+        for writer in self.secondary_writers:
+            _safe_call(lambda: writer.append_transactions(txs))
+
     def list_transactions(self, user_id: str, include_deleted: bool = False) -> list[Dict[str, Any]]:
         return self.primary.list_transactions(user_id, include_deleted)
 
+    def pop_latest_active_transaction(self, user_id: str) -> Optional[Dict[str, Any]]:
+        tx = self.primary.pop_latest_active_transaction(user_id)
+        if tx and tx.get("txId"):
+            tx_id = str(tx["txId"])
+            for writer in self.secondary_writers:
+                _safe_call(lambda: writer.mark_transaction_deleted(tx_id))
+        return tx
+
+    def count_active_transactions(self, user_id: str) -> int:
+        return self.primary.count_active_transactions(user_id)
+
     def mark_transaction_deleted(self, tx_id: str) -> None:
         self.primary.mark_transaction_deleted(tx_id)
         for writer in self.secondary_writers:
@@ -157,17 +221,31 @@ class CompositeRepo:
     def create_recurring_expense(self, data: Dict[str, Any]) -> Dict[str, Any]:
         return self.primary.create_recurring_expense(data)
 
+    def upsert_recurring_expense(self, data: Dict[str, Any], updates: Dict[str, Any]) -> Dict[str, Any]:
+        return self.primary.upsert_recurring_expense(data, updates)
+
     def get_recurring_expense(self, recurring_id: int) -> Optional[Dict[str, Any]]:
         return self.primary.get_recurring_expense(recurring_id)
 
-    def update_recurring_expense(self, recurring_id: int, updates: Dict[str, Any]) -> None:
+    def get_recurring_expense_for_user(self, recurring_id: int, user_id: str) -> Optional[Dict[str, Any]]:
+        return self.primary.get_recurring_expense_for_user(recurring_id, user_id)
+
+    def update_recurring_expense(self, recurring_id: int, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         return self.primary.update_recurring_expense(recurring_id, updates)
 
+    def cancel_recurring_expenses(self, user_id: str, recurring_ids: list[int], canceled_at: str) -> int:
+        return self.primary.cancel_recurring_expenses(user_id, recurring_ids, canceled_at)
+
     def list_active_recurring_expenses(self) -> list[Dict[str, Any]]:
         return self.primary.list_active_recurring_expenses()
 
-    def list_recurring_expenses(self, user_id: str) -> list[Dict[str, Any]]:
-        return self.primary.list_recurring_expenses(user_id)
+    def list_recurring_expenses(
+        self,
+        user_id: str,
+        status: Optional[str] = None,
+        include_canceled: bool = True,
+    ) -> list[Dict[str, Any]]:
+        return self.primary.list_recurring_expenses(user_id, status, include_canceled)
 
     def upsert_bill_instance(
         self,
@@ -195,6 +273,23 @@ class CompositeRepo:
     def get_bill_instance(self, bill_instance_id: int) -> Optional[Dict[str, Any]]:
         return self.primary.get_bill_instance(bill_instance_id)
 
+    def get_bill_instance_for_user(self, bill_instance_id: int, user_id: str) -> Optional[Dict[str, Any]]:
+        return self.primary.get_bill_instance_for_user(bill_instance_id, user_id)
+
+    def confirm_bill_paid(
+        self,
+        bill_instance_id: int,
+        tx_id: str,
+        paid_at: str,
+        next_due_fn: Callable[[Dict[str, Any]], Any],
+        tx: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        updated = self.primary.confirm_bill_paid(bill_instance_id, tx_id, paid_at, next_due_fn, tx)
+        if tx is not None:
+            for writer in self.secondary_writers:
+                _safe_call(lambda: writer.append_transactions([tx]))
+        return updated
+
     def mark_overdue_bill_instances(self, today_iso: str) -> int:
         return self.primary.mark_overdue_bill_instances(today_iso)
 
@@ -234,9 +329,22 @@ class CompositeRepo:
     ) -> Dict[str, Any]:
         return self.primary.upsert_pending_action(user_id, action_type, state, expires_at)
 
+    def replace_pending_action(
+        self,
+        pending_id: int,
+        user_id: str,
+        action_type: str,
+        state: Dict[str, Any],
+        expires_at: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        return self.primary.replace_pending_action(pending_id, user_id, action_type, state, expires_at)
+
     def get_pending_action(self, user_id: str, action_type: str) -> Optional[Dict[str, Any]]:
         return self.primary.get_pending_action(user_id, action_type)
 
+    def list_pending_actions(self, user_id: str, action_types: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        return self.primary.list_pending_actions(user_id, action_types)
+
     def delete_pending_action(self, pending_id: int) -> None:
         return self.primary.delete_pending_action(pending_id)
 